@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Benchmark de la agregación de métricas de `generate_evaluation_report.py`.
+
+Genera `--entries` resultados sintéticos (por defecto 1M) repitiendo las entradas de
+un `experiment_results.json` real, calcula `details` con `build_report` y compara:
+- la agregación original (`overall_metrics` + `aggregate_metrics`, una pasada de
+  Python por métrica y grupo; se conservan aquí como referencia),
+- la agregación en columnas NumPy (`overall_metrics_columnar` +
+  `aggregate_metrics_columnar`, una pasada agrupada),
+comprobando que el JSON de `overall` y `by_template` es idéntico.
+
+Uso:
+  python3 Evaluation/benchmark_evaluation_report.py --input Evaluation/data/experiment_results_gpt_5_1.json --entries 1000000
+"""
+import argparse
+import itertools
+import json
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from generate_evaluation_report import (MetricColumns, aggregate_metrics_columnar, build_report, empty_overall,
+                                        load_json, overall_metrics_columnar)
+
+
+def compute_iqr(values: List[float]) -> float:
+    """Compute interquartile range (Q3 - Q1). Return 0.0 if not enough data."""
+    if not values or len(values) < 2:
+        return 0.0
+    try:
+        qs = statistics.quantiles(values, n=4)
+        # qs -> [Q1, Q2(median), Q3]
+        return float(qs[2] - qs[0])
+    except Exception:
+        # fallback: use median splits
+        try:
+            m = statistics.median(values)
+            lower = [v for v in values if v <= m]
+            upper = [v for v in values if v >= m]
+            q1 = statistics.median(lower) if lower else m
+            q3 = statistics.median(upper) if upper else m
+            return float(q3 - q1)
+        except Exception:
+            return 0.0
+
+
+def aggregate_metrics(items: List[Dict], key_func) -> Dict[str, Dict]:
+    """Agrupa items por key_func(item) y promedia las métricas.
+    Se espera que cada item tenga 'structure' con hierarchical_precision, hierarchical_recall, hierarchical_f1 y 'content' con accuracy."""
+    groups = defaultdict(list)
+    for it in items:
+        k = key_func(it) or "Unknown"
+        groups[k].append(it)
+
+    out = {}
+    for k, lst in groups.items():
+        n = len(lst)
+        sum_p_act = sum(x["structure"]["p_act"] for x in lst)
+        sum_r_act = sum(x["structure"]["r_act"] for x in lst)
+        sum_p_par = sum(x["structure"]["p_par"] for x in lst)
+        sum_r_par = sum(x["structure"]["r_par"] for x in lst)
+        sum_h_p = sum(x["structure"]["hierarchical_precision"] for x in lst)
+        sum_h_r = sum(x["structure"]["hierarchical_recall"] for x in lst)
+        sum_h_f1 = sum(x["structure"]["hierarchical_f1"] for x in lst)
+        sum_acc = sum(x["content"]["accuracy"] for x in lst)
+        # prepare lists for medians
+        list_p_act = [x["structure"]["p_act"] for x in lst]
+        list_r_act = [x["structure"]["r_act"] for x in lst]
+        list_p_par = [x["structure"]["p_par"] for x in lst]
+        list_r_par = [x["structure"]["r_par"] for x in lst]
+        list_h_p = [x["structure"]["hierarchical_precision"] for x in lst]
+        list_h_r = [x["structure"]["hierarchical_recall"] for x in lst]
+        list_h_f1 = [x["structure"]["hierarchical_f1"] for x in lst]
+        list_acc = [x["content"]["accuracy"] for x in lst]
+        out[k] = {
+            "structure_action_precision": sum_p_act / n,
+            "structure_action_recall": sum_r_act / n,
+            "structure_parameter_precision": sum_p_par / n,
+            "structure_parameter_recall": sum_r_par / n,
+            "structure_hierarchical_precision": sum_h_p / n,
+            "structure_hierarchical_recall": sum_h_r / n,
+            "structure_hierarchical_f1": sum_h_f1 / n,
+            "content_accuracy": sum_acc / n,
+            # medians
+            "structure_action_precision_median": float(statistics.median(list_p_act)),
+            "structure_action_recall_median": float(statistics.median(list_r_act)),
+            "structure_parameter_precision_median": float(statistics.median(list_p_par)),
+            "structure_parameter_recall_median": float(statistics.median(list_r_par)),
+            "structure_hierarchical_precision_median": float(statistics.median(list_h_p)),
+            "structure_hierarchical_recall_median": float(statistics.median(list_h_r)),
+            "structure_hierarchical_f1_median": float(statistics.median(list_h_f1)),
+            "content_accuracy_median": float(statistics.median(list_acc)),
+                # IQRs
+                "structure_action_precision_iqr": float(compute_iqr(list_p_act)),
+                "structure_action_recall_iqr": float(compute_iqr(list_r_act)),
+                "structure_parameter_precision_iqr": float(compute_iqr(list_p_par)),
+                "structure_parameter_recall_iqr": float(compute_iqr(list_r_par)),
+                "structure_hierarchical_precision_iqr": float(compute_iqr(list_h_p)),
+                "structure_hierarchical_recall_iqr": float(compute_iqr(list_h_r)),
+                "structure_hierarchical_f1_iqr": float(compute_iqr(list_h_f1)),
+                "content_accuracy_iqr": float(compute_iqr(list_acc)),
+        }
+    return out
+
+
+def overall_metrics(details: List[Dict]) -> Dict[str, float]:
+    """Bloque `overall` (medias, medianas e IQRs sobre todas las preguntas).
+    La f1 global se calcula a partir de la precisión y el recall promediados."""
+    n = len(details) if details else 0
+    if n == 0:
+        return empty_overall()
+    structure_p_act = sum(d["structure"]["p_act"] for d in details) / n
+    structure_r_act = sum(d["structure"]["r_act"] for d in details) / n
+    structure_p_par = sum(d["structure"]["p_par"] for d in details) / n
+    structure_r_par = sum(d["structure"]["r_par"] for d in details) / n
+    structure_precision = sum(d["structure"]["hierarchical_precision"] for d in details) / n
+    structure_recall = sum(d["structure"]["hierarchical_recall"] for d in details) / n
+    # f1 from averaged precision & recall
+    structure_f1 = (2 * structure_precision * structure_recall / (structure_precision + structure_recall)) if (structure_precision + structure_recall) > 0 else 0.0
+    content_accuracy = sum(d["content"]["accuracy"] for d in details) / n
+    # medians for overall
+    list_p_act = [d["structure"]["p_act"] for d in details]
+    list_r_act = [d["structure"]["r_act"] for d in details]
+    list_p_par = [d["structure"]["p_par"] for d in details]
+    list_r_par = [d["structure"]["r_par"] for d in details]
+    list_h_p = [d["structure"]["hierarchical_precision"] for d in details]
+    list_h_r = [d["structure"]["hierarchical_recall"] for d in details]
+    list_h_f1 = [d["structure"]["hierarchical_f1"] for d in details]
+    list_acc = [d["content"]["accuracy"] for d in details]
+    return {
+        "structure_p_act": float(structure_p_act),
+        "structure_r_act": float(structure_r_act),
+        "structure_p_par": float(structure_p_par),
+        "structure_r_par": float(structure_r_par),
+        "structure_hierarchical_precision": float(structure_precision),
+        "structure_hierarchical_recall": float(structure_recall),
+        "structure_hierarchical_f1": float(structure_f1),
+        "content_accuracy": float(content_accuracy),
+        "structure_p_act_median": float(statistics.median(list_p_act)),
+        "structure_r_act_median": float(statistics.median(list_r_act)),
+        "structure_p_par_median": float(statistics.median(list_p_par)),
+        "structure_r_par_median": float(statistics.median(list_r_par)),
+        "structure_hierarchical_precision_median": float(statistics.median(list_h_p)),
+        "structure_hierarchical_recall_median": float(statistics.median(list_h_r)),
+        "structure_hierarchical_f1_median": float(statistics.median(list_h_f1)),
+        "content_accuracy_median": float(statistics.median(list_acc)),
+        "structure_p_act_iqr": float(compute_iqr(list_p_act)),
+        "structure_r_act_iqr": float(compute_iqr(list_r_act)),
+        "structure_p_par_iqr": float(compute_iqr(list_p_par)),
+        "structure_r_par_iqr": float(compute_iqr(list_r_par)),
+        "structure_hierarchical_precision_iqr": float(compute_iqr(list_h_p)),
+        "structure_hierarchical_recall_iqr": float(compute_iqr(list_h_r)),
+        "structure_hierarchical_f1_iqr": float(compute_iqr(list_h_f1)),
+        "content_accuracy_iqr": float(compute_iqr(list_acc)),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def template_key(d):
+    return d.get("template") or "Unknown"
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", default="Evaluation/data/experiment_results_gpt_5_1.json",
+                   help="experiment_results.json cuyas entradas se repiten")
+    p.add_argument("--entries", type=int, default=1_000_000, help="Resultados sintéticos (por defecto: 1000000)")
+    args = p.parse_args()
+
+    experiments = list(itertools.islice(itertools.cycle(load_json(args.input)), args.entries))
+    report, build_seconds = timed(lambda: build_report(experiments))
+    details = report["details"]
+
+    reference, reference_seconds = timed(lambda: {
+        "overall": overall_metrics(details),
+        "by_template": aggregate_metrics(details, template_key),
+    })
+    columns, columns_seconds = timed(lambda: MetricColumns.from_details(details, template_key))
+    columnar, columnar_seconds = timed(lambda: {
+        "overall": overall_metrics_columnar(columns),
+        "by_template": aggregate_metrics_columnar(columns),
+    })
+    if json.dumps(reference) != json.dumps(columnar):
+        raise SystemExit("La agregación en columnas no produce el mismo JSON que la original")
+
+    print(f"{len(details)} entradas, {len(columnar['by_template'])} plantillas; JSON idéntico")
+    print(f"build_report completo          {build_seconds:8.2f}s")
+    print(f"agregación original            {reference_seconds:8.2f}s")
+    print(f"agregación en columnas         {columnar_seconds:8.2f}s "
+          f"(+{columns_seconds:.2f}s para construir las columnas desde details)")
+    print(f"speedup de la agregación       {reference_seconds / columnar_seconds:8.1f}x "
+          f"({reference_seconds / (columnar_seconds + columns_seconds):.1f}x contando las columnas)")
+
+
+if __name__ == "__main__":
+    main()
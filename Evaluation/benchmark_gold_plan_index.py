@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Benchmark del índice de planes de referencia (`gold_plan_index.py`) en `build_report`.
+
+Construye el índice a partir de `--questions` y de los planes de referencia del
+propio fichero de resultados, genera `--entries` resultados sintéticos repitiendo
+las entradas de `--input` y compara el mejor tiempo de `build_report` sin índice
+y con él, comprobando que el informe es idéntico. También muestra cuánto se tarda en
+construir y en cargar el índice.
+
+Uso:
+  python3 Evaluation/benchmark_gold_plan_index.py --input Evaluation/data/experiment_results_gpt_5_1.json --entries 200000
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from generate_evaluation_report import build_report, load_json
+from gold_plan_index import DEFAULT_SOURCES, GoldPlanIndex
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def timed_report(experiments, gold_index=None):
+    """(JSON del informe, segundos de `build_report`). Solo se conserva el JSON, para que los
+    objetos de un informe no encarezcan la recolección de basura de la siguiente medición."""
+    report, seconds = timed(lambda: build_report(experiments, gold_index=gold_index))
+    return json.dumps(report), seconds
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", default="Evaluation/data/experiment_results_gpt_5_1.json",
+                   help="experiment_results.json cuyas entradas se repiten")
+    p.add_argument("--questions", nargs="+", default=DEFAULT_SOURCES,
+                   help=f"Preguntas instanciadas del índice (por defecto: {' '.join(DEFAULT_SOURCES)})")
+    p.add_argument("--entries", type=int, default=200_000, help="Resultados sintéticos (por defecto: 200000)")
+    p.add_argument("--repeat", type=int, default=3, help="Mediciones alternas; se muestra la mejor (por defecto: 3)")
+    args = p.parse_args()
+
+    experiments = list(itertools.islice(itertools.cycle(load_json(args.input)), args.entries))
+    tmp = tempfile.mkdtemp(prefix="gold_plan_index_")
+    index_path = os.path.join(tmp, "gold_plan_index.pickle")
+    try:
+        _, build_seconds = timed(lambda: GoldPlanIndex.open(index_path, args.questions + [args.input]))
+        index, load_seconds = timed(lambda: GoldPlanIndex.open(index_path))
+    finally:
+        shutil.rmtree(tmp)
+
+    plain_seconds = indexed_seconds = float("inf")
+    for _ in range(args.repeat):
+        reference, seconds = timed_report(experiments)
+        plain_seconds = min(plain_seconds, seconds)
+        indexed, seconds = timed_report(experiments, index)
+        indexed_seconds = min(indexed_seconds, seconds)
+        if reference != indexed:
+            raise SystemExit("El informe con el índice no coincide con el calculado sin él")
+
+    print(f"{len(experiments)} entradas; informes idénticos")
+    print(f"construir el índice        {build_seconds * 1000:8.1f}ms")
+    print(f"cargar el índice           {load_seconds * 1000:8.1f}ms")
+    print(f"build_report sin índice    {plain_seconds:8.2f}s")
+    print(f"build_report con índice    {indexed_seconds:8.2f}s  {index.summary()}")
+    print(f"speedup                    {plain_seconds / indexed_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
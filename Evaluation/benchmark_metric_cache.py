@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark de la caché de métricas (`metric_cache.py`) de `build_report`.
+
+Genera `--entries` resultados sintéticos a partir de un `experiment_results.json`
+real. A cada plan de HARVEY se le añade un parámetro con el número de la entrada,
+para que todos los pares de planes sean distintos y la caché no acierte por
+resultados repetidos. Compara el tiempo de `build_report`:
+- sin caché,
+- con la caché vacía (todo se calcula y se guarda),
+- con la caché completa,
+- añadiendo un lote de `--new` resultados nuevos a la caché completa,
+y comprueba que los cuatro informes son idénticos.
+
+Uso:
+  python3 Evaluation/benchmark_metric_cache.py --input Evaluation/data/experiment_results_gpt_5_1.json --entries 200000
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from generate_evaluation_report import build_report, load_json
+from metric_cache import MetricCache
+
+
+def synthetic_results(entries, count, start=0):
+    results = []
+    for i, e in enumerate(itertools.islice(itertools.cycle(entries), count), start):
+        actions = (e.get("api_response") or {}).get("plan", {}).get("actions") or []
+        results.append({"input": e["input"],
+                        "api_response": {"plan": {"actions": [dict(a, entry=i) for a in actions]}}})
+    return results
+
+
+def timed_report(experiments, cache_path=None):
+    """(informe, segundos, resumen de la caché) de `build_report`, contando la apertura y el guardado de la caché."""
+    start = time.perf_counter()
+    cache = MetricCache(cache_path) if cache_path else None
+    report = build_report(experiments, cache)
+    if cache is not None:
+        cache.save()
+    seconds = time.perf_counter() - start
+    summary = None
+    if cache is not None:
+        summary = cache.summary()
+        cache.close()
+    return report, seconds, summary
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", default="Evaluation/data/experiment_results_gpt_5_1.json",
+                   help="experiment_results.json cuyas entradas se repiten")
+    p.add_argument("--entries", type=int, default=200_000, help="Resultados sintéticos (por defecto: 200000)")
+    p.add_argument("--new", type=int, default=10_000, help="Resultados del lote nuevo (por defecto: 10000)")
+    args = p.parse_args()
+
+    entries = load_json(args.input)
+    experiments = synthetic_results(entries, args.entries)
+    extended = experiments + synthetic_results(entries, args.new, start=args.entries)
+    tmp = tempfile.mkdtemp(prefix="metric_cache_")
+    cache_path = os.path.join(tmp, "metric_cache.sqlite")
+    try:
+        reference, plain_seconds, _ = timed_report(experiments)
+        cold, cold_seconds, cold_cache = timed_report(experiments, cache_path)
+        warm, warm_seconds, warm_cache = timed_report(experiments, cache_path)
+        reference_extended, _, _ = timed_report(extended)
+        incremental, incremental_seconds, incremental_cache = timed_report(extended, cache_path)
+        cache_size = os.path.getsize(cache_path) / (1 << 20)
+    finally:
+        shutil.rmtree(tmp)
+
+    if not (json.dumps(reference) == json.dumps(cold) == json.dumps(warm)
+            and json.dumps(reference_extended) == json.dumps(incremental)):
+        raise SystemExit("Los informes con caché no coinciden con los calculados sin caché")
+
+    print(f"{args.entries} entradas (+{args.new} nuevas); informes idénticos; caché de {cache_size:.1f}MB")
+    print(f"sin caché              {plain_seconds:8.2f}s")
+    print(f"caché vacía            {cold_seconds:8.2f}s  {cold_cache}")
+    print(f"caché completa         {warm_seconds:8.2f}s  {warm_cache}")
+    print(f"lote nuevo             {incremental_seconds:8.2f}s  {incremental_cache}")
+    print(f"speedup con la caché   {plain_seconds / warm_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
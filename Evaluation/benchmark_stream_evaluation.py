@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Benchmark de memoria de `stream_evaluation_report.py` frente a `generate_evaluation_report.py`.
+
+Escribe un fichero de resultados sintético con `--entries` resultados (repitiendo
+las entradas de un `experiment_results.json` real), ejecuta cada script en un
+proceso aparte sobre la cuarta parte y sobre el total de entradas, y muestra el
+tiempo y el pico de memoria (RSS máximo, leído de /proc: solo Linux) de cada
+ejecución. Comprueba que `overall` y `by_template` son idénticos y que el JSONL
+coincide con `details`.
+
+Uso:
+  python3 Evaluation/benchmark_stream_evaluation.py --input Evaluation/data/experiment_results_gpt_5_1.json --entries 20000
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_evaluation_report import load_json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Experimentation"))
+from json_stream import write_records  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Ejecuta un script como __main__ e imprime su RSS máximo (KiB) en la última línea. VmHWM
+# empieza en el exec; ru_maxrss incluiría la memoria del proceso padre antes del exec
+RUN_WITH_RSS = ("import runpy, sys; sys.argv = sys.argv[1:]; "
+                "runpy.run_path(sys.argv[0], run_name='__main__'); "
+                "print(next(line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')))")
+
+
+def run(script, *args):
+    """(segundos, RSS máximo en MiB) de ejecutar `script` con `args`."""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", RUN_WITH_RSS, os.path.join(HERE, script), *args],
+                         check=True, capture_output=True, text=True, cwd=HERE).stdout
+    return time.perf_counter() - start, int(out.split()[-1]) / 1024
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", default="Evaluation/data/experiment_results_gpt_5_1.json",
+                   help="experiment_results.json cuyas entradas se repiten")
+    p.add_argument("--entries", type=int, default=20_000, help="Resultados sintéticos (por defecto: 20000)")
+    args = p.parse_args()
+
+    entries = load_json(args.input)
+    tmp = tempfile.mkdtemp(prefix="stream_evaluation_")
+    try:
+        rows = []
+        for count in (args.entries // 4, args.entries):
+            results = os.path.join(tmp, f"results_{count}.json")
+            with open(results, "w", encoding="utf-8") as fh:
+                write_records(itertools.islice(itertools.cycle(entries), count), fh)
+            size = os.path.getsize(results) / (1 << 20)
+            for script, outfile in (("stream_evaluation_report.py", "stream.json"),
+                                    ("generate_evaluation_report.py", "full.json")):
+                seconds, rss = run(script, "--input", results, "--output_dir", tmp, "--outfile", outfile)
+                rows.append((count, size, script, seconds, rss))
+
+            full = load_json(os.path.join(tmp, "full.json"))
+            stream = load_json(os.path.join(tmp, "stream.json"))
+            with open(os.path.join(tmp, "stream_details.jsonl"), "r", encoding="utf-8") as fh:
+                same_details = all(json.loads(line) == d for line, d in itertools.zip_longest(fh, full["details"]))
+            if (json.dumps(stream["overall"]) != json.dumps(full["overall"])
+                    or json.dumps(stream["by_template"]) != json.dumps(full["by_template"]) or not same_details):
+                raise SystemExit(f"El informe en streaming no coincide con el original ({count} entradas)")
+            os.remove(results)
+    finally:
+        shutil.rmtree(tmp)
+
+    print("Informes idénticos")
+    print(f"{'entradas':>9} {'fichero':>10}  {'script':<32} {'tiempo':>8} {'RSS máx.':>10}")
+    for count, size, script, seconds, rss in rows:
+        print(f"{count:>9} {size:>8.0f}MB  {script:<32} {seconds:>7.1f}s {rss:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
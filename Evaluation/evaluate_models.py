@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Evalúa los resultados de varios modelos en paralelo y genera una comparación entre modelos.
+
+Cada fichero de resultados se evalúa en un proceso de un pool: se escribe
+`evaluation_report_<modelo>.json` (como `generate_evaluation_report.py`) y
+`statistical_summary_<modelo>.csv` (como `statistical_evaluation.py`). Con un
+proceso por modelo, el tiempo total para N modelos se acerca al del más lento.
+
+Después se escriben dos tablas comparativas en `--output_dir`:
+- `model_comparison_by_template.csv`: las medias de cada métrica por plantilla
+  (y una fila `overall`), con una columna por modelo para cada métrica.
+- `model_comparison_questions.csv`: las métricas de cada pregunta en todos los
+  modelos, alineadas por el texto de la pregunta, y su diferencia respecto al
+  modelo de referencia (`--baseline`, por defecto el primero).
+
+El nombre del modelo se toma del fichero (`experiment_results_<modelo>.json`) o se
+indica como `modelo=ruta`.
+
+Uso:
+  python3 Evaluation/evaluate_models.py --output_dir Evaluation/data \\
+    Experimentation/experiment_results_gpt_5_1.json Experimentation/experiment_results_gpt_5_mini.json \\
+    gpt_5_nano=Experimentation/experiment_results_gpt_5_nano.json
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from generate_evaluation_report import (DEFAULT_INDEX_PATH, METRIC_COLUMNS, build_report, dump_json, load_json,
+                                        open_gold_index)
+from statistical_evaluation import analyze_dataframe, generate_dataframe_questions
+
+RESULTS_PREFIX = "experiment_results_"
+# Métricas por pregunta de la tabla de diferencias: (sección, clave) en `details`
+QUESTION_METRICS = [("structure", "hierarchical_f1"), ("content", "accuracy")]
+
+
+def parse_model_input(text: str) -> Tuple[str, str]:
+    """(modelo, ruta) de `modelo=ruta` o de una ruta `experiment_results_<modelo>.json`."""
+    if "=" in text:
+        model, path = text.split("=", 1)
+        return model, path
+    stem = Path(text).stem
+    return (stem[len(RESULTS_PREFIX):] if stem.startswith(RESULTS_PREFIX) else stem), text
+
+
+def evaluate_model(model: str, input_path: str, output_dir: str, alpha: float = 0.05,
+                   save_json: bool = False, gold_index_path: Optional[str] = None) -> Dict:
+    """Informe y resumen estadístico de un modelo. Se ejecuta en un proceso del pool."""
+    start = time.perf_counter()
+    gold_index = open_gold_index(gold_index_path)
+    report = build_report(load_json(input_path), gold_index=gold_index)
+    report_path = os.path.join(output_dir, f"evaluation_report_{model}.json")
+    dump_json(report, report_path)
+
+    summary = analyze_dataframe(generate_dataframe_questions(report), alpha=alpha)
+    summary_path = Path(output_dir) / f"statistical_summary_{model}.csv"
+    summary.to_csv(summary_path, index=False)
+    if save_json:
+        summary.to_json(summary_path.with_suffix(".json"), orient="records", force_ascii=False, indent=2)
+
+    return {
+        "model": model,
+        "overall": report["overall"],
+        "by_template": report["by_template"],
+        "questions": [(d["question"], d["template"], [d[section][key] for section, key in QUESTION_METRICS])
+                      for d in report["details"]],
+        "report_path": report_path,
+        "summary_path": str(summary_path),
+        "gold_index": gold_index.summary() if gold_index is not None else None,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def template_table(results: List[Dict]) -> pd.DataFrame:
+    """Medias por plantilla (y `overall`) con una columna `<métrica> [<modelo>]` por modelo."""
+    templates = list(dict.fromkeys(t for r in results for t in r["by_template"]))
+    rows = []
+    for template in ["overall"] + templates:
+        row = {"template": template}
+        for _, _, name, overall_name in METRIC_COLUMNS:
+            for r in results:
+                if template == "overall":
+                    value = r["overall"].get(overall_name)
+                else:
+                    value = r["by_template"].get(template, {}).get(name)
+                row[f"{name} [{r['model']}]"] = value
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def question_table(results: List[Dict], baseline: str) -> pd.DataFrame:
+    """Métricas de cada pregunta en todos los modelos y su diferencia con `baseline`.
+
+    Las preguntas se alinean por su texto; si un texto se repite en un fichero, sus
+    apariciones se emparejan por orden."""
+    aligned: Dict[Tuple[str, int], Dict] = {}
+    for r in results:
+        seen = defaultdict(int)
+        for question, template, values in r["questions"]:
+            occurrence = seen[question]
+            seen[question] += 1
+            row = aligned.setdefault((question, occurrence), {"question": question, "template": template})
+            for (section, key), value in zip(QUESTION_METRICS, values):
+                row[f"{section}_{key} [{r['model']}]"] = value
+
+    models = [r["model"] for r in results]
+    rows = []
+    for row in aligned.values():
+        for section, key in QUESTION_METRICS:
+            base = row.get(f"{section}_{key} [{baseline}]")
+            for model in models:
+                if model == baseline:
+                    continue
+                value = row.get(f"{section}_{key} [{model}]")
+                delta = value - base if value is not None and base is not None else None
+                row[f"{section}_{key} delta [{model} - {baseline}]"] = delta
+        rows.append(row)
+
+    columns = ["question", "template"]
+    for section, key in QUESTION_METRICS:
+        columns += [f"{section}_{key} [{model}]" for model in models]
+        columns += [f"{section}_{key} delta [{model} - {baseline}]" for model in models if model != baseline]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Evaluate several models' experiment results in parallel")
+    p.add_argument("inputs", nargs="+", metavar="RESULTS",
+                   help="experiment_results_<model>.json files, or model=path")
+    p.add_argument("--output_dir", required=True, help="Directory to write the reports and comparison tables")
+    p.add_argument("--baseline", default=None, help="Model the per-question deltas are computed against (default: first)")
+    p.add_argument("--workers", type=int, default=None,
+                   help="Worker processes (default: one per model, up to the number of CPUs)")
+    p.add_argument("--alpha", type=float, default=0.05, help="Significance level of the statistical summaries")
+    p.add_argument("--save-json", action="store_true", help="Save the statistical summaries also as JSON")
+    p.add_argument("--gold-index", nargs="?", const=DEFAULT_INDEX_PATH, default=None, metavar="PATH",
+                   help=f"Take the flattened ground-truth plans from a gold plan index (default: {DEFAULT_INDEX_PATH})")
+    args = p.parse_args()
+
+    models = [parse_model_input(text) for text in args.inputs]
+    names = [model for model, _ in models]
+    if len(set(names)) != len(names):
+        p.error(f"Duplicated model names: {names}")
+    baseline = args.baseline or names[0]
+    if baseline not in names:
+        p.error(f"--baseline {baseline} is not one of {names}")
+    workers = args.workers or min(len(models), os.cpu_count() or 1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    # El índice se construye o actualiza una vez aquí; los procesos del pool solo lo cargan
+    open_gold_index(args.gold_index)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_model, model, path, args.output_dir, args.alpha, args.save_json,
+                               args.gold_index)
+                   for model, path in models]
+        results = [f.result() for f in futures]
+    for r in results:
+        print(f"{r['model']}: {r['report_path']}, {r['summary_path']} ({r['seconds']:.2f}s)")
+        if r["gold_index"]:
+            print(f"  {r['gold_index']}")
+
+    templates_path = os.path.join(args.output_dir, "model_comparison_by_template.csv")
+    template_table(results).to_csv(templates_path, index=False)
+    questions_path = os.path.join(args.output_dir, "model_comparison_questions.csv")
+    question_table(results, baseline).to_csv(questions_path, index=False)
+    print(f"Wrote model comparison to {templates_path} and {questions_path}")
+    print(f"Evaluated {len(results)} models with {workers} workers in {time.perf_counter() - start:.2f}s "
+          f"(slowest model {max(r['seconds'] for r in results):.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,14 @@ con lambda=0.5. La métrica de contenido es "accuracy" según la especificación
 import argparse
 import json
 import os
-import statistics
-from collections import defaultdict
-from typing import Any, Dict, List, Set, Tuple
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from metric_cache import BATCH_SIZE, DEFAULT_CACHE_PATH, MetricCache, metric_key
+
+DEFAULT_INDEX_PATH = "gold_plan_index.pickle"
 
 
 def load_json(path: str) -> Any:
@@ -38,27 +43,6 @@ def safe_get(d: Dict, *keys, default=None):
     return cur
 
 
-def compute_iqr(values: List[float]) -> float:
-    """Compute interquartile range (Q3 - Q1). Return 0.0 if not enough data."""
-    if not values or len(values) < 2:
-        return 0.0
-    try:
-        qs = statistics.quantiles(values, n=4)
-        # qs -> [Q1, Q2(median), Q3]
-        return float(qs[2] - qs[0])
-    except Exception:
-        # fallback: use median splits
-        try:
-            m = statistics.median(values)
-            lower = [v for v in values if v <= m]
-            upper = [v for v in values if v >= m]
-            q1 = statistics.median(lower) if lower else m
-            q3 = statistics.median(upper) if upper else m
-            return float(q3 - q1)
-        except Exception:
-            return 0.0
-
-
 def flatten_params(prefix: str, obj: Any, mapping: Dict[str, Any], keys: Set[str]):
     """Recursivamente aplanar parámetros y llenar mapping y keys.
     prefix: camino actual (sin terminar con '.')
@@ -110,9 +94,12 @@ def flatten_params(prefix: str, obj: Any, mapping: Dict[str, Any], keys: Set[str
 def extract_actions(raw_actions: Any) -> List[Dict]:
     """Extrae la lista de acciones desde el objeto `plan`.
     Devuelve lista de dicts: {'name': str, 'param_keys': set(str), 'param_values': dict}
+    Un plan ausente (resultado fallido, sin `api_response`) equivale a un plan vacío.
     """
     
     actions = []
+    if raw_actions is None:
+        return actions
 
     for a in raw_actions:
         if not isinstance(a, dict):
@@ -235,166 +222,242 @@ def compute_content_accuracy(g_actions: List[Dict], h_actions: List[Dict]) -> Di
     }
 
 
-def aggregate_metrics(items: List[Dict], key_func) -> Dict[str, Dict]:
-    """Agrupa items por key_func(item) y promedia las métricas.
-    Se espera que cada item tenga 'structure' con hierarchical_precision, hierarchical_recall, hierarchical_f1 y 'content' con accuracy."""
-    groups = defaultdict(list)
-    for it in items:
-        k = key_func(it) or "Unknown"
-        groups[k].append(it)
-
+# Métricas por pregunta: (sección, clave) en `details`, nombre en `by_template` y nombre en `overall`
+METRIC_COLUMNS = [
+    ("structure", "p_act", "structure_action_precision", "structure_p_act"),
+    ("structure", "r_act", "structure_action_recall", "structure_r_act"),
+    ("structure", "p_par", "structure_parameter_precision", "structure_p_par"),
+    ("structure", "r_par", "structure_parameter_recall", "structure_r_par"),
+    ("structure", "hierarchical_precision", "structure_hierarchical_precision", "structure_hierarchical_precision"),
+    ("structure", "hierarchical_recall", "structure_hierarchical_recall", "structure_hierarchical_recall"),
+    ("structure", "hierarchical_f1", "structure_hierarchical_f1", "structure_hierarchical_f1"),
+    ("content", "accuracy", "content_accuracy", "content_accuracy"),
+]
+
+
+class MetricColumns:
+    """Métricas por pregunta en columnas (una fila por entrada de `details`) y su grupo.
+
+    Las columnas se llenan como `array('d')` y se exponen a NumPy sin copia. Los
+    grupos se numeran por orden de primera aparición, que es el orden de las claves
+    de `by_template`."""
+
+    def __init__(self):
+        self.columns = [array("d") for _ in METRIC_COLUMNS]
+        self.group_ids = array("q")
+        self.group_keys: Dict[str, int] = {}
+        self._appenders = [(column.append, section, name)
+                           for column, (section, name, _, _) in zip(self.columns, METRIC_COLUMNS)]
+
+    def __len__(self) -> int:
+        return len(self.group_ids)
+
+    def add(self, detail: Dict, key: str) -> None:
+        for append, section, name in self._appenders:
+            append(detail[section][name])
+        self.group_ids.append(self.group_keys.setdefault(key, len(self.group_keys)))
+
+    @classmethod
+    def from_details(cls, details: List[Dict], key_func) -> "MetricColumns":
+        columns = cls()
+        for d in details:
+            columns.add(d, key_func(d) or "Unknown")
+        return columns
+
+    def values(self) -> np.ndarray:
+        """Matriz (métrica, fila)."""
+        return np.vstack([np.frombuffer(column, dtype=np.float64) for column in self.columns])
+
+
+def grouped_statistics(values: np.ndarray, group_ids: np.ndarray, num_groups: int) -> Dict[str, List[List[float]]]:
+    """Media, mediana e IQR de cada fila de `values` (métrica x pregunta) por grupo, en una pasada ordenada.
+
+    Devuelve listas [grupo][métrica] de floats de Python, idénticos a los de
+    `sum(...) / n`, `statistics.median` y Q3 - Q1 de `statistics.quantiles(n=4)` sobre
+    las listas de cada grupo (0.0 con menos de dos valores)."""
+    counts = np.bincount(group_ids, minlength=num_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # Orden estable por grupo: dentro de cada grupo se conserva el orden original, así
+    # que las sumas de Python se hacen en el orden de `details`
+    if num_groups > 1:
+        values = values[:, np.argsort(group_ids, kind="stable")]
+    rows = values.tolist()
+    means = [[sum(row[s:s + c]) / c for row in rows] for s, c in zip(starts.tolist(), counts.tolist())]
+
+    # Cada métrica ordenada por valor dentro de cada grupo
+    ordered = np.empty_like(values)
+    for s, c in zip(starts.tolist(), counts.tolist()):
+        ordered[:, s:s + c] = np.sort(values[:, s:s + c], axis=1)
+    ordered = ordered.T
+
+    half = counts // 2
+    upper = ordered[starts + half]
+    lower = ordered[starts + np.maximum(half - 1, 0)]
+    odd = (counts % 2 == 1)[:, None]
+    medians = np.where(odd, upper, (lower + upper) / 2)
+
+    # statistics.quantiles(n=4), método 'exclusive', con la misma aritmética entera
+    last = len(ordered) - 1
+    m_plus = counts + 1
+    quartiles = []
+    for i in (1, 3):
+        j = np.clip(i * m_plus // 4, 1, np.maximum(counts - 1, 1))
+        delta = (i * m_plus - j * 4)[:, None]
+        below = ordered[np.minimum(starts + j - 1, last)]
+        above = ordered[np.minimum(starts + j, last)]
+        quartiles.append((below * (4 - delta) + above * delta) / 4)
+    iqrs = np.where((counts >= 2)[:, None], quartiles[1] - quartiles[0], 0.0)
+
+    return {"mean": means, "median": medians.tolist(), "iqr": iqrs.tolist()}
+
+
+def aggregate_metrics_columnar(columns: MetricColumns) -> Dict[str, Dict]:
+    """Bloque `by_template`: medias, medianas e IQRs de cada plantilla, sobre columnas NumPy."""
     out = {}
-    for k, lst in groups.items():
-        n = len(lst)
-        sum_p_act = sum(x["structure"]["p_act"] for x in lst)
-        sum_r_act = sum(x["structure"]["r_act"] for x in lst)
-        sum_p_par = sum(x["structure"]["p_par"] for x in lst)
-        sum_r_par = sum(x["structure"]["r_par"] for x in lst)
-        sum_h_p = sum(x["structure"]["hierarchical_precision"] for x in lst)
-        sum_h_r = sum(x["structure"]["hierarchical_recall"] for x in lst)
-        sum_h_f1 = sum(x["structure"]["hierarchical_f1"] for x in lst)
-        sum_acc = sum(x["content"]["accuracy"] for x in lst)
-        # prepare lists for medians
-        list_p_act = [x["structure"]["p_act"] for x in lst]
-        list_r_act = [x["structure"]["r_act"] for x in lst]
-        list_p_par = [x["structure"]["p_par"] for x in lst]
-        list_r_par = [x["structure"]["r_par"] for x in lst]
-        list_h_p = [x["structure"]["hierarchical_precision"] for x in lst]
-        list_h_r = [x["structure"]["hierarchical_recall"] for x in lst]
-        list_h_f1 = [x["structure"]["hierarchical_f1"] for x in lst]
-        list_acc = [x["content"]["accuracy"] for x in lst]
-        out[k] = {
-            "structure_action_precision": sum_p_act / n,
-            "structure_action_recall": sum_r_act / n,
-            "structure_parameter_precision": sum_p_par / n,
-            "structure_parameter_recall": sum_r_par / n,
-            "structure_hierarchical_precision": sum_h_p / n,
-            "structure_hierarchical_recall": sum_h_r / n,
-            "structure_hierarchical_f1": sum_h_f1 / n,
-            "content_accuracy": sum_acc / n,
-            # medians
-            "structure_action_precision_median": float(statistics.median(list_p_act)),
-            "structure_action_recall_median": float(statistics.median(list_r_act)),
-            "structure_parameter_precision_median": float(statistics.median(list_p_par)),
-            "structure_parameter_recall_median": float(statistics.median(list_r_par)),
-            "structure_hierarchical_precision_median": float(statistics.median(list_h_p)),
-            "structure_hierarchical_recall_median": float(statistics.median(list_h_r)),
-            "structure_hierarchical_f1_median": float(statistics.median(list_h_f1)),
-            "content_accuracy_median": float(statistics.median(list_acc)),
-                # IQRs
-                "structure_action_precision_iqr": float(compute_iqr(list_p_act)),
-                "structure_action_recall_iqr": float(compute_iqr(list_r_act)),
-                "structure_parameter_precision_iqr": float(compute_iqr(list_p_par)),
-                "structure_parameter_recall_iqr": float(compute_iqr(list_r_par)),
-                "structure_hierarchical_precision_iqr": float(compute_iqr(list_h_p)),
-                "structure_hierarchical_recall_iqr": float(compute_iqr(list_h_r)),
-                "structure_hierarchical_f1_iqr": float(compute_iqr(list_h_f1)),
-                "content_accuracy_iqr": float(compute_iqr(list_acc)),
-        }
+    if not len(columns):
+        return out
+    stats = grouped_statistics(columns.values(), np.frombuffer(columns.group_ids, dtype=np.int64),
+                               len(columns.group_keys))
+    for key, g in columns.group_keys.items():
+        out[key] = template_entry(stats["mean"][g], stats["median"][g], stats["iqr"][g])
     return out
 
 
-def build_report(experiments: List[Dict]) -> Dict:
-    details = []
+def template_entry(means: List[float], medians: List[float], iqrs: List[float]) -> Dict[str, float]:
+    """Entrada de `by_template` a partir de las medias, medianas e IQRs en el orden de METRIC_COLUMNS."""
+    names = [name for _, _, name, _ in METRIC_COLUMNS]
+    out = dict(zip(names, means))
+    out.update((f"{name}_median", value) for name, value in zip(names, medians))
+    out.update((f"{name}_iqr", value) for name, value in zip(names, iqrs))
+    return out
 
-    for idx, e in enumerate(experiments):
-        g_plan = safe_get(e, "input", "plan", "actions")
-        h_plan = safe_get(e, "api_response", "plan", "actions")
-        g_actions = extract_actions(g_plan)
-        h_actions = extract_actions(h_plan)
 
-        struct = compute_structure_metrics(g_actions, h_actions, lam=0.5)
-        content = compute_content_accuracy(g_actions, h_actions)
+def overall_entry(means: List[float], medians: List[float], iqrs: List[float]) -> Dict[str, float]:
+    """Bloque `overall` a partir de las medias, medianas e IQRs en el orden de METRIC_COLUMNS."""
+    names = [name for _, _, _, name in METRIC_COLUMNS]
+    out = dict(zip(names, means))
+    precision = out["structure_hierarchical_precision"]
+    recall = out["structure_hierarchical_recall"]
+    # f1 from averaged precision & recall
+    out["structure_hierarchical_f1"] = (2 * precision * recall / (precision + recall)) if (precision + recall) > 0 else 0.0
+    out.update((f"{name}_median", value) for name, value in zip(names, medians))
+    out.update((f"{name}_iqr", value) for name, value in zip(names, iqrs))
+    return out
 
-        # metadata para agrupar: intentar obtener campos comunes
-        template = safe_get(e, "input", "template")
-        question = safe_get(e, "input", "question")
 
-        details.append({
-            "index": idx,
-            "template": template,
-            "question": question,
-            "structure": struct,
-            "content": content,
-        })
+def empty_overall() -> Dict[str, float]:
+    out = {}
+    for suffix in ("", "_median", "_iqr"):
+        for _, _, _, name in METRIC_COLUMNS:
+            out[f"{name}{suffix}"] = 0.0
+    return out
+
 
-    # overall aggregates: promedios
-    n = len(details) if details else 0
+def overall_metrics_columnar(columns: MetricColumns) -> Dict[str, float]:
+    """Bloque `overall` (medias, medianas e IQRs sobre todas las preguntas), sobre columnas NumPy.
+    La f1 global se calcula a partir de la precisión y el recall promediados."""
+    n = len(columns)
     if n == 0:
-        overall = {
-            "structure_p_act": 0.0,
-            "structure_r_act": 0.0,
-            "structure_p_par": 0.0,
-            "structure_r_par": 0.0,
-            "structure_hierarchical_precision": 0.0,
-            "structure_hierarchical_recall": 0.0,
-            "structure_hierarchical_f1": 0.0,
-            "content_accuracy": 0.0,
-            "structure_p_act_median": 0.0,
-            "structure_r_act_median": 0.0,
-            "structure_p_par_median": 0.0,
-            "structure_r_par_median": 0.0,
-            "structure_hierarchical_precision_median": 0.0,
-            "structure_hierarchical_recall_median": 0.0,
-            "structure_hierarchical_f1_median": 0.0,
-            "content_accuracy_median": 0.0,
-            "structure_p_act_iqr": 0.0,
-            "structure_r_act_iqr": 0.0,
-            "structure_p_par_iqr": 0.0,
-            "structure_r_par_iqr": 0.0,
-            "structure_hierarchical_precision_iqr": 0.0,
-            "structure_hierarchical_recall_iqr": 0.0,
-            "structure_hierarchical_f1_iqr": 0.0,
-            "content_accuracy_iqr": 0.0,
-        }
+        return empty_overall()
+    stats = grouped_statistics(columns.values(), np.zeros(n, dtype=np.int64), 1)
+    return overall_entry(stats["mean"][0], stats["median"][0], stats["iqr"][0])
+
+
+# Únicos campos de cada resultado que lee `evaluate_entry`
+EVALUATED_FIELDS = {
+    "input": {"template": None, "question": None, "plan": {"actions": None}},
+    "api_response": {"plan": {"actions": None}},
+}
+
+
+def compute_entry_metrics(g_plan: Any, h_plan: Any, lam: float = 0.5,
+                          g_actions: Optional[List[Dict]] = None) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """Métricas de estructura y de contenido de un par (plan de referencia, plan de HARVEY).
+    `g_actions` son las acciones ya aplanadas de `g_plan`, si se tienen (p. ej. del índice de planes)."""
+    if g_actions is None:
+        g_actions = extract_actions(g_plan)
+    h_actions = extract_actions(h_plan)
+
+    struct = compute_structure_metrics(g_actions, h_actions, lam=lam)
+    content = compute_content_accuracy(g_actions, h_actions)
+    return struct, content
+
+
+def entry_key(e: Dict, lam: float = 0.5) -> bytes:
+    """Clave de la caché de métricas de un resultado."""
+    return metric_key(safe_get(e, "input", "plan", "actions"), safe_get(e, "api_response", "plan", "actions"), lam)
+
+
+def evaluate_entry(idx: int, e: Dict, lam: float = 0.5, cache: Optional[MetricCache] = None,
+                   gold_index=None, key: Optional[bytes] = None) -> Dict:
+    """Entrada de `details` (métricas de estructura y contenido) de un resultado.
+    Con `cache`, las métricas se leen de la caché si el par de planes ya se evaluó
+    (`key` es la clave de `entry_key`, si ya se calculó); con `gold_index` (un
+    `GoldPlanIndex`), el plan de referencia se toma ya aplanado del índice."""
+    g_plan = safe_get(e, "input", "plan", "actions")
+    h_plan = safe_get(e, "api_response", "plan", "actions")
+
+    # metadata para agrupar: intentar obtener campos comunes
+    template = safe_get(e, "input", "template")
+    question = safe_get(e, "input", "question")
+
+    if cache is not None and key is None:
+        key = metric_key(g_plan, h_plan, lam)
+    cached = cache.get(key) if cache is not None else None
+    if cached is None:
+        g_actions = gold_index.lookup(question, g_plan) if gold_index is not None else None
+        struct, content = compute_entry_metrics(g_plan, h_plan, lam, g_actions)
+        if cache is not None:
+            cache.put(key, struct, content)
     else:
-        structure_p_act = sum(d["structure"]["p_act"] for d in details) / n
-        structure_r_act = sum(d["structure"]["r_act"] for d in details) / n
-        structure_p_par = sum(d["structure"]["p_par"] for d in details) / n
-        structure_r_par = sum(d["structure"]["r_par"] for d in details) / n
-        structure_precision = sum(d["structure"]["hierarchical_precision"] for d in details) / n
-        structure_recall = sum(d["structure"]["hierarchical_recall"] for d in details) / n
-        # f1 from averaged precision & recall
-        structure_f1 = (2 * structure_precision * structure_recall / (structure_precision + structure_recall)) if (structure_precision + structure_recall) > 0 else 0.0
-        content_accuracy = sum(d["content"]["accuracy"] for d in details) / n
-        # medians for overall
-        list_p_act = [d["structure"]["p_act"] for d in details]
-        list_r_act = [d["structure"]["r_act"] for d in details]
-        list_p_par = [d["structure"]["p_par"] for d in details]
-        list_r_par = [d["structure"]["r_par"] for d in details]
-        list_h_p = [d["structure"]["hierarchical_precision"] for d in details]
-        list_h_r = [d["structure"]["hierarchical_recall"] for d in details]
-        list_h_f1 = [d["structure"]["hierarchical_f1"] for d in details]
-        list_acc = [d["content"]["accuracy"] for d in details]
-        overall = {
-            "structure_p_act": float(structure_p_act),
-            "structure_r_act": float(structure_r_act),
-            "structure_p_par": float(structure_p_par),
-            "structure_r_par": float(structure_r_par),
-            "structure_hierarchical_precision": float(structure_precision),
-            "structure_hierarchical_recall": float(structure_recall),
-            "structure_hierarchical_f1": float(structure_f1),
-            "content_accuracy": float(content_accuracy),
-            "structure_p_act_median": float(statistics.median(list_p_act)),
-            "structure_r_act_median": float(statistics.median(list_r_act)),
-            "structure_p_par_median": float(statistics.median(list_p_par)),
-            "structure_r_par_median": float(statistics.median(list_r_par)),
-            "structure_hierarchical_precision_median": float(statistics.median(list_h_p)),
-            "structure_hierarchical_recall_median": float(statistics.median(list_h_r)),
-            "structure_hierarchical_f1_median": float(statistics.median(list_h_f1)),
-            "content_accuracy_median": float(statistics.median(list_acc)),
-            "structure_p_act_iqr": float(compute_iqr(list_p_act)),
-            "structure_r_act_iqr": float(compute_iqr(list_r_act)),
-            "structure_p_par_iqr": float(compute_iqr(list_p_par)),
-            "structure_r_par_iqr": float(compute_iqr(list_r_par)),
-            "structure_hierarchical_precision_iqr": float(compute_iqr(list_h_p)),
-            "structure_hierarchical_recall_iqr": float(compute_iqr(list_h_r)),
-            "structure_hierarchical_f1_iqr": float(compute_iqr(list_h_f1)),
-            "content_accuracy_iqr": float(compute_iqr(list_acc)),
-        }
-
-    # agrupaciones
-    by_template = aggregate_metrics(details, lambda d: d.get("template") or "Unknown")
+        struct, content = cached
+
+    return {
+        "index": idx,
+        "template": template,
+        "question": question,
+        "structure": struct,
+        "content": content,
+    }
+
+
+def evaluate_entries(experiments: Iterable[Dict], lam: float = 0.5, cache: Optional[MetricCache] = None,
+                     gold_index=None) -> Iterator[Dict]:
+    """Entradas de `details` de `experiments`, en orden. Con `cache`, los resultados se
+    evalúan en lotes de BATCH_SIZE cuyas filas se leen de la caché en una sola consulta."""
+    if cache is None:
+        for idx, e in enumerate(experiments):
+            yield evaluate_entry(idx, e, lam, gold_index=gold_index)
+        return
+
+    batch = []
+    for item in enumerate(experiments):
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            yield from _evaluate_batch(batch, lam, cache, gold_index)
+            batch = []
+    yield from _evaluate_batch(batch, lam, cache, gold_index)
+
+
+def _evaluate_batch(batch: List[Tuple[int, Dict]], lam: float, cache: MetricCache, gold_index) -> Iterator[Dict]:
+    keys = [entry_key(e, lam) for _, e in batch]
+    cache.prefetch(keys)
+    for (idx, e), key in zip(batch, keys):
+        yield evaluate_entry(idx, e, lam, cache, gold_index, key)
+
+
+def build_report(experiments: List[Dict], cache: Optional[MetricCache] = None, gold_index=None) -> Dict:
+    details = []
+    columns = MetricColumns()
+
+    for detail in evaluate_entries(experiments, cache=cache, gold_index=gold_index):
+        details.append(detail)
+        columns.add(detail, detail["template"] or "Unknown")
+
+    # overall y agrupaciones: una pasada agrupada sobre columnas NumPy
+    overall = overall_metrics_columnar(columns)
+    by_template = aggregate_metrics_columnar(columns)
 
     report = {
         "overall": overall,
@@ -410,15 +473,36 @@ def main():
     p.add_argument("--input", required=True, help="Path to experiment_results.json")
     p.add_argument("--output_dir", required=True, help="Directory to write the report")
     p.add_argument("--outfile", default="evaluation_report_generated.json", help="Output filename")
+    p.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+                   help=f"Reuse the metrics of already evaluated plans from a cache file (default: {DEFAULT_CACHE_PATH})")
+    p.add_argument("--gold-index", nargs="?", const=DEFAULT_INDEX_PATH, default=None, metavar="PATH",
+                   help=f"Take the flattened ground-truth plans from a gold plan index (default: {DEFAULT_INDEX_PATH})")
     args = p.parse_args()
 
     experiments = load_json(args.input)
-    report = build_report(experiments)
+    cache = MetricCache(args.cache) if args.cache else None
+    gold_index = open_gold_index(args.gold_index)
+    report = build_report(experiments, cache, gold_index)
 
     os.makedirs(args.output_dir, exist_ok=True)
     outpath = os.path.join(args.output_dir, args.outfile)
     dump_json(report, outpath)
     print(f"Wrote evaluation report to {outpath}")
+    if cache is not None:
+        cache.save()
+        print(cache.summary())
+        cache.close()
+    if gold_index is not None:
+        print(gold_index.summary())
+
+
+def open_gold_index(path: Optional[str]):
+    """`GoldPlanIndex` de `path` (construido o actualizado si hace falta), o None sin `path`."""
+    if not path:
+        return None
+    # Importación diferida: gold_plan_index usa extract_actions de este módulo
+    from gold_plan_index import GoldPlanIndex
+    return GoldPlanIndex.open(path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Índice persistente de los planes de referencia ya aplanados, por pregunta.
+
+Los planes de referencia (`plan.actions`) de todas las evaluaciones salen del mismo
+`instantiated_pi_tasks.json`, así que se aplanan una sola vez con `extract_actions`
+y se guardan en un pickle. Cada acción guarda su nombre, el conjunto de claves de
+parámetros (un `frozenset` compartido entre todas las acciones con las mismas
+claves, con las cadenas internadas) y los valores canónicos (las formas "A;B" de
+`features` y "(clave,valor)" de `usageLimits`). Al evaluar, solo hay que aplanar el
+plan de HARVEY.
+
+Cada plan se guarda junto con sus acciones serializadas con `marshal` (versión 2,
+como las claves de `metric_cache.py`). Un resultado solo usa el índice si su
+`input.plan.actions` da los mismos bytes; si la pregunta no está o su plan es otro
+(p. ej. resultados de una instanciación anterior), se aplana como siempre.
+Comparar los bytes directamente es más barato que calcular un hash y suficiente
+para planes de unos cientos de bytes.
+Las fuentes pueden ser ficheros de preguntas instanciadas o de resultados (se lee
+`input.plan` o `plan`), y una pregunta puede tener varios planes.
+
+El índice se reconstruye cuando cambia alguna de sus fuentes (tamaño y mtime, y
+SHA-256 si solo cambió el mtime); las fuentes se guardan con su ruta absoluta.
+
+Uso:
+  python3 Evaluation/gold_plan_index.py --questions Experimentation/instantiated_pi_tasks.json
+  python3 Evaluation/generate_evaluation_report.py --input Experimentation/experiment_results_gpt_5_1.json \\
+    --output_dir Evaluation/reports --gold-index
+"""
+import argparse
+import hashlib
+import marshal
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from generate_evaluation_report import DEFAULT_INDEX_PATH, extract_actions, safe_get
+from metric_cache import MARSHAL_VERSION
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Experimentation"))
+from json_stream import iter_selected_records  # noqa: E402
+
+DEFAULT_SOURCES = [os.path.relpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Experimentation",
+                                                 "instantiated_pi_tasks.json"))]
+INDEX_VERSION = 1
+
+# Campos de preguntas instanciadas (`plan`) y de resultados (`input.plan`)
+SOURCE_FIELDS = {"question": None, "plan": {"actions": None},
+                 "input": {"question": None, "plan": {"actions": None}}}
+
+
+def plan_fingerprint(actions: Any) -> bytes:
+    return marshal.dumps(actions, MARSHAL_VERSION)
+
+
+def file_state(path: str) -> Dict:
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {"path": os.path.abspath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": sha256}
+
+
+def source_changed(state: Dict) -> bool:
+    try:
+        st = os.stat(state["path"])
+    except OSError:
+        return True
+    if st.st_size != state["size"]:
+        return True
+    if st.st_mtime_ns == state["mtime_ns"]:
+        return False
+    return file_state(state["path"])["sha256"] != state["sha256"]
+
+
+def _read_header(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+class _Interner:
+    """Comparte cadenas y conjuntos de claves iguales entre todas las acciones compiladas."""
+
+    def __init__(self):
+        self.key_sets = {}
+
+    def action(self, action: Dict) -> Dict:
+        keys = frozenset(sys.intern(k) for k in action["param_keys"])
+        values = {sys.intern(k): sys.intern(v) if isinstance(v, str) else v
+                  for k, v in action["param_values"].items()}
+        return {
+            "name": sys.intern(action["name"]) if isinstance(action["name"], str) else action["name"],
+            "param_keys": self.key_sets.setdefault(keys, keys),
+            "param_values": values,
+        }
+
+
+class GoldPlanIndex:
+    """Acciones aplanadas de los planes de referencia: pregunta -> [(plan serializado, acciones)]."""
+
+    def __init__(self, plans: Dict[str, List], sources: List[Dict], path: Optional[str] = None):
+        self.plans = plans
+        self.sources = sources
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(cls, source_paths: List[str], path: Optional[str] = None) -> "GoldPlanIndex":
+        interner = _Interner()
+        plans: Dict[str, List] = {}
+        for source in source_paths:
+            for record in iter_selected_records(source, SOURCE_FIELDS):
+                item = record.get("input") if "input" in record else record
+                question = safe_get(item, "question")
+                actions = safe_get(item, "plan", "actions")
+                if question is None or actions is None:
+                    continue
+                fingerprint = plan_fingerprint(actions)
+                entries = plans.setdefault(question, [])
+                if all(f != fingerprint for f, _ in entries):
+                    entries.append((fingerprint, [interner.action(a) for a in extract_actions(actions)]))
+        return cls(plans, [file_state(source) for source in source_paths], path)
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": INDEX_VERSION, "sources": self.sources}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.plans, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> Optional["GoldPlanIndex"]:
+        """Índice guardado en `path`, o None si no existe, es de otra versión o sus fuentes cambiaron."""
+        try:
+            with open(path, "rb") as f:
+                header = pickle.load(f)
+                if header.get("version") != INDEX_VERSION or any(source_changed(s) for s in header["sources"]):
+                    return None
+                return cls(pickle.load(f), header["sources"], path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_INDEX_PATH, source_paths: Optional[List[str]] = None,
+             rebuild: bool = False) -> "GoldPlanIndex":
+        """Carga el índice de `path` si está al día y, si no, lo construye y lo guarda.
+
+        Sin `source_paths` se usan las fuentes del índice guardado (o DEFAULT_SOURCES)."""
+        stored = None if rebuild else cls.load(path)
+        if stored is not None and (source_paths is None or
+                                   [s["path"] for s in stored.sources] == [os.path.abspath(p) for p in source_paths]):
+            return stored
+        if source_paths is None:
+            header = _read_header(path)
+            if header is not None and header.get("version") == INDEX_VERSION:
+                source_paths = [s["path"] for s in header["sources"]]
+            else:
+                source_paths = DEFAULT_SOURCES
+        index = cls.build(source_paths, path)
+        index.save()
+        return index
+
+    def lookup(self, question: Any, actions: Any) -> Optional[List[Dict]]:
+        """Acciones aplanadas de `actions` si es el plan indexado de `question`; si no, None."""
+        entries = self.plans.get(question) if isinstance(question, str) else None
+        if entries:
+            fingerprint = plan_fingerprint(actions)
+            for f, compiled in entries:
+                if f == fingerprint:
+                    self.hits += 1
+                    return compiled
+        self.misses += 1
+        return None
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        ratio = (self.hits / lookups) if lookups else 0.0
+        return (
+            f"Gold plan index ({self.path}): {self.hits} plans from the index, {self.misses} flattened "
+            f"({ratio:.1%} hit ratio)"
+        )
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compile the ground-truth plans into a persistent index")
+    p.add_argument("--questions", nargs="+", default=DEFAULT_SOURCES, metavar="JSON",
+                   help="Instantiated questions or experiment results files with the ground-truth plans "
+                        f"(default: {' '.join(DEFAULT_SOURCES)})")
+    p.add_argument("--index", default=DEFAULT_INDEX_PATH, help=f"Index file (default: {DEFAULT_INDEX_PATH})")
+    p.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is up to date")
+    args = p.parse_args()
+
+    start = time.perf_counter()
+    index = GoldPlanIndex.open(args.index, args.questions, rebuild=args.rebuild)
+    plans = sum(len(entries) for entries in index.plans.values())
+    key_sets = {id(a["param_keys"]) for entries in index.plans.values() for _, actions in entries for a in actions}
+    print(f"Gold plan index {args.index}: {len(index.plans)} questions, {plans} plans, "
+          f"{len(key_sets)} distinct parameter key sets ({time.perf_counter() - start:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,7 +28,11 @@ def generate_dataframe_questions_from_file(path: Path) -> pd.DataFrame:
     """
     with path.open('r', encoding='utf-8') as f:
         j = json.load(f)
+    return generate_dataframe_questions(j)
 
+
+def generate_dataframe_questions(j: dict) -> pd.DataFrame:
+    """DataFrame normalizado de los `details` de un informe de evaluación ya cargado."""
     df = pd.json_normalize(j.get('details', []))
     df = df.rename(columns={'question': 'Question'})
     df.insert(0, 'ID', [f'Q{i}' for i in range(1, len(df) + 1)])
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Genera el informe de `generate_evaluation_report.py` leyendo los resultados en
+streaming, con memoria acotada sea cual sea el tamaño del fichero.
+
+Los resultados (array JSON o JSONL) se leen de uno en uno y de cada uno solo se
+decodifican la plantilla, la pregunta y los planes (`input.plan.actions` y
+`api_response.plan.actions`); la respuesta de HARVEY, las suscripciones del
+resultado y el resto de campos se recorren sin construirlos. `details` se escribe
+como JSONL a medida que se calcula, y `overall` y `by_template` se mantienen como
+agregados incrementales: una suma por métrica y un histograma de valores para las
+medianas y los IQRs. Las métricas son cocientes de enteros pequeños, así que los
+histogramas tienen pocas entradas y no crecen con el número de resultados.
+
+Con `--cache` la memoria sigue acotada: la caché de métricas es una base de datos
+SQLite que se consulta por clave, sin cargarla.
+
+`overall` y `by_template` son idénticos a los de `generate_evaluation_report.py`, y
+cada línea del JSONL es la entrada correspondiente de `details`.
+
+Uso:
+  python3 Evaluation/stream_evaluation_report.py --input Experimentation/experiment_results_gpt_5_1.json \\
+    --output_dir Evaluation/reports --outfile evaluation_report.json --details evaluation_details.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, TextIO
+
+from generate_evaluation_report import (DEFAULT_INDEX_PATH, EVALUATED_FIELDS, METRIC_COLUMNS, dump_json, empty_overall,
+                                        evaluate_entries, open_gold_index, overall_entry, template_entry)
+from metric_cache import DEFAULT_CACHE_PATH, MetricCache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Experimentation"))
+from json_stream import iter_selected_records  # noqa: E402
+
+# Desde Python 3.12 `sum()` de floats usa la suma compensada de Neumaier
+COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+
+class RunningSum:
+    """Suma de floats valor a valor, con el mismo resultado que `sum()` sobre la lista completa."""
+
+    __slots__ = ("total", "compensation")
+
+    def __init__(self):
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, x: float) -> None:
+        total = self.total
+        t = total + x
+        if COMPENSATED_SUM:
+            if abs(total) >= abs(x):
+                self.compensation += (total - t) + x
+            else:
+                self.compensation += (x - t) + total
+        self.total = t
+
+    def value(self) -> float:
+        c = self.compensation
+        if c and math.isfinite(c):
+            return self.total + c
+        return self.total
+
+
+def order_statistics(histogram: Counter) -> Callable[[int], float]:
+    """Función k -> k-ésimo valor (desde 0) de los datos ordenados que resume `histogram`."""
+    values = sorted(histogram)
+    ends = list(accumulate(histogram[v] for v in values))
+    return lambda k: values[bisect_right(ends, k)]
+
+
+def histogram_median(at: Callable[[int], float], n: int) -> float:
+    """Igual que `statistics.median` sobre los datos ordenados."""
+    i = n // 2
+    if n % 2 == 1:
+        return float(at(i))
+    return float((at(i - 1) + at(i)) / 2)
+
+
+def histogram_iqr(at: Callable[[int], float], n: int) -> float:
+    """Q3 - Q1 de `statistics.quantiles(n=4)` (método 'exclusive'); 0.0 con menos de dos valores."""
+    if n < 2:
+        return 0.0
+    quartiles = []
+    for i in (1, 3):
+        j = min(max(i * (n + 1) // 4, 1), n - 1)
+        delta = i * (n + 1) - j * 4
+        quartiles.append((at(j - 1) * (4 - delta) + at(j) * delta) / 4)
+    return float(quartiles[1] - quartiles[0])
+
+
+class RunningMetrics:
+    """Agregados incrementales de las métricas de METRIC_COLUMNS de un grupo de preguntas."""
+
+    def __init__(self):
+        self.count = 0
+        self.sums = [RunningSum() for _ in METRIC_COLUMNS]
+        self.histograms = [Counter() for _ in METRIC_COLUMNS]
+
+    def add(self, values: List[float]) -> None:
+        self.count += 1
+        for value, total, histogram in zip(values, self.sums, self.histograms):
+            total.add(value)
+            histogram[value] += 1
+
+    def statistics(self):
+        """(medias, medianas, IQRs), en el orden de METRIC_COLUMNS."""
+        n = self.count
+        means = [total.value() / n for total in self.sums]
+        medians, iqrs = [], []
+        for histogram in self.histograms:
+            at = order_statistics(histogram)
+            medians.append(histogram_median(at, n))
+            iqrs.append(histogram_iqr(at, n))
+        return means, medians, iqrs
+
+
+class StreamingReport:
+    """`overall` y `by_template` calculados entrada a entrada de `details`."""
+
+    def __init__(self):
+        self.overall = RunningMetrics()
+        self.groups: Dict[str, RunningMetrics] = {}
+
+    def add(self, detail: Dict, key: str) -> None:
+        values = [detail[section][name] for section, name, _, _ in METRIC_COLUMNS]
+        self.overall.add(values)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = RunningMetrics()
+        group.add(values)
+
+    def report(self) -> Dict:
+        overall = overall_entry(*self.overall.statistics()) if self.overall.count else empty_overall()
+        by_template = {key: template_entry(*group.statistics()) for key, group in self.groups.items()}
+        return {"overall": overall, "by_template": by_template}
+
+
+def stream_report(input_path: str, details_file: Optional[TextIO] = None, cache: Optional[MetricCache] = None,
+                  gold_index=None) -> Dict:
+    """Informe (`overall` y `by_template`) de un fichero de resultados, escribiendo `details` como JSONL."""
+    report = StreamingReport()
+    records = iter_selected_records(input_path, EVALUATED_FIELDS)
+    for detail in evaluate_entries(records, cache=cache, gold_index=gold_index):
+        report.add(detail, detail["template"] or "Unknown")
+        if details_file is not None:
+            details_file.write(json.dumps(detail, ensure_ascii=False))
+            details_file.write("\n")
+    return report.report()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--input", required=True, help="Path to experiment_results.json (JSON array or JSONL)")
+    p.add_argument("--output_dir", required=True, help="Directory to write the report")
+    p.add_argument("--outfile", default="evaluation_report_generated.json", help="Output filename")
+    p.add_argument("--details", default=None,
+                   help="Filename of the JSONL details (default: <outfile>_details.jsonl)")
+    p.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None, metavar="PATH",
+                   help=f"Reuse the metrics of already evaluated plans from a cache file (default: {DEFAULT_CACHE_PATH})")
+    p.add_argument("--gold-index", nargs="?", const=DEFAULT_INDEX_PATH, default=None, metavar="PATH",
+                   help=f"Take the flattened ground-truth plans from a gold plan index (default: {DEFAULT_INDEX_PATH})")
+    args = p.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    outpath = os.path.join(args.output_dir, args.outfile)
+    details_path = os.path.join(args.output_dir, args.details or f"{os.path.splitext(args.outfile)[0]}_details.jsonl")
+    cache = MetricCache(args.cache) if args.cache else None
+    gold_index = open_gold_index(args.gold_index)
+    with open(details_path, "w", encoding="utf-8") as fh:
+        report = stream_report(args.input, fh, cache, gold_index)
+    dump_json(report, outpath)
+    print(f"Wrote evaluation report to {outpath} and details to {details_path}")
+    if cache is not None:
+        cache.save()
+        print(cache.summary())
+        cache.close()
+    if gold_index is not None:
+        print(gold_index.summary())
+
+
+if __name__ == "__main__":
+    main()
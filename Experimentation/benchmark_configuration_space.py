@@ -0,0 +1,55 @@
+"""Solve time of the local configuration-space solver over the whole pricing corpus.
+
+For every YAML under `--root`, builds the ConfigurationSpace (all plan blocks) and
+times a `subscriptions` cardinality and an `optimal` (minimize and maximize)
+action without filters and with a one-feature `maxPrice` filter. Prints the
+largest configuration spaces and the overall times.
+
+Usage (from the project root):
+  python3 Experimentation/benchmark_configuration_space.py --top 5
+"""
+import argparse
+import time
+
+from configuration_space import ConfigurationSpace
+from pricing_index import DEFAULT_ROOT, yaml_paths
+from pricing_parse_cache import ParsedPricingCache
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def solve_all(space, filters):
+    return space.cardinality(filters), space.optimal(filters, "minimize"), space.optimal(filters, "maximize")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local configuration-space solver")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Directory of the pricing YAMLs (default: {DEFAULT_ROOT})")
+    parser.add_argument("--top", type=int, default=5, help="Largest configuration spaces to list (default: 5)")
+    args = parser.parse_args()
+
+    documents = ParsedPricingCache().preload(yaml_paths(args.root))
+    rows = []
+    for path, data in documents.items():
+        space, build = timed(lambda: ConfigurationSpace(data, path))
+        size, blocks = timed(space.size)
+        filters = {"features": space.features[-1:], "maxPrice": 100}
+        _, unfiltered = timed(lambda: solve_all(space, {}))
+        _, filtered = timed(lambda: solve_all(space, filters))
+        rows.append((size, path, build + blocks, unfiltered, filtered))
+
+    rows.sort(key=lambda row: row[0], reverse=True)
+    print(f"{'configurations':>14}  {'build':>9}  {'no filter':>9}  {'filtered':>9}  pricing")
+    for size, path, build, unfiltered, filtered in rows[:args.top]:
+        print(f"{size:>14,}  {build * 1000:7.2f}ms  {unfiltered * 1000:7.2f}ms  {filtered * 1000:7.2f}ms  {path}")
+    print(f"{len(rows)} pricing files, {sum(row[0] for row in rows):,} configurations: "
+          f"build {sum(row[2] for row in rows):.3f}s, solve {sum(row[3] + row[4] for row in rows):.3f}s; "
+          f"slowest file {max(row[2] + row[3] + row[4] for row in rows) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
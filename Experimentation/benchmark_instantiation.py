@@ -0,0 +1,82 @@
+"""Throughput of question instantiation: precompiled templates vs per-instance substitution.
+
+The spec's instances are cycled up to `--instances` (1M by default) and instantiated
+twice: once with the original per-instance path (`replace_placeholders_in_text`,
+`instantiate_plan_with_placeholders`, `apply_plan_overrides`), and once with
+`iter_instantiated_questions`, which compiles every template once. Before timing,
+the JSON output of both paths is checked to be byte-identical for the whole spec.
+
+Usage (from the project root):
+  python3 Experimentation/benchmark_instantiation.py --instances 1000000
+"""
+import argparse
+import io
+import itertools
+import json
+import time
+
+from generate_instantiated_questions import (apply_plan_overrides, instantiate_plan_with_placeholders,
+                                             iter_instantiated_questions, replace_placeholders_in_text)
+from json_stream import write_records
+
+
+def iter_reference(templates, instances):
+    """The per-instance instantiation used before templates were precompiled."""
+    for inst_spec in instances:
+        template_entry = templates[inst_spec["template_index"]]
+        placeholder_values = inst_spec["placeholder_values"]
+        question_override = inst_spec.get("question_override")
+        if question_override is not None:
+            question = question_override
+        else:
+            question = replace_placeholders_in_text(template_entry["question"], placeholder_values)
+        base_plan = instantiate_plan_with_placeholders(template_entry["plan"], placeholder_values)
+        yield {
+            "template": template_entry["question"],
+            "question": question,
+            "plan": apply_plan_overrides(base_plan, inst_spec.get("plan_overrides")),
+            "pricing_paths": inst_spec["pricing_paths"],
+        }
+
+
+def dump(records):
+    out = io.StringIO()
+    write_records(records, out)
+    return out.getvalue()
+
+
+def time_instantiation(generate, templates, instances, n):
+    start = time.perf_counter()
+    for _ in generate(templates, itertools.islice(itertools.cycle(instances), n)):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precompiled template instantiation")
+    parser.add_argument("--templates", default="Experimentation/pi_task_templates.json")
+    parser.add_argument("--spec", default="Experimentation/instantiation_spec.json")
+    parser.add_argument("--instances", type=int, default=1_000_000, help="Instances to generate (default: 1000000)")
+    args = parser.parse_args()
+
+    with open(args.templates, "r") as f:
+        templates = json.load(f)
+    with open(args.spec, "r") as f:
+        instances = json.load(f)["instances"]
+
+    reference = dump(iter_reference(templates, instances))
+    compiled = dump(iter_instantiated_questions(templates, instances))
+    if reference != compiled:
+        raise SystemExit("Precompiled templates produce a different output than the reference path")
+    print(f"Output of {len(instances)} spec instances is byte-identical ({len(compiled)} bytes)")
+
+    timings = {}
+    for label, generate in (("reference", iter_reference), ("precompiled", iter_instantiated_questions)):
+        seconds = time_instantiation(generate, templates, instances, args.instances)
+        timings[label] = seconds
+        print(f"{label:<12} {args.instances} instances in {seconds:.2f}s ({args.instances / seconds:,.0f} instances/s)")
+    print(f"Speedup: {timings['reference'] / timings['precompiled']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cold YAML parse vs parse cache for the whole pricing corpus.
+
+Measures, over every YAML under `--root`:
+- a plain YAML parse of every file (what every tool did before the cache),
+- filling an empty cache with the process pool (`--workers`),
+- loading everything from the warm cache in a new ParsedPricingCache,
+and checks that the cached documents are equal to the parsed ones.
+
+Usage (from the project root):
+  python3 Experimentation/benchmark_parse_cache.py --workers 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from pricing_index import DEFAULT_ROOT, yaml_paths
+from pricing_parse_cache import ParsedPricingCache, parse_yaml
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pricing YAML parse cache")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Directory of the pricing YAMLs (default: {DEFAULT_ROOT})")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to fill the cache (default: CPUs)")
+    parser.add_argument("--repeat", type=int, default=3, help="Warm loads to average (default: 3)")
+    args = parser.parse_args()
+
+    paths = yaml_paths(args.root)
+    cache_dir = tempfile.mkdtemp(prefix="pricing_parse_cache_")
+    try:
+        parsed, cold = timed(lambda: {p: parse_yaml(p)[1] for p in paths})
+        _, fill = timed(lambda: ParsedPricingCache(cache_dir).preload(paths, workers=args.workers))
+        warm_times = []
+        for _ in range(args.repeat):
+            cached, seconds = timed(lambda: ParsedPricingCache(cache_dir).preload(paths))
+            warm_times.append(seconds)
+        warm = sum(warm_times) / len(warm_times)
+        if cached != parsed:
+            raise SystemExit("Cached documents differ from the parsed YAML")
+
+        print(f"{len(paths)} pricing files")
+        print(f"cold YAML parse        {cold:7.3f}s")
+        print(f"cache fill             {fill:7.3f}s (workers: {args.workers or os.cpu_count()})")
+        print(f"warm cache load        {warm:7.3f}s ({warm / cold:.1%} of the cold parse, {cold / warm:.0f}x faster)")
+        single, seconds = timed(lambda: ParsedPricingCache(cache_dir).load(paths[-1]))
+        print(f"lazy load of one file  {seconds * 1000:7.2f}ms")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
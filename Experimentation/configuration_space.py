@@ -0,0 +1,539 @@
+"""Local solver over the configuration space of a Pricing2Yaml file.
+
+HARVEY answers `subscriptions` and `optimal` actions with a MiniZinc solver. This
+module computes the same answers locally, so the `result.subscriptions`,
+`cardinality` and `optimal` returned by HARVEY can be checked offline.
+
+A configuration is a plan plus a set of add-ons (each add-on at most once). An
+add-on must be available for the plan (`availableFor`), its `dependsOn` add-ons
+must be selected too and none of its `excludes`. Pricings without plans only
+have add-on configurations (with at least one add-on). A configuration includes
+the features of its plan and add-ons; its usage limits are the plan's values,
+raised by the add-ons' `usageLimits` and increased by their
+`usageLimitsExtensions`; its cost is the sum of the prices. Non-numeric prices
+('Contact Sales', ...) make the cost unknown (NaN). A configuration with an
+unknown cost never passes `minPrice`/`maxPrice` and is never optimal.
+Add-on quantities are not modelled: HARVEY steps that return an add-on more than
+once get the `unsupported_quantities` status instead of match/mismatch.
+
+For every plan, the configurations are the subsets of its available add-ons.
+Subset `s` is the integer whose bit `i` selects the plan's i-th add-on, so the
+whole block is `np.arange(2 ** k)`. Features are bitsets (Python ints). Prices
+and usage limits are NumPy arrays over the block, built by doubling:
+`values[2**i:2**(i+1)] = values[:2**i] + addon_i`. Filters then become boolean
+masks, and objectives become argmin/argmax over the masked prices.
+
+Usage (from the project root):
+  python3 Experimentation/configuration_space.py --pricing data/pricings/spectra/clickup/2025.yml \\
+    --action optimal --filters '{"features": ["timeTracking"], "maxPrice": 20}' --objective minimize
+  python3 Experimentation/configuration_space.py --check Experimentation/experiment_results_gpt_5_1.json
+"""
+import argparse
+import json
+import math
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from pricing_index import is_included, numeric_price
+from pricing_parse_cache import ParsedPricingCache
+
+ACTIONS = ("subscriptions", "optimal")
+OBJECTIVES = ("minimize", "maximize")
+MAX_ADDONS_PER_PLAN = 24  # 2**24 configurations per plan
+COST_TOLERANCE = 1e-6
+# pricingContext of a step over the N-th (1-based) of several uploaded pricing files
+UPLOADED_PRICING = re.compile(r"uploaded://pricing/(\d+)")
+
+
+class SolverError(Exception):
+    pass
+
+
+def numeric_limit(value):
+    """Usage limit value as a float (booleans as 0/1, .inf kept); NaN for text values."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return math.nan
+
+
+def _plain_number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _bits(names, positions):
+    mask = 0
+    for name in names:
+        if name in positions:
+            mask |= 1 << positions[name]
+    return mask
+
+
+def _subset_values(base, deltas, combine=np.add):
+    """Value of every add-on subset: values[s] = combine(base, deltas[i] for each bit i of s)."""
+    values = np.empty(1 << len(deltas), dtype=np.float64)
+    values[0] = base
+    for i, delta in enumerate(deltas):
+        n = 1 << i
+        combine(values[:n], delta, out=values[n:2 * n])
+    return values
+
+
+class _PlanBlock:
+    """All add-on subsets of one plan, with their validity and cost."""
+
+    def __init__(self, space, plan_index):
+        self.space = space
+        self.plan_index = plan_index
+        addons = [a for a in range(len(space.addons))
+                  if plan_index is None or space.addon_available[a] >> plan_index & 1]
+        # An add-on whose dependencies are not available for this plan can never be selected
+        while True:
+            available = sum(1 << a for a in addons)
+            kept = [a for a in addons if space.addon_depends[a] & available == space.addon_depends[a]]
+            if len(kept) == len(addons):
+                break
+            addons = kept
+        if len(addons) > MAX_ADDONS_PER_PLAN:
+            raise SolverError(f"{len(addons)} add-ons available for plan {space.plan_name(plan_index)}; "
+                              f"at most {MAX_ADDONS_PER_PLAN} are supported")
+        self.addons = addons
+        local = {space.addons[a]: i for i, a in enumerate(addons)}
+        self.subsets = np.arange(1 << len(addons), dtype=np.uint32)
+
+        valid = np.ones(len(self.subsets), dtype=bool)
+        if plan_index is None:
+            valid[0] = False
+        for i, a in enumerate(addons):
+            excludes = _bits(space.addon_excludes_names[a], local)
+            depends = _bits(space.addon_depends_names[a], local)
+            if not excludes and not depends:
+                continue
+            selected = (self.subsets >> np.uint32(i)) & np.uint32(1) == 1
+            broken = np.zeros(len(self.subsets), dtype=bool)
+            if excludes:
+                broken |= self.subsets & np.uint32(excludes) != 0
+            if depends:
+                broken |= self.subsets & np.uint32(depends) != np.uint32(depends)
+            valid &= ~(selected & broken)
+        self.valid = valid
+
+        base_price = 0.0 if plan_index is None else space.plan_prices[plan_index]
+        self.prices = _subset_values(base_price, [space.addon_prices[a] for a in addons])
+        self.known_price = ~np.isnan(self.prices)
+        self._limits = {}
+
+    def limit_values(self, limit_index):
+        values = self._limits.get(limit_index)
+        if values is None:
+            space = self.space
+            base = space.default_limits[limit_index] if self.plan_index is None \
+                else space.plan_limits[self.plan_index, limit_index]
+            raised = [space.addon_limits[a, limit_index] for a in self.addons]
+            values = _subset_values(base, [-math.inf if math.isnan(v) else v for v in raised], np.maximum)
+            values += _subset_values(0.0, [space.addon_extensions[a, limit_index] for a in self.addons])
+            self._limits[limit_index] = values
+        return values
+
+    def feature_mask(self, feature_bit):
+        """Subsets that include the feature (through the plan or one of the selected add-ons)."""
+        if self.plan_features & feature_bit:
+            return None
+        providers = sum(1 << i for i, a in enumerate(self.addons) if self.space.addon_features[a] & feature_bit)
+        if not providers:
+            return False
+        return self.subsets & np.uint32(providers) != 0
+
+    @property
+    def plan_features(self):
+        space = self.space
+        return space.default_features if self.plan_index is None else space.plan_features[self.plan_index]
+
+    def match(self, filters):
+        """Boolean mask of the valid subsets that pass `filters`."""
+        mask = self.valid.copy()
+        space = self.space
+        for name in filters.get("features") or []:
+            bit = space.feature_bits.get(name, 0)
+            included = self.feature_mask(bit) if bit else False
+            if included is False:
+                mask[:] = False
+                return mask
+            if included is not None:
+                mask &= included
+        for name, value in iter_usage_limit_filters(filters):
+            limit_index = space.limit_positions.get(name)
+            if limit_index is None:
+                mask[:] = False
+                return mask
+            mask &= self.limit_values(limit_index) >= value
+        if filters.get("minPrice") is not None:
+            mask &= self.prices >= float(filters["minPrice"])
+        if filters.get("maxPrice") is not None:
+            mask &= self.prices <= float(filters["maxPrice"])
+        return mask
+
+    def addon_names(self, subset):
+        subset = int(subset)
+        return [self.space.addons[a] for i, a in enumerate(self.addons) if subset >> i & 1]
+
+
+def iter_usage_limit_filters(filters):
+    """HARVEY sends usage limits as [{"name": value}, ...]; a plain mapping is accepted too."""
+    usage_limits = filters.get("usageLimits") or []
+    if isinstance(usage_limits, dict):
+        usage_limits = [usage_limits]
+    for entry in usage_limits:
+        for name, value in entry.items():
+            yield name, float(value)
+
+
+class ConfigurationSpace:
+    """Plans, add-ons and their constraints of one parsed Pricing2Yaml document."""
+
+    def __init__(self, data, path=None):
+        data = data or {}
+        self.path = path
+        self.currency = data.get("currency")
+
+        features = data.get("features") or {}
+        self.features = list(features)
+        self.feature_bits = {name: 1 << i for i, name in enumerate(self.features)}
+        self.default_features = _bits([n for n, f in features.items() if is_included((f or {}).get("defaultValue"))],
+                                      {n: i for i, n in enumerate(self.features)})
+
+        usage_limits = {name: ul or {} for name, ul in (data.get("usageLimits") or {}).items()}
+        self.limits = [name for name, ul in usage_limits.items() if ul.get("valueType") in ("NUMERIC", "BOOLEAN")]
+        self.limit_positions = {name: i for i, name in enumerate(self.limits)}
+        self.default_limits = np.array([numeric_limit(usage_limits[n].get("defaultValue")) for n in self.limits])
+
+        plans = {name: plan or {} for name, plan in (data.get("plans") or {}).items()}
+        self.plans = list(plans)
+        self.plan_features = [self._feature_set(plan.get("features"), self.default_features) for plan in plans.values()]
+        self.plan_limits = np.array([self._limit_row(plan.get("usageLimits"), self.default_limits)
+                                     for plan in plans.values()]).reshape(len(plans), len(self.limits))
+        self.plan_prices = np.array([self._price(plan.get("price")) for plan in plans.values()])
+
+        addons = {name: addon or {} for name, addon in (data.get("addOns") or {}).items()}
+        self.addons = list(addons)
+        unset = np.full(len(self.limits), math.nan)
+        plan_positions = {name: i for i, name in enumerate(self.plans)}
+        self.addon_features = [self._feature_set(addon.get("features"), 0) for addon in addons.values()]
+        self.addon_limits = np.array([self._limit_row(addon.get("usageLimits"), unset)
+                                      for addon in addons.values()]).reshape(len(addons), len(self.limits))
+        self.addon_extensions = np.nan_to_num(np.array([self._limit_row(addon.get("usageLimitsExtensions"), unset)
+                                                        for addon in addons.values()]).reshape(len(addons), len(self.limits)))
+        self.addon_prices = np.array([self._price(addon.get("price")) for addon in addons.values()])
+        all_plans = (1 << len(self.plans)) - 1
+        self.addon_available = [all_plans if addon.get("availableFor") is None
+                                else _bits(addon["availableFor"], plan_positions) for addon in addons.values()]
+        # Exclusions are symmetric; unknown add-on names are ignored
+        self.addon_excludes_names = [set(addon.get("excludes") or []) & set(addons) for addon in addons.values()]
+        for name, excludes in zip(self.addons, list(self.addon_excludes_names)):
+            for other in excludes:
+                self.addon_excludes_names[self.addons.index(other)].add(name)
+        self.addon_depends_names = [list(addon.get("dependsOn") or []) for addon in addons.values()]
+        addon_positions = {name: i for i, name in enumerate(self.addons)}
+        # A dependency on an add-on that does not exist can never be satisfied
+        self.addon_depends = [_bits(names, addon_positions) if set(names) <= set(addons) else -1
+                              for names in self.addon_depends_names]
+        self._blocks = {}
+
+    def _feature_set(self, values, defaults):
+        included = defaults
+        for name, entry in (values or {}).items():
+            bit = self.feature_bits.get(name)
+            if bit is None:
+                continue
+            if is_included((entry or {}).get("value")):
+                included |= bit
+            else:
+                included &= ~bit
+        return included
+
+    def _limit_row(self, values, defaults):
+        row = np.array(defaults, dtype=np.float64)
+        for name, entry in (values or {}).items():
+            position = self.limit_positions.get(name)
+            if position is not None and "value" in (entry or {}):
+                row[position] = numeric_limit(entry["value"])
+        return row
+
+    @staticmethod
+    def _price(value):
+        price = numeric_price(value)
+        return math.nan if price is None else float(price)
+
+    def plan_name(self, plan_index):
+        return None if plan_index is None else self.plans[plan_index]
+
+    def blocks(self):
+        indices = range(len(self.plans)) if self.plans else [None]
+        for plan_index in indices:
+            block = self._blocks.get(plan_index)
+            if block is None:
+                block = self._blocks[plan_index] = _PlanBlock(self, plan_index)
+            yield block
+
+    def size(self):
+        """Number of valid configurations."""
+        return sum(int(block.valid.sum()) for block in self.blocks())
+
+    def matches(self, filters=None):
+        """(block, subsets) of the configurations that pass `filters`, plan by plan."""
+        filters = filters or {}
+        for block in self.blocks():
+            mask = block.match(filters)
+            yield block, block.subsets[mask]
+
+    def cardinality(self, filters=None):
+        return sum(len(subsets) for _, subsets in self.matches(filters))
+
+    def keys(self, filters=None):
+        """(plan, sorted add-ons) of every configuration that passes `filters`."""
+        return {(self.plan_name(block.plan_index), tuple(sorted(block.addon_names(s))))
+                for block, subsets in self.matches(filters) for s in subsets}
+
+    def describe(self, block, subset):
+        """A configuration in the shape of HARVEY's `subscription` entries, with a numeric `cost`."""
+        addon_indices = [a for i, a in enumerate(block.addons) if int(subset) >> i & 1]
+        features = block.plan_features
+        for a in addon_indices:
+            features |= self.addon_features[a]
+        usage_limits = [{name: _plain_number(block.limit_values(i)[subset])} for i, name in enumerate(self.limits)]
+        cost = float(block.prices[subset])
+        return {
+            "subscription": {
+                "plan": self.plan_name(block.plan_index),
+                "addOns": [self.addons[a] for a in addon_indices],
+                "features": [name for name in self.features if features & self.feature_bits[name]],
+                "usageLimits": usage_limits,
+            },
+            "cost": None if math.isnan(cost) else cost,
+        }
+
+    def subscriptions(self, filters=None, limit=None):
+        """`subscriptions` action: the matching configurations (at most `limit`) and their number."""
+        subscriptions = []
+        cardinality = 0
+        for block, subsets in self.matches(filters):
+            cardinality += len(subsets)
+            for subset in subsets[:None if limit is None else max(limit - len(subscriptions), 0)]:
+                subscriptions.append(self.describe(block, subset))
+        return {"subscriptions": subscriptions, "cardinality": cardinality}
+
+    def optimal(self, filters=None, objective="minimize"):
+        """`optimal` action: the cheapest (or most expensive) matching configuration with a known cost."""
+        if objective not in OBJECTIVES:
+            raise SolverError(f"Unknown objective {objective!r}; expected one of {', '.join(OBJECTIVES)}")
+        minimize = objective == "minimize"
+        candidates = []
+        for block in self.blocks():
+            mask = block.match(filters or {}) & block.known_price
+            if not mask.any():
+                continue
+            prices = np.where(mask, block.prices, math.inf if minimize else -math.inf)
+            subset = int(np.argmin(prices) if minimize else np.argmax(prices))
+            candidates.append((float(prices[subset]), block, subset, prices))
+        if not candidates:
+            return {"optimal": None, "cost": None, "ties": 0}
+        pick = min if minimize else max
+        best, block, subset, _ = pick(candidates, key=lambda c: c[0])
+        # No masked price is better than `best`, so one comparison per block counts the ties
+        if minimize:
+            ties = sum(int(np.count_nonzero(prices <= best + COST_TOLERANCE)) for _, _, _, prices in candidates)
+        else:
+            ties = sum(int(np.count_nonzero(prices >= best - COST_TOLERANCE)) for _, _, _, prices in candidates)
+        return {"optimal": self.describe(block, subset), "cost": best, "ties": ties}
+
+    def evaluate(self, plan, addons):
+        """(block, subset) of a given configuration (e.g. returned by HARVEY), or None if it is not valid."""
+        plan_index = None
+        if self.plans:
+            if plan not in self.plans:
+                return None
+            plan_index = self.plans.index(plan)
+        block = next(b for b in self.blocks() if b.plan_index == plan_index)
+        local = {self.addons[a]: i for i, a in enumerate(block.addons)}
+        if any(name not in local for name in addons):
+            return None
+        subset = _bits(set(addons), local)
+        return block, subset
+
+
+def load_space(path, parse_cache=None):
+    parse_cache = parse_cache or ParsedPricingCache()
+    return ConfigurationSpace(parse_cache.load(path), path)
+
+
+def _configuration_key(subscription):
+    addons = subscription.get("addOns") or []
+    return subscription.get("plan"), tuple(sorted(set(addons))), len(addons) != len(set(addons))
+
+
+def _harvey_cost(cost):
+    """HARVEY formats costs as '70 $'; non-numeric costs are explanatory messages."""
+    try:
+        return float(str(cost).split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def iter_solver_steps(entry):
+    """(action, request, result, pricing context) of the subscriptions/optimal steps of one experiment result."""
+    result = (entry.get("api_response") or {}).get("result")
+    if not isinstance(result, dict):
+        return
+    for step in result.get("steps") or [result]:
+        if step.get("action") not in ACTIONS:
+            continue
+        payload = step.get("payload") or {}
+        yield step["action"], payload.get("request") or {}, payload.get("result") or {}, step.get("pricingContext")
+
+
+def step_pricing(paths, context):
+    """Pricing file a step was solved over: the only uploaded file, or the N-th for `uploaded://pricing/N`."""
+    if len(paths) == 1:
+        return paths[0]
+    match = UPLOADED_PRICING.fullmatch(str(context or ""))
+    if match and 1 <= int(match.group(1)) <= len(paths):
+        return paths[int(match.group(1)) - 1]
+    return None
+
+
+def check_step(space, action, request, result):
+    """Compare one HARVEY subscriptions/optimal result with the local solution."""
+    filters = request.get("filters") or {}
+    report = {"action": action, "filters": filters}
+    if "error" in result:
+        report.update(status="harvey_error", error=result["error"])
+        return report
+
+    if action == "subscriptions":
+        expected = space.keys(filters)
+        returned = [_configuration_key(s.get("subscription") or {}) for s in result.get("subscriptions") or []]
+        got = {(plan, addons) for plan, addons, _ in returned}
+        report.update(
+            expected_cardinality=len(expected),
+            harvey_cardinality=result.get("cardinality"),
+            missing=len(expected - got),
+            unexpected=len(got - expected),
+            addon_quantities=any(repeated for _, _, repeated in returned),
+            examples={"missing": [list(k) for k in sorted(expected - got, key=str)[:3]],
+                      "unexpected": [list(k) for k in sorted(got - expected, key=str)[:3]]},
+        )
+        if report["addon_quantities"]:
+            # HARVEY counts add-on quantity variants, which this solver does not model
+            report["status"] = "unsupported_quantities"
+        else:
+            same = expected == got and result.get("cardinality") == len(expected)
+            report["status"] = "match" if same else "mismatch"
+        return report
+
+    objective = request.get("objective") or "minimize"
+    solution = space.optimal(filters, objective)
+    report.update(objective=objective, expected_cost=solution["cost"], ties=solution["ties"])
+    returned = (result.get("optimal") or {}).get("subscription")
+    if returned is None:
+        report["status"] = "match" if solution["optimal"] is None else "mismatch"
+        return report
+    plan, addons, repeated = _configuration_key(returned)
+    report.update(harvey_configuration=[plan, list(addons)], harvey_cost=_harvey_cost(result["optimal"].get("cost")),
+                  addon_quantities=repeated)
+    if repeated:
+        # The configuration would be priced with every add-on counted once
+        report["status"] = "unsupported_quantities"
+        return report
+    located = space.evaluate(plan, addons)
+    if located is None:
+        report["status"] = "invalid_configuration"
+        return report
+    block, subset = located
+    if not block.match(filters)[subset]:
+        report["status"] = "fails_filters"
+        return report
+    cost = float(block.prices[subset])
+    if math.isnan(cost):
+        report.update(configuration_cost=None, status="unknown_cost")
+        return report
+    report["configuration_cost"] = cost
+    same = solution["cost"] is not None and abs(cost - solution["cost"]) <= COST_TOLERANCE
+    report["status"] = "match" if same else "not_optimal"
+    return report
+
+
+def check_results(results, parse_cache=None):
+    """Check every subscriptions/optimal step of an experiment results file against the local solver."""
+    parse_cache = parse_cache or ParsedPricingCache()
+    spaces = {}
+    checks = []
+    for position, entry in enumerate(results):
+        paths = (entry.get("input") or {}).get("pricing_paths") or []
+        for action, request, result, context in iter_solver_steps(entry):
+            path = step_pricing(paths, context)
+            if path is None:
+                checks.append({"index": position, "action": action, "status": "skipped",
+                               "reason": f"pricing context {context!r} over {len(paths)} pricing files"})
+                continue
+            if path not in spaces:
+                spaces[path] = load_space(path, parse_cache)
+            start = time.perf_counter()
+            try:
+                check = check_step(spaces[path], action, request, result)
+            except SolverError as e:
+                check = {"action": action, "status": "solver_error", "error": str(e)}
+            check.update(index=position, pricing=path, solve_ms=round((time.perf_counter() - start) * 1000, 3))
+            checks.append(check)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve subscriptions/optimal actions locally over a pricing YAML")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--pricing", help="Pricing YAML to solve")
+    mode.add_argument("--check", metavar="RESULTS_JSON", help="Check the HARVEY results of an experiment results file")
+    parser.add_argument("--action", choices=ACTIONS, default="subscriptions")
+    parser.add_argument("--filters", default="{}", help="Filters as JSON (minPrice, maxPrice, features, usageLimits)")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="minimize")
+    parser.add_argument("--limit", type=int, default=20, help="Configurations to print for subscriptions (default: 20)")
+    parser.add_argument("--output", help="Write the check report to this JSON file")
+    args = parser.parse_args()
+
+    if args.pricing:
+        space = load_space(args.pricing)
+        filters = json.loads(args.filters)
+        start = time.perf_counter()
+        if args.action == "subscriptions":
+            solution = space.subscriptions(filters, limit=args.limit)
+        else:
+            solution = space.optimal(filters, args.objective)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(solution, indent=2))
+        print(f"{space.size()} valid configurations; solved in {elapsed * 1000:.2f}ms")
+        return
+
+    with open(args.check, "r") as f:
+        results = json.load(f)
+    checks = check_results(results)
+    statuses = Counter(check["status"] for check in checks)
+    print(f"{len(checks)} subscriptions/optimal steps checked: "
+          + ", ".join(f"{count} {status}" for status, count in statuses.most_common()))
+    if statuses["skipped"]:
+        print(f"Warning: {statuses['skipped']} of {len(checks)} steps ({statuses['skipped'] / len(checks):.1%}) "
+              "were skipped because their pricing file could not be resolved")
+    solve_ms = [check["solve_ms"] for check in checks if "solve_ms" in check]
+    if solve_ms:
+        print(f"Local solve time: max {max(solve_ms):.2f}ms, total {sum(solve_ms):.1f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": dict(statuses), "checks": checks}, f, indent=2)
+        print(f"Check report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import argparse
 import json
+import os
 import re
+import sys
+from collections.abc import Iterator
 from copy import deepcopy
 from pathlib import Path
 
+from json_stream import FORMATS, StreamComparison, format_for_path, iter_json_array, iter_records, write_records
+from question_manifest import (PricingHasher, instance_hash, instance_key, load_manifest, save_changes, save_manifest,
+                               stable_hash)
+
 PLACEHOLDER_RE = re.compile(r"\{\{([^}]+)\}\}")
 
 
@@ -75,46 +82,224 @@ def apply_plan_overrides(plan: dict, overrides: dict | None) -> dict:
     return plan
 
 
-def generate_instantiated_questions(templates: list[dict], spec: dict) -> list[dict]:
+class CompiledTemplate:
     """
-    Genera la lista completa de objetos InstantiatedQuestion a partir de:
-    - templates: lista leída de question_action_templates.json
-    - spec: diccionario leido de instantiation_spec.json
+    Plantilla precompilada: el texto de la pregunta se divide una sola vez en segmentos
+    literales y nombres de placeholder, y del plan se guardan las posiciones (claves/índices)
+    de los strings que son exactamente '{{NOMBRE}}'.
+
+    Instanciar solo rellena esos huecos: se copian los contenedores que hay en el camino
+    hasta cada hueco y el resto del árbol se comparte con la plantilla, así que los planes
+    generados deben tratarse como de solo lectura. El resultado es idéntico al de
+    replace_placeholders_in_text + instantiate_plan_with_placeholders + apply_plan_overrides.
     """
-    instances = spec["instances"]
-    out: list[dict] = []
 
-    for inst_spec in instances:
-        template_index = inst_spec["template_index"]
-        template_entry = templates[template_index]
+    def __init__(self, template_entry: dict):
+        self.question = template_entry["question"]
+        self.plan = template_entry["plan"]
 
-        placeholder_values = inst_spec["placeholder_values"]
-        question_override = inst_spec.get("question_override")
-        plan_overrides = inst_spec.get("plan_overrides")
-        pricing_paths = inst_spec["pricing_paths"]
+        parts = PLACEHOLDER_RE.split(self.question)
+        # split con un grupo alterna literal, nombre, literal, ..., literal
+        self.literals = parts[0::2]
+        self.names = parts[1::2]
 
-        template_question = template_entry["question"]
+        # Árbol de copia: para cada contenedor con huecos, (contenedor, [(clave, nombre | subárbol)])
+        self.plan_slots = self._compile_slots(self.plan)
 
-        # Pregunta final
-        if question_override is not None:
-            question = question_override
+    @classmethod
+    def _compile_slots(cls, node):
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            return None
+        slots = []
+        for k, v in items:
+            if isinstance(v, str):
+                m = PLACEHOLDER_RE.fullmatch(v)
+                if m:
+                    slots.append((k, m.group(1)))
+            else:
+                child = cls._compile_slots(v)
+                if child is not None:
+                    slots.append((k, child))
+        return (node, slots) if slots else None
+
+    def render_question(self, placeholder_values: dict) -> str:
+        out = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            if name not in placeholder_values:
+                raise KeyError(f"Missing placeholder value for '{name}' in question text")
+            out.append(placeholder_values[name])
+            out.append(literal)
+        return "".join(out)
+
+    def render_plan(self, placeholder_values: dict) -> dict:
+        if self.plan_slots is None:
+            return dict(self.plan)
+        return fill_slots(self.plan_slots, placeholder_values)
+
+
+def fill_slots(compiled, placeholder_values: dict):
+    node, slots = compiled
+    node = dict(node) if isinstance(node, dict) else list(node)
+    for key, slot in slots:
+        if isinstance(slot, str):
+            if slot not in placeholder_values:
+                raise KeyError(f"Missing placeholder value for '{slot}' in plan")
+            node[key] = placeholder_values[slot]
         else:
-            question = replace_placeholders_in_text(template_question, placeholder_values)
+            node[key] = fill_slots(slot, placeholder_values)
+    return node
+
+
+def apply_plan_overrides_cow(plan: dict, overrides: dict | None) -> dict:
+    """
+    Igual que apply_plan_overrides pero sin deepcopy: solo se copian el diccionario del
+    plan y, si hay overrides por índice, la lista de acciones.
+    """
+    if not overrides:
+        return plan
+
+    plan = dict(plan)
+
+    # Caso especial: sobreescribir toda la lista de acciones
+    if "actions_full" in overrides:
+        plan["actions"] = overrides["actions_full"]
+
+    # Caso general: overrides por índice de action
+    if "actions" in overrides:
+        actions = list(plan["actions"])
+        for idx, override in enumerate(overrides["actions"]):
+            if override is not None:
+                actions[idx] = override
+        plan["actions"] = actions
+
+    # Otros overrides a nivel top (use_pricing2yaml_spec, etc.)
+    for key, value in overrides.items():
+        if key in ("actions", "actions_full"):
+            continue
+        plan[key] = value
+
+    return plan
+
 
-        # Plan: plantilla + placeholders + overrides
-        base_plan = instantiate_plan_with_placeholders(template_entry["plan"], placeholder_values)
-        final_plan = apply_plan_overrides(base_plan, plan_overrides)
+def instantiate_question(template: CompiledTemplate, inst_spec: dict) -> dict:
+    """Construye el objeto InstantiatedQuestion de una instancia del spec."""
+    placeholder_values = inst_spec["placeholder_values"]
+    question_override = inst_spec.get("question_override")
+    plan_overrides = inst_spec.get("plan_overrides")
+    pricing_paths = inst_spec["pricing_paths"]
 
-        out.append(
-            {
-                "template": template_question,
-                "question": question,
-                "plan": final_plan,
-                "pricing_paths": pricing_paths,
-            }
-        )
+    # Pregunta final
+    if question_override is not None:
+        question = question_override
+    else:
+        question = template.render_question(placeholder_values)
 
-    return out
+    # Plan: plantilla + placeholders + overrides
+    final_plan = apply_plan_overrides_cow(template.render_plan(placeholder_values), plan_overrides)
+
+    return {
+        "template": template.question,
+        "question": question,
+        "plan": final_plan,
+        "pricing_paths": pricing_paths,
+    }
+
+
+class TemplateCompiler:
+    """Compila cada plantilla la primera vez que se usa."""
+
+    def __init__(self, templates: list[dict]):
+        self.templates = templates
+        self.compiled: dict[int, CompiledTemplate] = {}
+
+    def __getitem__(self, template_index: int) -> CompiledTemplate:
+        template = self.compiled.get(template_index)
+        if template is None:
+            template = self.compiled[template_index] = CompiledTemplate(self.templates[template_index])
+        return template
+
+
+def iter_instantiated_questions(templates: list[dict], instances) -> Iterator[dict]:
+    """
+    Genera los objetos InstantiatedQuestion de uno en uno a partir de:
+    - templates: lista leída de question_action_templates.json
+    - instances: iterable con las instancias de instantiation_spec.json (puede ser un stream)
+
+    Cada plantilla se compila una única vez (CompiledTemplate).
+    """
+    compiled = TemplateCompiler(templates)
+    for inst_spec in instances:
+        yield instantiate_question(compiled[inst_spec["template_index"]], inst_spec)
+
+
+class IncrementalBuild:
+    """
+    Regeneración incremental: cada instancia se identifica por su hash de contenido
+    (question_manifest.instance_hash). Las instancias con el mismo hash que en el
+    manifest anterior se copian de la salida anterior, que se lee en streaming a la
+    vez que se escribe la nueva; el resto se reconstruye y se anota como añadida o
+    cambiada.
+    """
+
+    def __init__(self, templates: list[dict], previous_manifest: dict | None, previous_records=None):
+        self.compiled = TemplateCompiler(templates)
+        self.template_digests = [stable_hash(t) for t in templates]
+        previous_manifest = previous_manifest or {}
+        self.hasher = PricingHasher(previous_manifest.get("pricing_files"))
+        self.previous = {key: (position, digest, question)
+                         for position, (key, digest, question) in enumerate(previous_manifest.get("instances", []))}
+        self.previous_records = previous_records
+        self.cursor = 0
+        self.manifest: list[list] = []
+        self.seen: set[str] = set()
+        self.added: list[str] = []
+        self.changed: list[dict] = []
+        self.reused = 0
+
+    def _previous_record(self, position: int) -> dict | None:
+        # La salida anterior solo se puede avanzar: si el orden cambió, se reconstruye
+        if self.previous_records is None or position < self.cursor:
+            return None
+        for _ in range(position - self.cursor):
+            next(self.previous_records)
+        self.cursor = position + 1
+        return next(self.previous_records)
+
+    def records(self, instances) -> Iterator[dict]:
+        for position, inst_spec in enumerate(instances):
+            key = instance_key(inst_spec, position)
+            digest = instance_hash(self.template_digests[inst_spec["template_index"]], inst_spec, self.hasher)
+            previous = self.previous.get(key)
+            record = None
+            if previous is not None and previous[1] == digest:
+                record = self._previous_record(previous[0])
+                if record is not None:
+                    self.reused += 1
+            if record is None:
+                record = instantiate_question(self.compiled[inst_spec["template_index"]], inst_spec)
+                if previous is None:
+                    self.added.append(record["question"])
+                elif previous[1] != digest:
+                    self.changed.append({"question": record["question"], "previous_question": previous[2]})
+            self.seen.add(key)
+            self.manifest.append([key, digest, record["question"]])
+            yield record
+
+    def removed(self) -> list[str]:
+        return [question for key, (_, _, question) in self.previous.items() if key not in self.seen]
+
+
+def generate_instantiated_questions(templates: list[dict], spec: dict) -> list[dict]:
+    """
+    Genera la lista completa de objetos InstantiatedQuestion a partir de:
+    - templates: lista leída de question_action_templates.json
+    - spec: diccionario leido de instantiation_spec.json
+    """
+    return list(iter_instantiated_questions(templates, spec["instances"]))
 
 
 def main():
@@ -138,7 +323,18 @@ def main():
     )
     parser.add_argument(
         "--expected",
-        help="Optional path to an existing instantiated_questions.json to verify exact equality",
+        help="Optional path to an existing instantiated_questions.json (or .jsonl) to verify exact equality",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        help="Output format: JSON array or JSON Lines (default: jsonl for .jsonl/.ndjson outputs, json otherwise)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild instances whose content hash changed since the previous run (see <output>.manifest.json) "
+             "and list the added/changed/removed questions in <output>.changes.json",
     )
 
     args = parser.parse_args()
@@ -146,15 +342,52 @@ def main():
     templates_path = Path(args.templates)
     spec_path = Path(args.spec)
     output_path = Path(args.output)
+    fmt = args.format or format_for_path(output_path)
 
     templates = json.loads(templates_path.read_text())
-    spec = json.loads(spec_path.read_text())
-
-    instantiated_questions = generate_instantiated_questions(templates, spec)
-
-    # Escribimos la salida
-    output_path.write_text(json.dumps(instantiated_questions, indent=2))
 
+    previous_manifest = load_manifest(output_path, fmt) if args.incremental else None
+    build = None
+    # Con --incremental la salida anterior se lee mientras se escribe la nueva en un temporal
+    write_path = output_path.with_name(output_path.name + ".tmp") if args.incremental else output_path
+
+    # Las instancias se leen, instancian y escriben de una en una (memoria constante)
+    with spec_path.open("r", encoding="utf-8") as spec_file, write_path.open("w") as out_file:
+        instances = iter_json_array(spec_file, key="instances")
+        if args.incremental:
+            previous_records = iter_records(output_path) if previous_manifest is not None else None
+            build = IncrementalBuild(templates, previous_manifest, previous_records)
+            instantiated_questions = build.records(instances)
+        else:
+            instantiated_questions = iter_instantiated_questions(templates, instances)
+        comparison = None
+        if args.expected:
+            comparison = StreamComparison(iter_records(args.expected))
+            instantiated_questions = comparison.check(instantiated_questions)
+        count = write_records(instantiated_questions, out_file, fmt)
+        if build is not None and build.previous_records is not None:
+            build.previous_records.close()
+
+    if build is not None:
+        os.replace(write_path, output_path)
+        save_manifest(output_path, fmt, build.manifest, build.hasher.files)
+        removed = build.removed()
+        changes_path = save_changes(output_path, build.added, build.changed, removed, build.reused)
+        if previous_manifest is None:
+            print("No usable manifest from a previous run: all instances were built")
+        print(f"Incremental build: {build.reused} reused, {len(build.added)} added, {len(build.changed)} changed, "
+              f"{len(removed)} removed ({build.hasher.reads} pricing files hashed) -> {changes_path}")
+
+    print(f"Wrote {count} instantiated questions to {output_path} ({fmt})")
+
+    if comparison is not None:
+        if comparison.finish():
+            print(f"Output matches {args.expected} ({comparison.compared} records)")
+        else:
+            mismatch = comparison.mismatch
+            where = f" at {mismatch['path']}" if mismatch["path"] else ""
+            print(f"Mismatch with {args.expected} in record {mismatch['index']}{where}: {mismatch['reason']}")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+"""HTTP plumbing of the experiment runner.
+
+`new_session` returns a pooled keep-alive `requests.Session` whose connections
+record how long the TCP (and TLS) connect took and how many were opened, so that
+`run_experiment.py` can split a HARVEY call into connect / time to first byte /
+download / decode phases and report how often pooled connections were reused.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_POOL_SIZE = 10
+
+_timings = threading.local()
+
+
+def reset_connect_time() -> None:
+    """Start measuring connect time for the request about to be sent from this thread."""
+    _timings.connect = 0.0
+    _timings.connections = 0
+
+
+def connect_time() -> float:
+    """Seconds spent opening connections since the last reset (0.0 if a pooled one was reused)."""
+    return getattr(_timings, "connect", 0.0)
+
+
+def connections_opened() -> int:
+    """Connections opened by this thread since the last reset."""
+    return getattr(_timings, "connections", 0)
+
+
+def _record_connect(seconds: float) -> None:
+    _timings.connect = connect_time() + seconds
+    _timings.connections = connections_opened() + 1
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def new_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Keep-alive session that keeps up to `pool_size` idle connections per host."""
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,294 @@
+"""Local stand-in for the HARVEY /chat endpoint, for benchmarking the runner offline.
+
+Implements the same contract as HARVEY: POST /chat with `{"question", "pricing_yamls"}`
+returns `{"answer", "plan", "result"}`. Answers come from recorded
+`experiment_results_*.json` entries (`--results`), looked up by question and
+pricing YAML contents, then by question only. Questions that were never recorded
+get the ground-truth `plan` of `--questions` (e.g. instantiated_pi_tasks.json)
+with a placeholder answer and no result. Unknown questions get a 404.
+
+Latency per request (`--latency`):
+- `recorded` (default): a duration drawn from all recorded `duration_seconds`
+- `question`: the recorded duration of that question (else `recorded`)
+- a number: fixed seconds
+scaled by `--latency-scale`. `--capacity` limits how many requests are processed
+at once (the rest queue, like a saturated backend), and `--error-rate` answers
+that fraction of requests with one of `--error-status` after the latency.
+
+Request bodies may be gzip-compressed (`Content-Encoding: gzip`); with
+`--accept-gzip` responses advertise `Accept-Encoding: gzip`, which enables the
+runner's `--compress auto`. GET /stats returns the request counters.
+
+Usage (from the project root):
+  python3 Experimentation/harvey_stub.py --results Experimentation/experiment_results_gpt_5_1.json \\
+    --questions Experimentation/instantiated_pi_tasks.json --latency-scale 0.01 --error-rate 0.05
+  python3 Experimentation/run_experiment.py --api-url http://localhost:8086/chat --concurrency 8 \\
+    --input Experimentation/instantiated_pi_tasks.json --output stub_results.json
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from json_stream import iter_records
+from response_cache import response_key
+
+DEFAULT_PORT = 8086
+DEFAULT_ERROR_STATUS = "500,503"
+STUB_ANSWER = "Stand-in answer: this question has no recorded HARVEY answer; the plan is the ground-truth plan."
+
+
+def read_text(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def parse_latency(text):
+    if text in ("recorded", "question"):
+        return text
+    try:
+        seconds = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected 'recorded', 'question' or a number of seconds")
+    if seconds < 0:
+        raise argparse.ArgumentTypeError("latency must be >= 0")
+    return seconds
+
+
+class AnswerBook:
+    """Recorded HARVEY responses and ground-truth plans, by question (and pricing YAMLs)."""
+
+    def __init__(self):
+        self.by_content = {}
+        self.by_question = {}
+        self.plans = {}
+        self.durations = []
+        self.question_durations = {}
+
+    def add_results(self, path):
+        """Index the successful entries of a results file; returns how many were added."""
+        added = 0
+        for entry in iter_records(path):
+            response = entry.get("api_response")
+            if response is None:
+                continue
+            item = entry.get("input") or {}
+            question = item.get("question")
+            yamls = [read_text(p) for p in item.get("pricing_paths") or []]
+            if None not in yamls:
+                self.by_content[response_key("", question, yamls)] = response
+            self.by_question.setdefault(question, response)
+            duration = entry.get("duration_seconds")
+            if duration is not None:
+                self.durations.append(duration)
+                self.question_durations.setdefault(question, duration)
+            added += 1
+        return added
+
+    def add_questions(self, path):
+        added = 0
+        for item in iter_records(path):
+            if item.get("plan") is not None:
+                self.plans.setdefault(item["question"], item["plan"])
+                added += 1
+        return added
+
+    def lookup(self, question, pricing_yamls):
+        """(source, response) for a request, or (None, None) if the question is unknown."""
+        response = self.by_content.get(response_key("", question, pricing_yamls))
+        if response is not None:
+            return "recorded", response
+        response = self.by_question.get(question)
+        if response is not None:
+            return "recorded_question", response
+        plan = self.plans.get(question)
+        if plan is not None:
+            return "ground_truth", {"answer": STUB_ANSWER, "plan": plan, "result": None}
+        return None, None
+
+
+class StubBehaviour:
+    """Latency, capacity and error injection shared by all request threads."""
+
+    def __init__(self, book, latency="recorded", latency_scale=1.0, error_rate=0.0,
+                 error_status=(500, 503), capacity=0, accept_gzip=False, seed=None):
+        self.book = book
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.accept_gzip = accept_gzip
+        self.slots = threading.BoundedSemaphore(capacity) if capacity > 0 else None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+
+    def delay(self, question):
+        if isinstance(self.latency, float):
+            seconds = self.latency
+        else:
+            seconds = self.book.question_durations.get(question) if self.latency == "question" else None
+            if seconds is None:
+                with self._lock:
+                    seconds = self._rng.choice(self.book.durations) if self.book.durations else 0.0
+        return seconds * self.latency_scale
+
+    def injected_error(self):
+        """Status code of an injected failure, or None."""
+        if self.error_rate <= 0:
+            return None
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            return self._rng.choice(self.error_status)
+
+    def count(self, key, seconds=0.0):
+        with self._lock:
+            self.stats[key] += 1
+            self.busy_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": dict(self.stats), "in_flight": self.in_flight,
+                    "busy_seconds": round(self.busy_seconds, 3)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behaviour = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.behaviour.accept_gzip:
+            self.send_header("Accept-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.behaviour.snapshot())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        behaviour = self.behaviour
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.rstrip("/") != "/chat":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            if not behaviour.accept_gzip:
+                behaviour.count("unsupported_encoding")
+                self._send_json(415, {"error": "gzip request bodies are not accepted"})
+                return
+            body = gzip.decompress(body)
+        try:
+            payload = json.loads(body)
+            question = payload["question"]
+            pricing_yamls = payload.get("pricing_yamls") or []
+        except (ValueError, KeyError, TypeError):
+            behaviour.count("bad_request")
+            self._send_json(400, {"error": "Expected a JSON body with 'question' and 'pricing_yamls'"})
+            return
+
+        source, response = behaviour.book.lookup(question, pricing_yamls)
+        if behaviour.slots is not None:
+            behaviour.slots.acquire()
+        with behaviour._lock:
+            behaviour.in_flight += 1
+        try:
+            seconds = behaviour.delay(question)
+            time.sleep(seconds)
+        finally:
+            with behaviour._lock:
+                behaviour.in_flight -= 1
+            if behaviour.slots is not None:
+                behaviour.slots.release()
+
+        status = behaviour.injected_error()
+        if status is not None:
+            behaviour.count(f"error_{status}", seconds)
+            self._send_json(status, {"error": f"Injected failure ({status})"})
+        elif source is None:
+            behaviour.count("unknown_question", seconds)
+            self._send_json(404, {"error": "No recorded answer or ground-truth plan for this question"})
+        else:
+            behaviour.count(source, seconds)
+            self._send_json(200, response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the HARVEY /chat endpoint")
+    parser.add_argument("--results", nargs="*", default=[], metavar="RESULTS_JSON",
+                        help="Recorded experiment results files to answer from")
+    parser.add_argument("--questions", nargs="*", default=[], metavar="QUESTIONS_JSON",
+                        help="Instantiated questions whose ground-truth plan answers unrecorded questions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=parse_latency, default="recorded",
+                        help="'recorded' (sample of all recorded durations, default), 'question' (the "
+                             "question's own recorded duration) or fixed seconds")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier applied to every latency (default: 1.0)")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Requests processed at once; the rest queue (default: 0, unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with an injected error (default: 0)")
+    parser.add_argument("--error-status", default=DEFAULT_ERROR_STATUS,
+                        help=f"Comma-separated status codes of injected errors (default: {DEFAULT_ERROR_STATUS})")
+    parser.add_argument("--accept-gzip", action="store_true",
+                        help="Accept gzip request bodies and advertise Accept-Encoding: gzip")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if not 0 <= args.error_rate <= 1:
+        parser.error("--error-rate must be between 0 and 1")
+    if args.latency_scale < 0:
+        parser.error("--latency-scale must be >= 0")
+    if not args.results and not args.questions:
+        parser.error("give --results and/or --questions to answer from")
+    error_status = tuple(int(code) for code in args.error_status.split(",") if code.strip())
+
+    book = AnswerBook()
+    for path in args.results:
+        print(f"Loaded {book.add_results(path)} recorded answers from {path}")
+    for path in args.questions:
+        print(f"Loaded {book.add_questions(path)} ground-truth plans from {path}")
+    if args.latency in ("recorded", "question") and not book.durations:
+        print("No recorded durations: answering without latency")
+
+    StubHandler.behaviour = StubBehaviour(book, args.latency, args.latency_scale, args.error_rate, error_status,
+                                          args.capacity, args.accept_gzip, args.seed)
+    StubHandler.verbose = args.verbose
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"HARVEY stand-in listening on http://{args.host}:{args.port}/chat")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {json.dumps(StubHandler.behaviour.snapshot())}")
+
+
+if __name__ == "__main__":
+    main()
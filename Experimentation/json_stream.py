@@ -0,0 +1,284 @@
+"""Constant-memory reading and writing of large record files.
+
+Records are stored either as a JSON array (the format of instantiated_questions.json)
+or as JSON Lines, one record per line. `iter_records` detects the format and yields
+one record at a time; `iter_json_array` streams a top-level array, or the array
+under one key of a top-level object (e.g. the `instances` of instantiation_spec.json),
+decoding items incrementally from fixed-size chunks. `iter_selected_records` only
+decodes the requested fields of each record and scans over the rest without
+building it (e.g. the answers of large results files). `write_records` streams
+records out. Its JSON array output is byte-identical to
+`json.dumps(records, indent=2)`.
+"""
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+FORMATS = ("json", "jsonl")
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+_decoder = json.JSONDecoder()
+# The rest of a string after its opening quote, and everything up to the next bracket
+# outside strings (stops before a string cut at the end of the buffer)
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"')
+_TO_BRACKET = re.compile(r'(?:[^\[\]{}"]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+
+class _Reader:
+    """Buffered view of a text file that decodes one JSON value at a time."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        c = self.peek()
+        if c == "" or c not in chars:
+            raise ValueError(f"Expected one of {chars!r} but found {c or 'end of file'!r}")
+        self.pos += 1
+        return c
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut at the end of the buffer decodes fine but may continue in the next chunk
+            if (end == len(self.buf) or self.buf[end] in _NUMBER_CHARS) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Consume one value without decoding it."""
+        c = self.peek()
+        if c == '"':
+            while (end := _STRING_REST.match(self.buf, self.pos + 1)) is None:
+                if not self._fill():
+                    raise ValueError("Unterminated JSON string")
+            self.pos = end.end()
+            return
+        if c not in "[{":
+            self.decode()
+            return
+        depth = 0
+        while True:
+            self.pos = _TO_BRACKET.match(self.buf, self.pos).end()
+            if self.pos == len(self.buf) or self.buf[self.pos] == '"':
+                if not self._fill():
+                    raise ValueError("Unterminated JSON value")
+                continue
+            depth += 1 if self.buf[self.pos] in "[{" else -1
+            self.pos += 1
+            if depth == 0:
+                return
+
+    def select(self, fields):
+        """Decode one value, keeping only `fields` if it is an object.
+
+        `fields` maps a key to None (keep its whole value) or to the nested
+        `fields` of that value; other keys are skipped. Values that are not
+        objects are decoded whole.
+        """
+        if self.peek() != "{":
+            return self.decode()
+        self.pos += 1
+        out = {}
+        if self.peek() == "}":
+            self.pos += 1
+            return out
+        while True:
+            name = self.decode()
+            self.expect(":")
+            if name in fields:
+                out[name] = self.decode() if fields[name] is None else self.select(fields[name])
+            else:
+                self.skip()
+            if self.expect(",}") == "}":
+                return out
+
+    def array_items(self, item=None):
+        item = item or self.decode
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield item()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_json_array(f, key=None, chunk_size=CHUNK_SIZE):
+    """Yield the items of the JSON array in text file `f`.
+
+    With `key`, the file holds an object and the array stored under `key` is
+    streamed; the other values of the object are skipped.
+    """
+    reader = _Reader(f, chunk_size)
+    if key is None:
+        yield from reader.array_items()
+        return
+    reader.expect("{")
+    if reader.peek() == "}":
+        raise KeyError(key)
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+        if name == key:
+            yield from reader.array_items()
+            return
+        reader.decode()
+        if reader.expect(",}") == "}":
+            raise KeyError(key)
+
+
+def detect_format(f):
+    """'json' if text file `f` holds a JSON array, else 'jsonl'. Rewinds `f`."""
+    while True:
+        c = f.read(1)
+        if c == "" or c not in _WHITESPACE:
+            break
+    f.seek(0)
+    return "json" if c == "[" else "jsonl"
+
+
+def iter_records(path):
+    """Yield the records of a JSON array or JSON Lines file one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        if detect_format(f) == "json":
+            yield from iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_selected_records(path, fields, chunk_size=CHUNK_SIZE):
+    """Like `iter_records`, but each record only keeps `fields` (see `_Reader.select`).
+
+    Skipped values are scanned, never decoded, so memory depends on the kept
+    fields and the chunk size, not on the size of the records.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        is_array = detect_format(f) == "json"
+        reader = _Reader(f, chunk_size)
+        select = lambda: reader.select(fields)
+        if is_array:
+            yield from reader.array_items(select)
+            return
+        while reader.peek():
+            yield select()
+
+
+def format_for_path(path):
+    return "jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "json"
+
+
+def write_records(records, f, fmt="json", indent=2):
+    """Stream `records` to text file `f` as a JSON array or JSON Lines; returns the count."""
+    count = 0
+    if fmt == "jsonl":
+        for record in records:
+            f.write(json.dumps(record))
+            f.write("\n")
+            count += 1
+        return count
+
+    pad = " " * indent
+    for record in records:
+        f.write(",\n" if count else "[\n")
+        f.write(pad + json.dumps(record, indent=indent).replace("\n", "\n" + pad))
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
+
+
+def first_difference(expected, actual, path=""):
+    """JSON path of the first difference between two decoded values, or None if equal."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for k in list(expected) + [k for k in actual if k not in expected]:
+            if k not in expected or k not in actual:
+                return f"{path}.{k}"
+            diff = first_difference(expected[k], actual[k], f"{path}.{k}")
+            if diff is not None:
+                return diff
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diff = first_difference(e, a, f"{path}[{i}]")
+            if diff is not None:
+                return diff
+        if len(expected) != len(actual):
+            return f"{path}[{min(len(expected), len(actual))}]"
+        return None
+    if type(expected) is not type(actual) or expected != actual:
+        return path or "$"
+    return None
+
+
+class StreamComparison:
+    """Compare a stream of records against an expected stream, record by record.
+
+    `check(records)` passes `records` through unchanged and stops comparing at the
+    first mismatch, which is kept in `mismatch`; call `finish()` once the stream
+    is exhausted to detect expected records that were never produced.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, expected):
+        self.expected = iter(expected)
+        self.compared = 0
+        self.mismatch = None
+
+    def check(self, records):
+        for record in records:
+            if self.mismatch is None:
+                expected = next(self.expected, self._MISSING)
+                if expected is self._MISSING:
+                    self.mismatch = {"index": self.compared, "path": None,
+                                     "reason": "more records than expected"}
+                else:
+                    path = first_difference(expected, record)
+                    if path is not None:
+                        self.mismatch = {"index": self.compared, "path": path, "reason": "different value"}
+                    else:
+                        self.compared += 1
+            yield record
+
+    def finish(self):
+        if self.mismatch is None and next(self.expected, self._MISSING) is not self._MISSING:
+            self.mismatch = {"index": self.compared, "path": None, "reason": "fewer records than expected"}
+        return self.mismatch is None
@@ -0,0 +1,200 @@
+"""Latency summary of an experiment run.
+
+`run_experiment.py` stores a phase breakdown in every result entry (`latency`:
+request encoding, connect, time to first byte, body download and JSON decode, in
+seconds). This module turns a results list into p50/p90/p99 percentiles and
+histograms, overall and grouped by template, action type (`subscriptions`,
+`optimal`, ...) and number of pricing files, and exports the histograms in
+Prometheus text format.
+
+It can also be run on an existing results file (older files only carry
+`duration_seconds`, which is reported as the `total` phase):
+
+  python3 Experimentation/latency_report.py --input experiment_results_gpt_5_1.json
+"""
+import argparse
+import json
+import math
+import os
+from collections import defaultdict
+
+PHASES = ("encode", "connect", "ttfb", "download", "decode", "total")
+PERCENTILES = (50, 90, 99)
+# Histogram upper bounds in seconds (HARVEY calls take from a few ms when cached to ~15 min)
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 900)
+
+
+def latency_report_paths(output_file):
+    """experiment_results_x.json -> (experiment_results_x.latency.json, experiment_results_x.latency.prom)"""
+    root, _ = os.path.splitext(output_file)
+    return root + ".latency.json", root + ".latency.prom"
+
+
+def percentile(sorted_values, p):
+    """Linear interpolation between closest ranks (same as numpy's default)."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def histogram(values):
+    """Cumulative bucket counts keyed by upper bound, Prometheus style."""
+    counts = {}
+    for bound in BUCKETS:
+        counts[str(bound)] = sum(1 for v in values if v <= bound)
+    counts["+Inf"] = len(values)
+    return counts
+
+
+def entry_phases(entry):
+    """Phase -> seconds for one result entry (only the phases that were measured)."""
+    phases = dict(entry.get("latency") or {})
+    if "total" not in phases and entry.get("duration_seconds") is not None:
+        phases["total"] = entry["duration_seconds"]
+    return phases
+
+
+def action_type(entry):
+    names = {a.get("name") for a in (entry.get("input", {}).get("plan", {}).get("actions") or [])
+             if isinstance(a, dict) and a.get("name")}
+    return "+".join(sorted(names)) if names else "none"
+
+
+def summarize_values(values):
+    values = sorted(values)
+    out = {"count": len(values)}
+    if values:
+        out["mean"] = sum(values) / len(values)
+        out["max"] = values[-1]
+        for p in PERCENTILES:
+            out[f"p{p}"] = percentile(values, p)
+    return out
+
+
+def summarize_group(entries):
+    by_phase = defaultdict(list)
+    for e in entries:
+        for phase, value in entry_phases(e).items():
+            if value is not None:
+                by_phase[phase].append(value)
+    return {phase: summarize_values(by_phase[phase]) for phase in PHASES if by_phase.get(phase)}
+
+
+def measured_entries(results):
+    # Replayed answers did not hit HARVEY, and failed calls would mix timeouts into the latencies
+    return [e for e in results if not e.get("error") and not e.get("replayed")]
+
+
+def phase_values(entries, phase):
+    return [v for v in (entry_phases(e).get(phase) for e in entries) if v is not None]
+
+
+def build_latency_summary(results):
+    """Percentiles per phase, overall and by template / action type / number of pricings."""
+    measured = measured_entries(results)
+
+    groupings = {
+        "by_template": lambda e: e.get("input", {}).get("template") or "Unknown",
+        "by_action_type": action_type,
+        "by_num_pricings": lambda e: str(len(e.get("input", {}).get("pricing_paths") or [])),
+    }
+    summary = {
+        "num_results": len(results),
+        "num_measured": len(measured),
+        "num_errors": sum(1 for e in results if e.get("error")),
+        "overall": summarize_group(measured),
+    }
+    for name, key_func in groupings.items():
+        groups = defaultdict(list)
+        for e in measured:
+            groups[key_func(e)].append(e)
+        summary[name] = {k: summarize_group(v) for k, v in groups.items()}
+
+    summary["histograms"] = {phase: histogram(phase_values(measured, phase)) for phase in PHASES}
+    summary["histograms_by_action_type"] = {
+        k: histogram(phase_values([e for e in measured if action_type(e) == k], "total"))
+        for k in summary["by_action_type"]
+    }
+    summary["total_seconds_sum"] = sum(phase_values(measured, "total"))
+    return summary
+
+
+def _prom_histogram(lines, name, label_str, values):
+    for bound, count in histogram(values).items():
+        lines.append(f'{name}_bucket{{{label_str},le="{bound}"}} {count}')
+    lines.append(f"{name}_sum{{{label_str}}} {sum(values)}")
+    lines.append(f"{name}_count{{{label_str}}} {len(values)}")
+
+
+def to_prometheus(results):
+    """Prometheus text exposition of the phase histograms."""
+    measured = measured_entries(results)
+    lines = [
+        "# HELP harvey_request_phase_seconds Duration of each phase of a HARVEY /chat call.",
+        "# TYPE harvey_request_phase_seconds histogram",
+    ]
+    for phase in PHASES:
+        values = phase_values(measured, phase)
+        if values:
+            _prom_histogram(lines, "harvey_request_phase_seconds", f'phase="{phase}"', values)
+
+    lines += [
+        "# HELP harvey_request_seconds Total duration of a HARVEY /chat call.",
+        "# TYPE harvey_request_seconds histogram",
+    ]
+    groups = defaultdict(list)
+    for e in measured:
+        total = entry_phases(e).get("total")
+        if total is not None:
+            n_pricings = len(e.get("input", {}).get("pricing_paths") or [])
+            groups[(action_type(e), n_pricings)].append(total)
+    for (atype, n_pricings), values in sorted(groups.items()):
+        _prom_histogram(lines, "harvey_request_seconds",
+                        f'action_type="{atype}",num_pricings="{n_pricings}"', values)
+
+    lines += [
+        "# HELP harvey_request_errors_total Failed HARVEY /chat calls.",
+        "# TYPE harvey_request_errors_total counter",
+        f"harvey_request_errors_total {sum(1 for e in results if e.get('error'))}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_latency_report(results, output_file):
+    """Write the JSON summary and the Prometheus export next to `output_file`."""
+    json_path, prom_path = latency_report_paths(output_file)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(build_latency_summary(results), f, ensure_ascii=False, indent=2)
+    with open(prom_path, "w", encoding="utf-8") as f:
+        f.write(to_prometheus(results))
+    return json_path, prom_path
+
+
+def format_overall(summary):
+    rows = []
+    for phase, stats in summary["overall"].items():
+        rows.append(
+            f"  {phase:<9} n={stats['count']:<4} p50={stats['p50']:.3f}s p90={stats['p90']:.3f}s p99={stats['p99']:.3f}s"
+        )
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency summary of an experiment results file")
+    parser.add_argument("--input", required=True, help="Path to experiment_results.json")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    json_path, prom_path = write_latency_report(results, args.input)
+    print(format_overall(build_latency_summary(results)))
+    print(f"Wrote latency summary to {json_path} and {prom_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Open-loop load test of the HARVEY /chat endpoint.
+
+Unlike `run_experiment.py`, requests are fired at a target arrival rate whether or
+not earlier ones have finished, so the measured latency includes the queueing of
+an overloaded server. The rate is ramped through a list of steps; each step runs
+for a fixed duration and reports achieved throughput, error rate and latency
+percentiles, which together form the throughput/latency curve of the backend.
+
+Usage (from the project root):
+  python3 Experimentation/load_test.py --api-url http://localhost:8086/chat \\
+    --input Experimentation/instantiated_pi_tasks.json --steps 0.05,0.1,0.2 --step-duration 600
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from latency_report import phase_values, summarize_values
+from pricing_cache import PricingCache
+from run_experiment import API_URL, HarveyClient, load_questions
+
+DEFAULT_INPUT = "Experimentation/instantiated_pi_tasks.json"
+DEFAULT_OUTPUT = "load_test_report.json"
+
+
+def arrival_offsets(rate, duration, arrival, rng):
+    """Send times (seconds from the start of the step) for one rate step."""
+    offsets = []
+    if arrival == "constant":
+        interval = 1.0 / rate
+        t = 0.0
+        while t < duration:
+            offsets.append(t)
+            t += interval
+    else:
+        # Poisson process: exponentially distributed inter-arrival times
+        t = rng.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += rng.expovariate(rate)
+    return offsets
+
+
+def summarize_step(rate, duration, arrival, sent, dropped, entries, finish_offsets, elapsed):
+    """Step summary. `achieved_rps` counts the successful responses that finished within the
+    send window, over its duration; the stragglers' wait is reported as `drain_seconds`."""
+    ok = [e for e in entries if not e.get("error")]
+    ok_in_window = sum(1 for e, t in zip(entries, finish_offsets) if not e.get("error") and t <= duration)
+    errors = len(entries) - len(ok)
+    return {
+        "target_rps": rate,
+        "arrival": arrival,
+        "duration_seconds": duration,
+        "elapsed_seconds": elapsed,
+        "drain_seconds": elapsed - duration,
+        "sent": sent,
+        "dropped": dropped,
+        "completed": len(entries),
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": (errors / len(entries)) if entries else 0.0,
+        "offered_rps": sent / duration if duration else 0.0,
+        "achieved_rps": ok_in_window / duration if duration else 0.0,
+        "latency": summarize_values(phase_values(ok, "total")),
+        "ttfb": summarize_values(phase_values(ok, "ttfb")),
+    }
+
+
+async def run_step(client, questions, rate, duration, arrival, rng, executor, max_in_flight, cursor):
+    """Fire requests at `rate` for `duration` seconds, then wait for the stragglers."""
+    loop = asyncio.get_running_loop()
+    offsets = arrival_offsets(rate, duration, arrival, rng)
+    in_flight = 0
+    dropped = 0
+    tasks = []
+
+    async def fire(item):
+        nonlocal in_flight
+        in_flight += 1
+        try:
+            entry = await loop.run_in_executor(executor, client.ask, item)
+        finally:
+            in_flight -= 1
+        return entry, time.monotonic() - start
+
+    start = time.monotonic()
+    for offset in offsets:
+        delay = start + offset - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            # Open loop: never wait for a free slot, count the arrival as dropped instead
+            dropped += 1
+            continue
+        item = questions[cursor[0] % len(questions)]
+        cursor[0] += 1
+        tasks.append(asyncio.ensure_future(fire(item)))
+
+    finished = await asyncio.gather(*tasks)
+    entries = [entry for entry, _ in finished]
+    finish_offsets = [offset for _, offset in finished]
+    elapsed = max(time.monotonic() - start, duration)
+    return summarize_step(rate, duration, arrival, len(tasks), dropped, entries, finish_offsets, elapsed)
+
+
+async def run_load_test(client, questions, steps, duration, arrival, seed, max_in_flight):
+    rng = random.Random(seed)
+    questions = list(questions)
+    rng.shuffle(questions)
+    cursor = [0]
+    results = []
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    try:
+        for rate in steps:
+            print(f"Step: {rate} req/s ({arrival}) for {duration}s...")
+            step = await run_step(client, questions, rate, duration, arrival, rng, executor, max_in_flight, cursor)
+            print(format_step(step))
+            results.append(step)
+    finally:
+        executor.shutdown(wait=False)
+    return results
+
+
+def format_step(step):
+    lat = step["latency"]
+    if lat["count"]:
+        lat_str = f"p50={lat['p50']:.2f}s p90={lat['p90']:.2f}s p99={lat['p99']:.2f}s"
+    else:
+        lat_str = "no successful requests"
+    return (
+        f"  target={step['target_rps']:<7g} sent={step['sent']:<5} achieved={step['achieved_rps']:.3f} req/s "
+        f"errors={step['error_rate']:.1%} dropped={step['dropped']} drain={step['drain_seconds']:.1f}s {lat_str}"
+    )
+
+
+def parse_steps(text):
+    steps = [float(x) for x in text.split(",") if x.strip()]
+    if not steps or any(r <= 0 for r in steps):
+        raise argparse.ArgumentTypeError("--steps must be a comma-separated list of positive rates")
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the HARVEY /chat endpoint")
+    parser.add_argument("--api-url", default=API_URL, help=f"HARVEY chat endpoint (default: {API_URL})")
+    parser.add_argument("--input", default=DEFAULT_INPUT,
+                        help=f"Instantiated questions JSON or JSONL (default: {DEFAULT_INPUT})")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Report JSON (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--steps", type=parse_steps, default=[0.1, 0.2, 0.5, 1.0],
+                        help="Comma-separated arrival rates in requests/second (default: 0.1,0.2,0.5,1)")
+    parser.add_argument("--step-duration", type=float, default=300.0,
+                        help="Seconds each rate step sends requests for (default: 300)")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="poisson",
+                        help="Arrival process (default: poisson)")
+    parser.add_argument("--max-in-flight", type=int, default=512,
+                        help="Client-side cap on open requests; arrivals beyond it are dropped (default: 512)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for question order and arrivals")
+    args = parser.parse_args()
+
+    questions = load_questions(args.input)
+    if questions is None:
+        return
+    if not questions:
+        parser.error(f"{args.input} has no questions")
+
+    client = HarveyClient(args.api_url, PricingCache(), verbose=False, pool_size=args.max_in_flight)
+    steps = asyncio.run(run_load_test(client, questions, args.steps, args.step_duration,
+                                      args.arrival, args.seed, args.max_in_flight))
+
+    report = {
+        "api_url": args.api_url,
+        "input": args.input,
+        "arrival": args.arrival,
+        "step_duration_seconds": args.step_duration,
+        "steps": steps,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("Throughput/latency curve:")
+    for step in steps:
+        print(format_step(step))
+    print(f"Wrote load test report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
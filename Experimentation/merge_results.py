@@ -0,0 +1,90 @@
+"""Merge the results files of a sharded run (`run_experiment.py --shard i/N`).
+
+Entries are de-duplicated by question text. A successful entry always wins over a
+failed one; between entries of the same kind the one from the later file on the
+command line wins (so list re-runs after the original shards). Leftover
+checkpoint journals next to each shard file are replayed as well. The merged
+file keeps the order of the questions file and can be passed directly to
+`Evaluation/generate_evaluation_report.py`.
+
+Questions that only have failed entries (no `api_response`) are written to
+`<output>.failed.json` instead of the merged file, unless `--keep-failed` is
+given. `--check` evaluates the merged file with the evaluation report code right
+after writing it.
+
+Usage (from the project root):
+  python3 Experimentation/merge_results.py --questions instantiated_questions.json \\
+    --output experiment_results_merged.json shard0.json shard1.json shard2.json
+"""
+import argparse
+import os
+import sys
+
+from run_experiment import INPUT_FILE, is_done, load_questions, load_results_map, ordered_results, save_results
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Evaluation"))
+
+
+def merge_results(shard_files, questions=None):
+    """Merge results maps of `shard_files` (in precedence order) into one ordered list."""
+    merged = {}
+    first_seen = []
+    for path in shard_files:
+        for question_text, entry in load_results_map(path).items():
+            current = merged.get(question_text)
+            if current is None:
+                first_seen.append({"question": question_text})
+            elif is_done(current) and not is_done(entry):
+                continue
+            merged[question_text] = entry
+    return ordered_results(questions if questions is not None else first_seen, merged)
+
+
+def failed_path_for(output_file):
+    return os.path.splitext(output_file)[0] + ".failed.json"
+
+
+def check_evaluation(results):
+    """Build the evaluation report of `results`, as generate_evaluation_report.py would."""
+    from generate_evaluation_report import build_report
+    return build_report(results)["overall"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge sharded experiment results into one results file")
+    parser.add_argument("shards", nargs="+", help="Shard results files, oldest first")
+    parser.add_argument("--output", required=True, help="Merged results JSON")
+    parser.add_argument("--questions", default=INPUT_FILE,
+                        help=f"Instantiated questions JSON giving the output order (default: {INPUT_FILE}); "
+                             "if missing, the order of first appearance in the shards is used")
+    parser.add_argument("--keep-failed", action="store_true",
+                        help="Keep failed entries in the merged file instead of writing them to <output>.failed.json")
+    parser.add_argument("--check", action="store_true",
+                        help="Evaluate the merged file with Evaluation/generate_evaluation_report.py code")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    results = merge_results(args.shards, questions)
+    failed = [e for e in results if not is_done(e)]
+    merged = results if args.keep_failed else [e for e in results if is_done(e)]
+    save_results(merged, args.output)
+    if failed and not args.keep_failed:
+        save_results(failed, failed_path_for(args.output))
+
+    missing = 0
+    if questions is not None:
+        merged_questions = {e["input"]["question"] for e in results}
+        missing = sum(1 for q in questions if q["question"] not in merged_questions)
+    print(f"Merged {len(args.shards)} files: {len(results)} results ({len(results) - len(failed)} successful, "
+          f"{len(failed)} failed, {missing} questions without result) -> {args.output}")
+    if failed and not args.keep_failed:
+        print(f"Failed entries written to {failed_path_for(args.output)}")
+
+    if args.check:
+        overall = check_evaluation(merged)
+        print(f"Evaluation check: {len(merged)} results evaluated, hierarchical F1 "
+              f"{overall['structure_hierarchical_f1']:.4f}, content accuracy {overall['content_accuracy']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
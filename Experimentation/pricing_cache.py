@@ -0,0 +1,99 @@
+"""In-memory cache of the pricing YAML payloads sent to HARVEY.
+
+The same `data/pricings/spectra/<saas>/<year>.yml` files are referenced by many
+instantiated questions, so `run_experiment.py` reads each one from disk once and
+reuses it while its mtime/size do not change. Entries are evicted in LRU order
+once the cached payloads exceed a byte budget. Every payload is identified by the
+SHA-256 of its content, so files with identical content share a single string.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PricingCache:
+    """LRU cache path -> YAML content keyed by (path, mtime, size), with a byte budget."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # path -> (mtime_ns, size, digest), most recently used last
+        self._entries: OrderedDict = OrderedDict()
+        # digest -> [content, number of paths pointing to it]
+        self._payloads: dict = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_reads = 0
+        self.bytes_read = 0
+        self.bytes_saved = 0
+        self.dedup_hits = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> str:
+        return self.get_with_hash(path)[0]
+
+    def get_with_hash(self, path: str) -> tuple[str, str]:
+        """Return (content, sha256) for `path`, reading it only if it is new or changed."""
+        st = os.stat(path)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                self.bytes_saved += st.st_size
+                digest = cached[2]
+                return self._payloads[digest][0], digest
+
+        # Read outside the lock so slow disks do not serialise the request threads
+        with open(path, "r") as f:
+            content = f.read()
+        digest = content_hash(content)
+
+        with self._lock:
+            self.disk_reads += 1
+            self.bytes_read += st.st_size
+            if path in self._entries:
+                self._release(path)
+            payload = self._payloads.get(digest)
+            if payload is not None:
+                # Identical content already cached under another path (or version)
+                self.dedup_hits += 1
+                payload[1] += 1
+                content = payload[0]
+            else:
+                self._payloads[digest] = [content, 1]
+                self._bytes += len(content)
+            self._entries[path] = (st.st_mtime_ns, st.st_size, digest)
+            self._evict()
+        return content, digest
+
+    def _release(self, path):
+        _, _, digest = self._entries.pop(path)
+        payload = self._payloads[digest]
+        payload[1] -= 1
+        if payload[1] == 0:
+            del self._payloads[digest]
+            self._bytes -= len(payload[0])
+
+    def _evict(self):
+        # Keep at least the entry that was just added, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._release(oldest)
+            self.evictions += 1
+
+    def summary(self) -> str:
+        return (
+            f"Pricing cache: {self.disk_reads} disk reads ({self.bytes_read / 1024:.1f} KiB), "
+            f"{self.hits} hits ({self.bytes_saved / 1024:.1f} KiB not re-read), "
+            f"{self.dedup_hits} identical payloads shared, {self.evictions} evictions, "
+            f"{len(self._payloads)} payloads / {self._bytes / 1024:.1f} KiB resident"
+        )
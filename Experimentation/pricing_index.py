@@ -0,0 +1,201 @@
+"""Lookup tables over the Pricing2Yaml files in data/pricings/spectra.
+
+The YAML files are parsed once and the tables are persisted as JSON (default:
+`pricing_index.json`); `load_or_build_index` reuses the persisted index as long as
+the set of YAML files and their modification times and sizes are unchanged, so
+consumers never re-parse YAML. Tables:
+
+- `saas`: SaaS directory -> display name and versions (year -> YAML path)
+- `pricings`: YAML path -> currency, features, numeric usage limits and plans, each
+  plan with its price, included features and usage limit values
+- `features`: feature name -> descriptions and the (path, plan) pairs that include it
+- `usage_limits`: usage limit name -> unit and (path, plan, value) triples
+- `plan_prices`: "saas/PLAN" -> price range over all versions and the price per year
+
+Usage (from the project root):
+  python3 Experimentation/pricing_index.py --root data/pricings/spectra --output pricing_index.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+from pricing_parse_cache import DEFAULT_CACHE_DIR, ParsedPricingCache, parse_yaml
+from results_journal import write_json_atomic
+
+DEFAULT_ROOT = "data/pricings/spectra"
+DEFAULT_INDEX = "pricing_index.json"
+INDEX_VERSION = 1
+
+
+def yaml_paths(root=DEFAULT_ROOT):
+    return sorted(glob.glob(os.path.join(root, "**", "*.yml"), recursive=True))
+
+
+def file_signature(paths):
+    """path -> [mtime_ns, size]; the index is stale as soon as this changes."""
+    signature = {}
+    for path in paths:
+        st = os.stat(path)
+        signature[path] = [st.st_mtime_ns, st.st_size]
+    return signature
+
+
+def numeric_price(value):
+    """Plan price as a number, or None for 'Contact Sales', formulas and missing prices."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def is_included(value):
+    return value not in (None, False, 0, "", "NONE")
+
+
+def index_pricing(path, data):
+    """Per-file table of one parsed Pricing2Yaml document."""
+    features = data.get("features") or {}
+    usage_limits = data.get("usageLimits") or {}
+    numeric_limits = {name: ul for name, ul in usage_limits.items()
+                      if (ul or {}).get("valueType") == "NUMERIC"}
+
+    plans = {}
+    for plan_name, plan in (data.get("plans") or {}).items():
+        plan = plan or {}
+        plan_features = plan.get("features") or {}
+        plan_limits = plan.get("usageLimits") or {}
+        included = []
+        for name, feature in features.items():
+            value = (plan_features.get(name) or {}).get("value", (feature or {}).get("defaultValue"))
+            if is_included(value):
+                included.append(name)
+        limits = {}
+        for name, ul in numeric_limits.items():
+            value = (plan_limits.get(name) or {}).get("value", ul.get("defaultValue"))
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                limits[name] = value
+        plans[plan_name] = {
+            "price": numeric_price(plan.get("price")),
+            "unit": plan.get("unit"),
+            "features": included,
+            "usage_limits": limits,
+        }
+
+    saas_dir = os.path.basename(os.path.dirname(path))
+    return {
+        "saas": saas_dir,
+        "name": data.get("saasName") or saas_dir,
+        "year": os.path.splitext(os.path.basename(path))[0],
+        "currency": data.get("currency"),
+        "features": {name: (feature or {}).get("description") or "" for name, feature in features.items()},
+        "usage_limits": {name: {"description": ul.get("description") or "", "unit": ul.get("unit") or "",
+                                "linked_features": ul.get("linkedFeatures") or []}
+                         for name, ul in numeric_limits.items()},
+        "plans": plans,
+    }
+
+
+def build_index(root=DEFAULT_ROOT, parse_cache=None):
+    """Build the tables; YAML documents come from `parse_cache` (a ParsedPricingCache) if given."""
+    paths = yaml_paths(root)
+    documents = parse_cache.preload(paths) if parse_cache is not None else None
+    index = {
+        "version": INDEX_VERSION,
+        "root": root,
+        "files": file_signature(paths),
+        "saas": {},
+        "pricings": {},
+        "features": {},
+        "usage_limits": {},
+        "plan_prices": {},
+    }
+    for path in paths:
+        data = documents[path] if documents is not None else parse_yaml(path)[1]
+        pricing = index_pricing(path, data or {})
+        index["pricings"][path] = pricing
+
+        saas = index["saas"].setdefault(pricing["saas"], {"name": pricing["name"], "versions": {}})
+        saas["versions"][pricing["year"]] = path
+
+        for name, description in pricing["features"].items():
+            entry = index["features"].setdefault(name, {"descriptions": [], "plans": []})
+            if description and description not in entry["descriptions"]:
+                entry["descriptions"].append(description)
+        for name, meta in pricing["usage_limits"].items():
+            index["usage_limits"].setdefault(name, {"unit": meta["unit"], "plans": []})
+
+        for plan_name, plan in pricing["plans"].items():
+            for name in plan["features"]:
+                index["features"][name]["plans"].append([path, plan_name])
+            for name, value in plan["usage_limits"].items():
+                index["usage_limits"][name]["plans"].append([path, plan_name, value])
+            if plan["price"] is None:
+                continue
+            prices = index["plan_prices"].setdefault(f"{pricing['saas']}/{plan_name}",
+                                                     {"min": plan["price"], "max": plan["price"], "by_year": {}})
+            prices["min"] = min(prices["min"], plan["price"])
+            prices["max"] = max(prices["max"], plan["price"])
+            prices["by_year"][pricing["year"]] = plan["price"]
+    return index
+
+
+def save_index(index, index_path=DEFAULT_INDEX):
+    write_json_atomic(index, index_path, indent=None)
+
+
+def load_or_build_index(root=DEFAULT_ROOT, index_path=DEFAULT_INDEX, rebuild=False, verbose=True,
+                        parse_cache=None):
+    """Persisted index for `root`, rebuilt (and saved) only when a YAML file changed."""
+    if not rebuild and os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        if (index.get("version") == INDEX_VERSION and index.get("root") == root
+                and index.get("files") == file_signature(yaml_paths(root))):
+            return index
+        if verbose:
+            print(f"Pricing index {index_path} is stale, rebuilding...")
+    start = time.time()
+    index = build_index(root, parse_cache)
+    save_index(index, index_path)
+    if verbose:
+        print(f"Indexed {len(index['pricings'])} pricing files in {time.time() - start:.1f}s -> {index_path}")
+    return index
+
+
+# A run of capitals followed by a plural "s" (PDFs, APIs) is one word
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])(?![A-Z]s(?:[A-Z]|\b))")
+
+
+def humanize(name):
+    """createNewDataFlows -> 'create new data flows'; exportAsPDFs -> 'export as PDFs';
+    BUSINESS_PLUS -> 'business plus'."""
+    words = _CAMEL_RE.sub(" ", re.sub(r"[_\-]+", " ", name)).split()
+    keep_acronyms = not name.isupper()
+    return " ".join(w if keep_acronyms and len(w) > 1 and _is_acronym(w) else w.lower() for w in words)
+
+
+def _is_acronym(word):
+    return word.isupper() or (len(word) > 2 and word.endswith("s") and word[:-1].isupper())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the lookup tables over the pricing YAML files")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Directory of the pricing YAMLs (default: {DEFAULT_ROOT})")
+    parser.add_argument("--output", default=DEFAULT_INDEX, help=f"Index file (default: {DEFAULT_INDEX})")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is up to date")
+    parser.add_argument("--parse-cache", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the parsed YAML cache (default: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    parse_cache = ParsedPricingCache(args.parse_cache)
+    index = load_or_build_index(args.root, args.output, rebuild=args.rebuild, parse_cache=parse_cache)
+    if parse_cache.documents:
+        print(parse_cache.summary())
+    print(f"{len(index['saas'])} SaaS, {len(index['pricings'])} pricings, {len(index['features'])} features, "
+          f"{len(index['usage_limits'])} usage limits, {len(index['plan_prices'])} priced plans")
+
+
+if __name__ == "__main__":
+    main()
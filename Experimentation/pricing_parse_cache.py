@@ -0,0 +1,153 @@
+"""Parse cache for the pricing YAML corpus.
+
+Each pricing YAML is parsed once and stored as a pickle under `cache_dir`
+(`<cache_dir>/<key[:2]>/<key>.pickle`, keyed by the path of the YAML). A cache file
+holds a small header (path, mtime, size and SHA-256 of the YAML) followed by the
+parsed document, so validating an entry does not unpickle the document. An entry
+is used when mtime and size match; if only the mtime changed, the YAML is hashed
+and the entry is kept when the content is the same. Anything else is re-parsed.
+
+`ParsedPricingCache.load` gives lazy per-file access (memoized in the process);
+`preload` re-parses the stale files of a whole corpus in a process pool and then
+loads everything from the cache.
+"""
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:
+    _Loader = yaml.SafeLoader
+
+DEFAULT_CACHE_DIR = "pricing_parse_cache"
+CACHE_VERSION = 1
+
+
+def parse_yaml(path):
+    with open(path, "rb") as f:
+        content = f.read()
+    return content, yaml.load(content, Loader=_Loader)
+
+
+def _cache_path(cache_dir, path):
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key[:2], key + ".pickle")
+
+
+def _read_header(cache_file):
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_entry(cache_file, header, data):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_file)
+
+
+def refresh_entry(cache_dir, path):
+    """Make the cache entry of `path` valid; returns 'hits', 'touched' (same content) or 'parsed'."""
+    st = os.stat(path)
+    cache_file = _cache_path(cache_dir, path)
+    header = _read_header(cache_file)
+    if header is not None and header.get("version") == CACHE_VERSION:
+        if header["mtime_ns"] == st.st_mtime_ns and header["size"] == st.st_size:
+            return "hits"
+        if header["size"] == st.st_size:
+            with open(path, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() == header["sha256"]:
+                    with open(cache_file, "rb") as cf:
+                        pickle.load(cf)
+                        data = pickle.load(cf)
+                    _write_entry(cache_file, dict(header, mtime_ns=st.st_mtime_ns), data)
+                    return "touched"
+    content, data = parse_yaml(path)
+    header = {"version": CACHE_VERSION, "path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+              "sha256": hashlib.sha256(content).hexdigest()}
+    _write_entry(cache_file, header, data)
+    return "parsed"
+
+
+def _refresh_many(args):
+    cache_dir, paths = args
+    return [refresh_entry(cache_dir, path) for path in paths]
+
+
+class ParsedPricingCache:
+    """Parsed pricing YAMLs backed by a pickle cache directory."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.documents = {}
+        self.stats = {"memory_hits": 0, "hits": 0, "touched": 0, "parsed": 0}
+
+    def load(self, path):
+        """Parsed YAML document of `path` (re-parsed only if the file changed)."""
+        document = self.documents.get(path)
+        if document is not None:
+            self.stats["memory_hits"] += 1
+            return document
+        self.stats[refresh_entry(self.cache_dir, path)] += 1
+        document = self._read(path)
+        self.documents[path] = document
+        return document
+
+    def _read(self, path):
+        with open(_cache_path(self.cache_dir, path), "rb") as f:
+            pickle.load(f)
+            return pickle.load(f)
+
+    def preload(self, paths, workers=None, chunk_size=8):
+        """Load every file of `paths`; stale entries are re-parsed in a pool of `workers` processes."""
+        stale = []
+        for path in paths:
+            if path in self.documents:
+                continue
+            document = self._read_if_fresh(path)
+            if document is None:
+                stale.append(path)
+            else:
+                self.stats["hits"] += 1
+                self.documents[path] = document
+
+        if stale:
+            chunks = [(self.cache_dir, stale[i:i + chunk_size]) for i in range(0, len(stale), chunk_size)]
+            if workers == 1 or len(chunks) == 1:
+                outcomes = map(_refresh_many, chunks)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    outcomes = list(pool.map(_refresh_many, chunks))
+            for chunk in outcomes:
+                for outcome in chunk:
+                    self.stats[outcome] += 1
+            for path in stale:
+                self.documents[path] = self._read(path)
+        return {path: self.documents[path] for path in paths}
+
+    def _read_if_fresh(self, path):
+        """Cached document of `path` if its entry matches the file's mtime and size, else None."""
+        st = os.stat(path)
+        try:
+            with open(_cache_path(self.cache_dir, path), "rb") as f:
+                header = pickle.load(f)
+                if (header.get("version") == CACHE_VERSION and header["mtime_ns"] == st.st_mtime_ns
+                        and header["size"] == st.st_size):
+                    return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        return None
+
+    def summary(self):
+        s = self.stats
+        return (f"Pricing parse cache ({self.cache_dir}): {s['hits']} cached, {s['touched']} revalidated by hash, "
+                f"{s['parsed']} parsed, {s['memory_hits']} in-memory hits")
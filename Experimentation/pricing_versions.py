@@ -0,0 +1,333 @@
+"""Delta-encoded store of the yearly pricing versions of every SaaS.
+
+`data/pricings/spectra/<saas>/<year>.yml` holds a full snapshot per year, and
+consecutive years are mostly identical. The store keeps, per SaaS, the parsed
+document of the first year plus one structural delta per later year (relative to
+the previous year), and persists them as a pickle (default:
+`pricing_versions.pickle`), rebuilt only when a YAML file changes.
+
+A delta mirrors the document: for a mapping it lists the removed keys (`-`), the
+added keys with their values (`+`), the changed keys with their own delta (`~`)
+and, if the key order changed, the new order (`order`). Any other value (lists,
+scalars, a mapping replaced by something else) is replaced as a whole (`=`).
+Reconstructed versions share the unchanged subtrees with the version they were
+derived from, so they must be treated as read-only.
+
+`VersionStore.get` reconstructs a version from the nearest materialised earlier
+version of the same SaaS (kept in an LRU of `cache_size` versions), and
+`VersionStore.diff` compares two versions: added/removed features, plans and
+add-ons, changed prices, changed usage limits and per-plan feature changes.
+
+Usage (from the project root):
+  python3 Experimentation/pricing_versions.py --verify
+  python3 Experimentation/pricing_versions.py --diff tableau 2019 2025
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+
+from pricing_index import DEFAULT_ROOT, file_signature, index_pricing, yaml_paths
+from pricing_parse_cache import DEFAULT_CACHE_DIR, ParsedPricingCache
+
+DEFAULT_STORE = "pricing_versions.pickle"
+STORE_VERSION = 1
+DEFAULT_CACHE_SIZE = 32
+
+
+def compute_delta(old, new):
+    """Structural delta turning `old` into `new`, or None if they are equal."""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if same_document(old, new) else {"=": new}
+    delta = {}
+    removed = [key for key in old if key not in new]
+    added = {key: value for key, value in new.items() if key not in old}
+    changed = {}
+    for key, value in new.items():
+        if key in old:
+            sub = compute_delta(old[key], value)
+            if sub is not None:
+                changed[key] = sub
+    if removed:
+        delta["-"] = removed
+    if added:
+        delta["+"] = added
+    if changed:
+        delta["~"] = changed
+    # Keys kept in their old order followed by the added ones, unless the new document says otherwise
+    natural = [key for key in old if key in new] + list(added)
+    if natural != list(new):
+        delta["order"] = list(new)
+    return delta or None
+
+
+def apply_delta(old, delta):
+    """`new` from `old` and compute_delta(old, new); unchanged subtrees are shared with `old`."""
+    if delta is None:
+        return old
+    if "=" in delta:
+        return delta["="]
+    removed = set(delta.get("-", ()))
+    changed = delta.get("~", {})
+    new = {}
+    for key, value in old.items():
+        if key in removed:
+            continue
+        new[key] = apply_delta(value, changed[key]) if key in changed else value
+    new.update(delta.get("+", {}))
+    if "order" in delta:
+        new = {key: new[key] for key in delta["order"]}
+    return new
+
+
+def same_document(a, b):
+    """Equality that also compares the key order of every mapping."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a) == list(b) and all(same_document(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same_document(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def group_versions(paths):
+    """saas -> [(year, path)] sorted by year."""
+    groups = {}
+    for path in paths:
+        saas = os.path.basename(os.path.dirname(path))
+        year = os.path.splitext(os.path.basename(path))[0]
+        groups.setdefault(saas, []).append((year, path))
+    return {saas: sorted(versions) for saas, versions in sorted(groups.items())}
+
+
+def build_chains(paths, documents):
+    """Per SaaS: years, paths, the first year's document and one delta per later year."""
+    chains = {}
+    for saas, versions in group_versions(paths).items():
+        years = [year for year, _ in versions]
+        docs = [documents[path] for _, path in versions]
+        chains[saas] = {
+            "years": years,
+            "paths": [path for _, path in versions],
+            "base": docs[0],
+            "deltas": [compute_delta(previous, current) for previous, current in zip(docs, docs[1:])],
+        }
+    return chains
+
+
+class VersionStore:
+    """Base documents and delta chains, with an LRU of materialised versions."""
+
+    def __init__(self, chains, cache_size=DEFAULT_CACHE_SIZE):
+        self.chains = chains
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._by_path = {path: (saas, year) for saas, chain in chains.items()
+                         for year, path in zip(chain["years"], chain["paths"])}
+        self.stats = {"hits": 0, "materialised": 0, "deltas_applied": 0}
+
+    def saas_names(self):
+        return list(self.chains)
+
+    def years(self, saas):
+        return list(self.chains[saas]["years"])
+
+    def locate(self, path):
+        """(saas, year) of a YAML path of the store."""
+        return self._by_path[path]
+
+    def _remember(self, key, document):
+        self._cache[key] = document
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, saas, year):
+        """Parsed document of one version (read-only)."""
+        key = (saas, year)
+        document = self._cache.get(key)
+        if document is not None:
+            self.stats["hits"] += 1
+            self._cache.move_to_end(key)
+            return document
+        chain = self.chains[saas]
+        target = chain["years"].index(year)
+        # Start from the latest materialised version at or before the target
+        start = 0
+        document = chain["base"]
+        for position in range(target, 0, -1):
+            cached = self._cache.get((saas, chain["years"][position]))
+            if cached is not None:
+                start, document = position, cached
+                break
+        for position in range(start, target):
+            document = apply_delta(document, chain["deltas"][position])
+            self.stats["deltas_applied"] += 1
+        self.stats["materialised"] += 1
+        self._remember(key, document)
+        return document
+
+    def get_path(self, path):
+        return self.get(*self.locate(path))
+
+    def diff(self, saas, from_year, to_year):
+        """Structural differences between two versions of a SaaS."""
+        chain = self.chains[saas]
+        old_doc, new_doc = self.get(saas, from_year), self.get(saas, to_year)
+        old = index_pricing(chain["paths"][chain["years"].index(from_year)], old_doc)
+        new = index_pricing(chain["paths"][chain["years"].index(to_year)], new_doc)
+        old_addons, new_addons = old_doc.get("addOns") or {}, new_doc.get("addOns") or {}
+
+        changes = {
+            "saas": saas,
+            "from": from_year,
+            "to": to_year,
+            "features": _added_removed(old["features"], new["features"]),
+            "usage_limits": _added_removed(old["usage_limits"], new["usage_limits"]),
+            "plans": _added_removed(old["plans"], new["plans"]),
+            "add_ons": _added_removed(old_addons, new_addons),
+            "prices": [],
+            "limits": [],
+            "plan_features": {},
+        }
+        for name in new["plans"]:
+            if name not in old["plans"]:
+                continue
+            before, after = old["plans"][name], new["plans"][name]
+            old_price, new_price = (old_doc["plans"][name] or {}).get("price"), (new_doc["plans"][name] or {}).get("price")
+            if old_price != new_price:
+                changes["prices"].append({"plan": name, "from": old_price, "to": new_price})
+            for limit in sorted(set(before["usage_limits"]) | set(after["usage_limits"])):
+                old_value, new_value = before["usage_limits"].get(limit), after["usage_limits"].get(limit)
+                if old_value != new_value:
+                    changes["limits"].append({"plan": name, "limit": limit, "from": old_value, "to": new_value})
+            features = _added_removed(dict.fromkeys(before["features"]), dict.fromkeys(after["features"]))
+            if features["added"] or features["removed"]:
+                changes["plan_features"][name] = features
+        for name in new_addons:
+            if name in old_addons:
+                old_price, new_price = (old_addons[name] or {}).get("price"), (new_addons[name] or {}).get("price")
+                if old_price != new_price:
+                    changes["prices"].append({"add_on": name, "from": old_price, "to": new_price})
+        return changes
+
+
+def _added_removed(old, new):
+    return {"added": [key for key in new if key not in old], "removed": [key for key in old if key not in new]}
+
+
+def size_report(paths, documents, chains):
+    """Bytes of the YAML corpus, of the full parsed snapshots and of the delta store."""
+    yaml_bytes = sum(os.path.getsize(path) for path in paths)
+    snapshot_bytes = sum(len(pickle.dumps(documents[path], protocol=pickle.HIGHEST_PROTOCOL)) for path in paths)
+    base_bytes = sum(len(pickle.dumps(chain["base"], protocol=pickle.HIGHEST_PROTOCOL)) for chain in chains.values())
+    delta_bytes = sum(len(pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL))
+                      for chain in chains.values() for delta in chain["deltas"])
+    store_bytes = len(pickle.dumps(chains, protocol=pickle.HIGHEST_PROTOCOL))
+    return {
+        "saas": len(chains),
+        "versions": len(paths),
+        "unchanged_versions": sum(delta is None for chain in chains.values() for delta in chain["deltas"]),
+        "yaml_bytes": yaml_bytes,
+        "snapshot_bytes": snapshot_bytes,
+        "base_bytes": base_bytes,
+        "delta_bytes": delta_bytes,
+        "store_bytes": store_bytes,
+        "reduction_vs_yaml": 1 - store_bytes / yaml_bytes if yaml_bytes else 0.0,
+        "reduction_vs_snapshots": 1 - store_bytes / snapshot_bytes if snapshot_bytes else 0.0,
+    }
+
+
+def build_store(root=DEFAULT_ROOT, parse_cache=None):
+    paths = yaml_paths(root)
+    documents = (parse_cache or ParsedPricingCache()).preload(paths)
+    chains = build_chains(paths, documents)
+    return {
+        "version": STORE_VERSION,
+        "root": root,
+        "files": file_signature(paths),
+        "chains": chains,
+        "report": size_report(paths, documents, chains),
+    }
+
+
+def load_or_build_store(root=DEFAULT_ROOT, store_path=DEFAULT_STORE, rebuild=False, verbose=True,
+                        parse_cache=None, cache_size=DEFAULT_CACHE_SIZE):
+    """VersionStore for `root` and its size report, rebuilt (and saved) only when a YAML file changed."""
+    data = None
+    if not rebuild and os.path.exists(store_path):
+        with open(store_path, "rb") as f:
+            data = pickle.load(f)
+        if (data.get("version") != STORE_VERSION or data.get("root") != root
+                or data.get("files") != file_signature(yaml_paths(root))):
+            if verbose:
+                print(f"Version store {store_path} is stale, rebuilding...")
+            data = None
+    if data is None:
+        start = time.time()
+        data = build_store(root, parse_cache)
+        tmp_path = f"{store_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, store_path)
+        if verbose:
+            print(f"Stored {data['report']['versions']} versions of {data['report']['saas']} SaaS "
+                  f"in {time.time() - start:.1f}s -> {store_path}")
+    return VersionStore(data["chains"], cache_size), data["report"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta-encoded store of the yearly pricing versions")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Directory of the pricing YAMLs (default: {DEFAULT_ROOT})")
+    parser.add_argument("--store", default=DEFAULT_STORE, help=f"Store file (default: {DEFAULT_STORE})")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the store is up to date")
+    parser.add_argument("--parse-cache", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the parsed YAML cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"Materialised versions kept in memory (default: {DEFAULT_CACHE_SIZE})")
+    parser.add_argument("--diff", nargs=3, metavar=("SAAS", "FROM_YEAR", "TO_YEAR"),
+                        help="Print the differences between two versions of a SaaS")
+    parser.add_argument("--verify", action="store_true",
+                        help="Reconstruct every version and compare it with the parsed YAML")
+    args = parser.parse_args()
+
+    parse_cache = ParsedPricingCache(args.parse_cache)
+    store, report = load_or_build_store(args.root, args.store, rebuild=args.rebuild, parse_cache=parse_cache,
+                                        cache_size=args.cache_size)
+
+    if args.diff:
+        saas, from_year, to_year = args.diff
+        if saas not in store.chains:
+            parser.error(f"Unknown SaaS {saas!r}")
+        for year in (from_year, to_year):
+            if year not in store.chains[saas]["years"]:
+                parser.error(f"{saas} has no {year} version (available: {', '.join(store.years(saas))})")
+        start = time.perf_counter()
+        changes = store.diff(saas, from_year, to_year)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(changes, indent=2, default=str))
+        print(f"Diff computed in {elapsed * 1000:.2f}ms")
+        return
+
+    print(f"{report['saas']} SaaS, {report['versions']} versions ({report['unchanged_versions']} identical to "
+          f"the previous year)")
+    print(f"YAML corpus        {report['yaml_bytes'] / 1024:9.1f} KiB")
+    print(f"parsed snapshots   {report['snapshot_bytes'] / 1024:9.1f} KiB (pickled)")
+    print(f"delta store        {report['store_bytes'] / 1024:9.1f} KiB: bases {report['base_bytes'] / 1024:.1f} KiB "
+          f"+ deltas {report['delta_bytes'] / 1024:.1f} KiB ({report['reduction_vs_yaml']:.1%} smaller than the "
+          f"YAML, {report['reduction_vs_snapshots']:.1%} smaller than the snapshots)")
+
+    if args.verify:
+        start = time.perf_counter()
+        mismatches = [path for saas in store.saas_names() for path in store.chains[saas]["paths"]
+                      if not same_document(store.get_path(path), parse_cache.load(path))]
+        elapsed = time.perf_counter() - start
+        if mismatches:
+            raise SystemExit(f"{len(mismatches)} versions differ from their YAML: {', '.join(mismatches[:5])}")
+        print(f"All {report['versions']} versions reconstructed identically in {elapsed:.2f}s "
+              f"({store.stats['deltas_applied']} deltas applied)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Content-hash manifest of a generated questions file.
+
+`generate_instantiated_questions.py --incremental` stores, next to its output,
+one hash per spec instance (`<output>.manifest.json`). The hash covers the template,
+the placeholder values, the question and plan overrides, the pricing paths and the
+SHA-256 of every referenced pricing file. On the next run only the instances whose
+hash changed are rebuilt; the others are copied from the previous output. The
+changed, added and removed questions are listed in `<output>.changes.json`, which
+`run_experiment.py --changes` uses to re-query only those questions.
+"""
+import hashlib
+import json
+import os
+import time
+
+from results_journal import write_json_atomic
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(output_file):
+    """instantiated_questions.json -> instantiated_questions.manifest.json"""
+    return os.path.splitext(str(output_file))[0] + ".manifest.json"
+
+
+def changes_path_for(output_file):
+    """instantiated_questions.json -> instantiated_questions.changes.json"""
+    return os.path.splitext(str(output_file))[0] + ".changes.json"
+
+
+def stable_hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def instance_key(inst_spec, position):
+    """Spec instances are identified by their `id`; instances without one by their position."""
+    return str(inst_spec["id"]) if inst_spec.get("id") is not None else f"#{position}"
+
+
+class PricingHasher:
+    """SHA-256 of pricing files, re-read only when their mtime or size changed since `previous`."""
+
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.files = {}
+        self.reads = 0
+
+    def digest(self, path):
+        entry = self.files.get(path)
+        if entry is not None:
+            return entry["sha256"]
+        try:
+            st = os.stat(path)
+        except OSError:
+            # A missing pricing file is part of the content too (HARVEY gets no YAML for it)
+            self.files[path] = entry = {"mtime_ns": None, "size": None, "sha256": None}
+            return None
+        entry = self.previous.get(path)
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            with open(path, "rb") as f:
+                entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": hashlib.sha256(f.read()).hexdigest()}
+            self.reads += 1
+        self.files[path] = entry
+        return entry["sha256"]
+
+
+def instance_hash(template_digest, inst_spec, hasher):
+    return stable_hash({
+        "template": template_digest,
+        "placeholder_values": inst_spec.get("placeholder_values"),
+        "question_override": inst_spec.get("question_override"),
+        "plan_overrides": inst_spec.get("plan_overrides"),
+        "pricing_paths": inst_spec.get("pricing_paths"),
+        "pricing_hashes": [hasher.digest(p) for p in inst_spec.get("pricing_paths") or []],
+    })
+
+
+def load_manifest(output_file, fmt):
+    """Manifest of a previous run, or None if it is missing, outdated or does not match the output."""
+    path = manifest_path_for(output_file)
+    if not os.path.exists(path) or not os.path.exists(output_file):
+        return None
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("format") != fmt:
+        return None
+    st = os.stat(output_file)
+    # An output edited or regenerated without --incremental cannot be reused
+    if manifest.get("output_size") != st.st_size or manifest.get("output_mtime_ns") != st.st_mtime_ns:
+        return None
+    return manifest
+
+
+def save_manifest(output_file, fmt, instances, pricing_files):
+    st = os.stat(output_file)
+    write_json_atomic({
+        "version": MANIFEST_VERSION,
+        "format": fmt,
+        "output_size": st.st_size,
+        "output_mtime_ns": st.st_mtime_ns,
+        "pricing_files": pricing_files,
+        "instances": instances,
+    }, manifest_path_for(output_file), indent=None)
+
+
+def save_changes(output_file, added, changed, removed, unchanged):
+    path = changes_path_for(output_file)
+    write_json_atomic({
+        "generated_at": time.time(),
+        "output": str(output_file),
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+    }, path, indent=2)
+    return path
+
+
+def requery_questions(changes):
+    """Questions whose answers must be (re)computed after a regeneration."""
+    return set(changes["added"]) | {c["question"] for c in changes["changed"]}
+
+
+def dropped_questions(changes):
+    """Questions that no longer exist (removed, or renamed by a change)."""
+    dropped = set(changes["removed"])
+    dropped.update(c["previous_question"] for c in changes["changed"] if c["previous_question"] != c["question"])
+    return dropped - requery_questions(changes)
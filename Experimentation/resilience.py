@@ -0,0 +1,111 @@
+"""Retry and circuit-breaker policies used by the experiment runner.
+
+Failed questions are retried inside the same run after an exponential backoff
+with full jitter, without blocking fresh work, up to a per-question budget. A
+circuit breaker watches the outcome of the last calls to an endpoint and pauses
+dispatch for a cooldown when their error rate spikes; after the cooldown a single
+probe request decides whether to resume or to pause again.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+
+RETRYABLE_STATUS = (408, 425, 429)
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=2, base_delay=2.0, max_delay=120.0, rng=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (1-based): full jitter over an exponential cap."""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self.rng.uniform(0, cap)
+
+    def should_retry(self, entry, attempt):
+        """Retry a failed entry unless the budget is spent or the server rejected the request itself."""
+        if attempt > self.max_retries:
+            return False
+        status = entry.get('status_code')
+        if status is not None and 400 <= status < 500 and status not in RETRYABLE_STATUS:
+            return False
+        return True
+
+
+class CircuitBreaker:
+    """Closed -> open when the error rate of the last `window` calls reaches `threshold`.
+
+    While open, `wait` blocks dispatch until `cooldown` seconds have passed; then
+    one probe call is let through (half-open). A successful probe closes the
+    breaker, a failed one opens it again with a doubled cooldown (up to `max_cooldown`).
+    """
+
+    def __init__(self, window=20, threshold=0.5, cooldown=30.0, min_calls=5, max_cooldown=600.0):
+        self.window = window
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_calls = min_calls
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self._changed = asyncio.Event()
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+    async def wait(self):
+        """Return once a request may be dispatched; True if it is the half-open probe."""
+        while True:
+            if self.state == "closed":
+                return False
+            if self.state == "open":
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining <= 0:
+                    self.state = "half_open"
+                    continue
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # half_open: a single probe at a time
+            if not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self._changed.clear()
+            await self._changed.wait()
+
+    def record(self, ok, probe=False):
+        if probe:
+            self.probe_in_flight = False
+            if ok:
+                self.state = "closed"
+                self.cooldown = self.base_cooldown
+                self.outcomes.clear()
+            else:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open("probe request failed")
+            self._changed.set()
+            return
+
+        self.outcomes.append(ok)
+        if (self.state == "closed" and len(self.outcomes) >= self.min_calls
+                and self.error_rate() >= self.threshold):
+            self._open(f"error rate {self.error_rate():.0%} over the last {len(self.outcomes)} calls")
+
+    def _open(self, reason):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"Circuit breaker open ({reason}): pausing dispatch for {self.cooldown:.1f}s")
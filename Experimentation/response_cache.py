@@ -0,0 +1,68 @@
+"""Persistent on-disk cache of HARVEY responses.
+
+A response is stored under the SHA-256 of (model label / API URL, question text,
+pricing YAML contents), one JSON file per key, so re-running `run_experiment.py`
+against an unchanged question set can be served offline (`--replay`) from what an
+earlier run recorded (`--record`).
+"""
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_CACHE_DIR = "response_cache"
+
+
+def response_key(label: str, question: str, pricing_yamls: list[str]) -> str:
+    h = hashlib.sha256()
+    for part in (label, question, *pricing_yamls):
+        data = part.encode("utf-8")
+        # Length-prefix every part so that different splits never collide
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Directory of `<key[:2]>/<key>.json` records, safe to share between threads."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            record = None
+        with self._lock:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stored += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        ratio = (self.hits / lookups) if lookups else 0.0
+        return (
+            f"Response cache ({self.cache_dir}): {self.hits} hits, {self.misses} misses "
+            f"({ratio:.1%} hit ratio), {self.stored} responses recorded"
+        )
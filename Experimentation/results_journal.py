@@ -0,0 +1,110 @@
+"""Append-only JSONL journal used as the checkpoint of `run_experiment.py`.
+
+Every finished question is appended as one JSON line and fsync'd, so the cost of a
+checkpoint no longer depends on how many results are already stored, and a crash
+can at most lose the line being written. `compact_results` folds the journal into
+the usual JSON array results file (atomically) and removes the journal afterwards.
+"""
+import json
+import os
+
+
+def journal_path_for(output_file):
+    """experiment_results_x.json -> experiment_results_x.journal.jsonl"""
+    root, _ = os.path.splitext(output_file)
+    return root + ".journal.jsonl"
+
+
+def iter_journal(path):
+    """Yield the result records of a journal in one streaming pass.
+
+    A truncated last line (crash in the middle of a write) is ignored; undecodable
+    lines elsewhere are reported and skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if not line.endswith(b"\n"):
+                    print(f"Warning: ignoring truncated last line of {path}")
+                else:
+                    print(f"Warning: skipping corrupt line {lineno} of {path}")
+
+
+class ResultsJournal:
+    """Append-only, fsync'd JSONL writer."""
+
+    def __init__(self, path):
+        self.path = path
+        self._repair_tail()
+        self._file = open(path, 'ab')
+
+    def _repair_tail(self):
+        # Drop a partial last line so that the next append starts on a clean line
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                step = min(65536, pos)
+                pos -= step
+                f.seek(pos)
+                idx = f.read(step).rfind(b"\n")
+                if idx != -1:
+                    f.truncate(pos + idx + 1)
+                    return
+            f.truncate(0)
+
+    def append(self, entry):
+        self._file.write(json.dumps(entry).encode('utf-8') + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_json_atomic(obj, path, indent=4):
+    """Write `obj` to a temporary file and rename it over `path`."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def replay_journal(results_map, path):
+    """Apply journal records over `results_map` (keyed by question text); later records win."""
+    count = 0
+    for entry in iter_journal(path):
+        results_map[entry['input']['question']] = entry
+        count += 1
+    return count
+
+
+def compact_results(results, output_file, journal_path=None):
+    """Write the full results list to `output_file` and drop the journal it supersedes."""
+    write_json_atomic(results, output_file)
+    journal_path = journal_path or journal_path_for(output_file)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
@@ -1,125 +1,688 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
 import json
 import os
 import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harvey_http import DEFAULT_POOL_SIZE, connect_time, connections_opened, new_session, reset_connect_time
+from json_stream import iter_records
+from latency_report import build_latency_summary, format_overall, write_latency_report
+from pricing_cache import DEFAULT_MAX_BYTES, PricingCache
+from question_manifest import dropped_questions, requery_questions, stable_hash
+from resilience import CircuitBreaker, RetryPolicy
+from scheduling import load_latency_history, lpt_order, simulate_makespan
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache, response_key
+from results_journal import ResultsJournal, compact_results, journal_path_for, replay_journal, write_json_atomic
 
 API_URL = "http://localhost:8086/chat"
 INPUT_FILE = "instantiated_questions.json"
 OUTPUT_FILE = "experiment_results_gpt_5_nano.json"
+REQUEST_TIMEOUT = 900
+GZIP_LEVEL = 6
+COMPRESS_MODES = ("off", "on", "auto")
 
-def load_results():
-    if os.path.exists(OUTPUT_FILE):
+def load_results(output_file=OUTPUT_FILE):
+    if os.path.exists(output_file):
         try:
-            with open(OUTPUT_FILE, 'r') as f:
+            with open(output_file, 'r') as f:
                 return json.load(f)
         except json.JSONDecodeError:
-            print(f"Warning: Could not decode {OUTPUT_FILE}. Starting fresh.")
+            print(f"Warning: Could not decode {output_file}. Starting fresh.")
             return []
     return []
 
-def save_results(results):
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(results, f, indent=4)
+def save_results(results, output_file=OUTPUT_FILE):
+    write_json_atomic(results, output_file, indent=4)
+
+def load_results_map(output_file=OUTPUT_FILE):
+    """Results keyed by question text: the compacted file plus the journal replayed on top."""
+    # We use the question text as a unique key for now (assuming unique questions)
+    results_map = {entry['input']['question']: entry for entry in load_results(output_file)}
+    replayed = replay_journal(results_map, journal_path_for(output_file))
+    if replayed:
+        print(f"Recovered {replayed} results from journal {journal_path_for(output_file)}")
+    return results_map
+
+def apply_changes(questions, results_map, output_file, changes):
+    """Drop the results of questions listed in a `<questions>.changes.json` so they are asked again.
+
+    The pruned results are compacted right away and the changes file is recorded in
+    `<output>.changes_applied.json`, so resuming an interrupted run does not throw
+    away the answers obtained after the pruning.
+    """
+    marker = os.path.splitext(output_file)[0] + ".changes_applied.json"
+    digest = stable_hash(changes)
+    if os.path.exists(marker):
+        with open(marker, 'r') as f:
+            if json.load(f).get("changes") == digest:
+                return 0
+    stale = [q for q in requery_questions(changes) | dropped_questions(changes) if q in results_map]
+    for question_text in stale:
+        del results_map[question_text]
+    compact_results(ordered_results(questions, results_map), output_file)
+    write_json_atomic({"changes": digest}, marker)
+    return len(stale)
+
+def is_done(entry):
+    # A question counts as done when it has an api_response and no error
+    return bool(entry.get('api_response')) and not entry.get('error')
 
-def run_experiment():
-    print(f"Loading questions from {INPUT_FILE}...")
+def ordered_results(questions, results_map):
+    """Return the results in the order of `questions`.
+
+    Entries loaded from an older results file whose question is no longer in the
+    input are kept at the end so that nothing is lost on save.
+    """
+    ordered = []
+    seen = set()
+    for q in questions:
+        q_text = q['question']
+        if q_text in results_map and q_text not in seen:
+            ordered.append(results_map[q_text])
+            seen.add(q_text)
+    for q_text, entry in results_map.items():
+        if q_text not in seen:
+            ordered.append(entry)
+    return ordered
+
+def shard_of(question_text, num_shards):
+    """Stable shard index of a question: the same on every machine and Python process."""
+    digest = hashlib.sha256(question_text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+def parse_shard(text):
+    """'i/N' -> (i, N) with 0 <= i < N."""
     try:
-        with open(INPUT_FILE, 'r') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: File {INPUT_FILE} not found.")
-        return
+        index, num_shards = (int(x) for x in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--shard must look like i/N, got {text!r}")
+    if num_shards < 1 or not 0 <= index < num_shards:
+        raise argparse.ArgumentTypeError(f"--shard index must be in [0, N), got {text!r}")
+    return index, num_shards
 
-    # Load existing results
-    existing_results = load_results()
-    # Map question text to result entry for easy lookup
-    # We use the question text as a unique key for now (assuming unique questions)
-    results_map = {entry['input']['question']: entry for entry in existing_results}
-    
-    # Process only the first 3 questions (as per original request)
-    # You can remove the slice [:3] to process all questions
-    to_process = questions
-    
-    print(f"Processing {len(to_process)} questions with checkpointing...")
-    
-    for i, item in enumerate(to_process):
-        question_text = item['question']
-        
-        # Check if already processed successfully
-        if question_text in results_map:
-            existing_entry = results_map[question_text]
-            # Check if valid: has api_response and no error
-            if existing_entry.get('api_response') and not existing_entry.get('error'):
-                print(f"[{i+1}/{len(to_process)}] Skipping (already done): {question_text[:50]}...")
-                continue
+def select_shard(questions, shard):
+    if shard is None:
+        return questions
+    index, num_shards = shard
+    selected = [q for q in questions if shard_of(q['question'], num_shards) == index]
+    print(f"Shard {index}/{num_shards}: {len(selected)} of {len(questions)} questions")
+    return selected
+
+def read_pricing_yamls(pricing_paths, pricing_cache=None):
+    pricing_yamls = []
+    for path in pricing_paths:
+        try:
+            if pricing_cache is not None:
+                pricing_yamls.append(pricing_cache.get(path))
             else:
-                print(f"[{i+1}/{len(to_process)}] Retrying (previous error/empty): {question_text[:50]}...")
-        else:
-            print(f"[{i+1}/{len(to_process)}] Asking: {question_text[:50]}...")
-        
-        pricing_paths = item.get('pricing_paths', [])
-        pricing_yamls = []
-        for path in pricing_paths:
-            try:
                 with open(path, 'r') as f:
                     content = f.read()
                     pricing_yamls.append(content)
-            except Exception as e:
-                print(f"  Error reading pricing file {path}: {e}")
-        
+        except Exception as e:
+            print(f"  Error reading pricing file {path}: {e}")
+    return pricing_yamls
+
+class HarveyClient:
+    """Sends questions to one HARVEY endpoint, optionally through a response cache.
+
+    With `replay` the answers are served from `response_cache` only (no network
+    access; misses become error entries), with `record` every successful answer
+    is stored in it. Both together read through the cache and fill the misses.
+
+    Requests share one keep-alive connection pool of `pool_size` connections.
+    Request bodies are gzip-compressed with `compress="on"`, or with `"auto"` once
+    the server advertises `Accept-Encoding: gzip` in a response; a 415 answer to a
+    compressed body turns compression off and the request is resent uncompressed.
+    """
+
+    def __init__(self, api_url=API_URL, pricing_cache=None, response_cache=None,
+                 replay=False, record=False, label=None, verbose=True,
+                 pool_size=DEFAULT_POOL_SIZE, compress="off"):
+        self.api_url = api_url
+        self.label = label or api_url
+        self.pricing_cache = pricing_cache
+        self.response_cache = response_cache
+        self.replay = replay
+        self.record = record
+        self.verbose = verbose
+        self.session = new_session(pool_size)
+        self.compress = compress
+        self.server_accepts_gzip = False
+
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.compressed_requests = 0
+        self.body_bytes = 0
+        self.body_wire_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def close(self):
+        self.session.close()
+
+    def _use_gzip(self):
+        return self.compress == "on" or (self.compress == "auto" and self.server_accepts_gzip)
+
+    def _post(self, body):
+        """POST `body`, compressing it if enabled; returns (response, bytes sent, compressed)."""
+        compressed = self._use_gzip()
+        headers = {"Content-Type": "application/json"}
+        wire_body = body
+        if compressed:
+            wire_body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        # stream=True returns as soon as the status line and headers have arrived
+        response = self.session.post(self.api_url, data=wire_body, headers=headers,
+                                     timeout=REQUEST_TIMEOUT, stream=True)
+        if compressed and response.status_code == 415:
+            self.log("  Server rejected gzip request bodies; sending uncompressed from now on")
+            response.close()
+            self.compress = "off"
+            return self._post(body)
+        if "gzip" in response.headers.get("Accept-Encoding", ""):
+            self.server_accepts_gzip = True
+        return response, len(wire_body), compressed
+
+    def http_summary(self):
+        reused = self.requests_sent - self.connections_opened
+        saved = (1 - self.body_wire_bytes / self.body_bytes) if self.body_bytes else 0.0
+        return (
+            f"HTTP ({self.label}): {self.requests_sent} requests over {self.connections_opened} new connections "
+            f"({max(reused, 0)} reused); request bodies {self.body_bytes / 1024:.1f} KiB -> "
+            f"{self.body_wire_bytes / 1024:.1f} KiB on the wire ({saved:.1%} saved, "
+            f"{self.compressed_requests} gzip); responses {self.response_bytes / 1024:.1f} KiB -> "
+            f"{self.response_wire_bytes / 1024:.1f} KiB on the wire"
+        )
+
+    def ask(self, item, log_prefix=""):
+        """Send one question to HARVEY and build its result entry (never raises)."""
+        question_text = item['question']
+        pricing_yamls = read_pricing_yamls(item.get('pricing_paths', []), self.pricing_cache)
+
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = response_key(self.label, question_text, pricing_yamls)
+            if self.replay:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self.log(f"{log_prefix}  Replayed from response cache")
+                    return {
+                        "input": item,
+                        "api_response": cached["api_response"],
+                        "duration_seconds": cached["duration_seconds"],
+                        "replayed": True
+                    }
+                if not self.record:
+                    self.log(f"{log_prefix}  Not in response cache (replay only)")
+                    return {
+                        "input": item,
+                        "error": "Response not found in cache (replay mode)",
+                        "duration_seconds": 0.0
+                    }
+
         payload = {
             "question": question_text,
             "pricing_yamls": pricing_yamls
         }
-        
-        result_entry = None
+
+        # Phase timings (seconds): encode -> connect -> first byte -> body downloaded -> JSON decoded
+        latency = {}
+        start_time = time.time()
+        t0 = time.perf_counter()
         try:
-            start_time = time.time()
-            print("  Sending request (timeout=900s)...")
-            response = requests.post(API_URL, json=payload, timeout=900)
+            body = json.dumps(payload, allow_nan=False).encode('utf-8')
+            t_encoded = time.perf_counter()
+            latency["encode"] = t_encoded - t0
+            reset_connect_time()
+            try:
+                # The ttfb phase also includes gzip compression of the body, if enabled
+                response, wire_bytes, compressed = self._post(body)
+            finally:
+                with self._stats_lock:
+                    self.connections_opened += connections_opened()
+            t_headers = time.perf_counter()
+            latency["connect"] = connect_time()
+            latency["ttfb"] = t_headers - t_encoded
+            with self._stats_lock:
+                self.requests_sent += 1
+                self.body_bytes += len(body)
+                self.body_wire_bytes += wire_bytes
+                self.compressed_requests += int(compressed)
             response.raise_for_status()
+            content = response.content
+            t_body = time.perf_counter()
+            latency["download"] = t_body - t_headers
+            with self._stats_lock:
+                self.response_bytes += len(content)
+                self.response_wire_bytes += response.raw.tell()
             data = response.json()
+            latency["decode"] = time.perf_counter() - t_body
+            latency["total"] = time.perf_counter() - t0
             duration = time.time() - start_time
-            
-            print(f"  Success ({duration:.2f}s)")
-            
-            result_entry = {
+
+            self.log(f"{log_prefix}  Success ({duration:.2f}s, ttfb {latency['ttfb']:.2f}s)")
+
+            if self.record and cache_key is not None:
+                self.response_cache.put(cache_key, {
+                    "label": self.label,
+                    "question": question_text,
+                    "pricing_paths": item.get('pricing_paths', []),
+                    "api_response": data,
+                    "duration_seconds": duration
+                })
+
+            return {
                 "input": item,
                 "api_response": data,
-                "duration_seconds": duration
+                "duration_seconds": duration,
+                "latency": latency
             }
-            
+
         except requests.exceptions.RequestException as e:
             duration = time.time() - start_time
-            print(f"  API Request failed after {duration:.2f}s: {e}")
+            latency["total"] = time.perf_counter() - t0
+            self.log(f"{log_prefix}  API Request failed after {duration:.2f}s: {e}")
             if hasattr(e, 'response') and e.response is not None:
-                 print(f"  Response: {e.response.text}")
-            
+                 self.log(f"{log_prefix}  Response: {e.response.text}")
+
             result_entry = {
                 "input": item,
                 "error": str(e),
-                "duration_seconds": duration
+                "duration_seconds": duration,
+                "latency": latency
             }
-        
-        # Update results map and save immediately
-        results_map[question_text] = result_entry
-        
-        # Convert map back to list, preserving order of 'questions' if possible or just values
-        # To preserve order of the original questions list:
-        current_results_list = []
-        for q in questions: # Iterate over all questions to maintain order/completeness
-            q_text = q['question']
-            if q_text in results_map:
-                current_results_list.append(results_map[q_text])
-            # If we haven't processed it yet, it's not in the results file.
-            # But wait, we only want to save what we have processed.
-            # Let's just save the values of the map.
-        
-        # Actually, let's just save the list of results we have so far.
-        # The map is keyed by question text.
-        save_results(list(results_map.values()))
-
-    print("Done.")
+            if getattr(e, 'response', None) is not None:
+                result_entry["status_code"] = e.response.status_code
+            return result_entry
+
+class RateLimiter:
+    """Spaces request starts so that at most `rps` requests begin per second."""
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def run_questions_async(questions, results_map, journal, client,
+                              concurrency=1, rps=None, log_label=None,
+                              retry_policy=None, breaker=None, history=None):
+    """Dispatch pending questions with at most `concurrency` requests in flight.
+
+    Every final answer is appended to `journal` as soon as it arrives. Failed calls
+    allowed by `retry_policy` are re-queued after their backoff, so retries never
+    hold a worker while fresh questions are waiting, and `breaker` (if any) pauses
+    dispatch while the endpoint is failing. With a latency `history` the slowest
+    expected questions are dispatched first.
+    """
+    total = len(questions)
+    pending = []
+    for i, item in enumerate(questions):
+        question_text = item['question']
+        prefix = f"[{log_label} {i+1}/{total}]" if log_label else f"[{i+1}/{total}]"
+        # Check if already processed successfully
+        if question_text in results_map:
+            if is_done(results_map[question_text]):
+                print(f"{prefix} Skipping (already done): {question_text[:50]}...")
+                continue
+            print(f"{prefix} Retrying (previous error/empty): {question_text[:50]}...")
+        pending.append((prefix, item))
+
+    if not pending:
+        return
+
+    lane = f"{log_label}: " if log_label else ""
+    file_order_items = [item for _, item in pending]
+    if history is not None:
+        pending = lpt_order(pending, lambda p: history.expected(p[1]))
+        predicted = simulate_makespan([history.expected(item) for _, item in pending], concurrency)
+        predicted_file_order = simulate_makespan([history.expected(item) for item in file_order_items],
+                                                 concurrency)
+        eta = time.strftime('%H:%M:%S', time.localtime(time.time() + predicted))
+        print(f"{lane}Longest-expected-first dispatch of {len(pending)} questions: predicted makespan "
+              f"{predicted:.1f}s (ETA {eta}) vs {predicted_file_order:.1f}s in file order")
+
+    retry_policy = retry_policy or RetryPolicy(max_retries=0)
+    limiter = RateLimiter(rps) if rps else None
+    loop = asyncio.get_running_loop()
+    # requests is blocking: each in-flight call gets its own worker thread
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    queue = asyncio.Queue()
+    for prefix, item in pending:
+        queue.put_nowait((prefix, item, 0))
+    remaining = len(pending)
+    all_done = asyncio.Event()
+    retry_timers = []
+
+    def finish(item, result_entry):
+        nonlocal remaining
+        # Update results map and checkpoint immediately (runs on the event loop, so no races)
+        results_map[item['question']] = result_entry
+        journal.append(result_entry)
+        remaining -= 1
+        if remaining == 0:
+            all_done.set()
+
+    async def worker():
+        while True:
+            prefix, item, attempt = await queue.get()
+            probe = await breaker.wait() if breaker is not None else False
+            if limiter is not None:
+                await limiter.wait()
+            if attempt:
+                print(f"{prefix} Asking (retry {attempt}/{retry_policy.max_retries}): {item['question'][:50]}...")
+            else:
+                print(f"{prefix} Asking: {item['question'][:50]}...")
+            result_entry = await loop.run_in_executor(executor, client.ask, item, prefix)
+            ok = not result_entry.get('error')
+            if breaker is not None:
+                breaker.record(ok, probe)
+            if ok or not retry_policy.should_retry(result_entry, attempt + 1):
+                finish(item, result_entry)
+                continue
+            delay = retry_policy.backoff(attempt + 1)
+            print(f"{prefix}  Will retry in {delay:.1f}s")
+            retry_timers.append(loop.call_later(delay, queue.put_nowait, (prefix, item, attempt + 1)))
+
+    dispatch_start = time.monotonic()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    done_waiter = asyncio.ensure_future(all_done.wait())
+    try:
+        finished, _ = await asyncio.wait([done_waiter, *workers], return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            # A worker only stops on an unexpected error (e.g. the journal cannot be written)
+            if task is not done_waiter:
+                task.result()
+        if history is not None:
+            # What the same answers would have cost if dispatched in file order
+            actual = time.monotonic() - dispatch_start
+            file_order = [results_map[item['question']].get('duration_seconds') or 0.0
+                          for item in file_order_items]
+            print(f"{lane}Actual makespan {actual:.1f}s vs {simulate_makespan(file_order, concurrency):.1f}s "
+                  f"simulated for file-order dispatch of the same calls")
+    finally:
+        for timer in retry_timers:
+            timer.cancel()
+        for task in (done_waiter, *workers):
+            task.cancel()
+        await asyncio.gather(done_waiter, *workers, return_exceptions=True)
+        executor.shutdown(wait=False)
+
+def load_questions(input_file=INPUT_FILE):
+    print(f"Loading questions from {input_file}...")
+    try:
+        # JSON array or JSON Lines (generate_instantiated_questions.py --format jsonl)
+        return list(iter_records(input_file))
+    except FileNotFoundError:
+        print(f"Error: File {input_file} not found.")
+        return None
+
+def load_endpoints(sweep_file, compress="off"):
+    """Read a sweep definition: a JSON list of
+    {label, api_url[, output, concurrency, rps, pool_size, compress]}."""
+    with open(sweep_file, 'r') as f:
+        endpoints = json.load(f)
+    labels = set()
+    for ep in endpoints:
+        if not ep.get('label') or not ep.get('api_url'):
+            raise ValueError(f"Every endpoint in {sweep_file} needs a 'label' and an 'api_url': {ep}")
+        if ep['label'] in labels:
+            raise ValueError(f"Duplicate endpoint label in {sweep_file}: {ep['label']}")
+        labels.add(ep['label'])
+        ep.setdefault('output', f"experiment_results_{ep['label']}.json")
+        ep.setdefault('concurrency', 1)
+        ep.setdefault('rps', None)
+        ep.setdefault('pool_size', ep['concurrency'])
+        ep.setdefault('compress', compress)
+        if ep['compress'] not in COMPRESS_MODES:
+            raise ValueError(f"'compress' must be one of {COMPRESS_MODES} in {sweep_file}: {ep}")
+    outputs = [ep['output'] for ep in endpoints]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"Endpoints in {sweep_file} must write to different output files")
+    return endpoints
+
+def finalize_results(questions, results_map, output_file):
+    """Compact the checkpoint into `output_file` and write the latency report next to it."""
+    results = ordered_results(questions, results_map)
+    compact_results(results, output_file)
+    json_path, prom_path = write_latency_report(results, output_file)
+    print(f"Latency of {output_file} (successful HARVEY calls):")
+    print(format_overall(build_latency_summary(results)))
+    print(f"Latency summary written to {json_path} and {prom_path}")
+
+def run_endpoints(questions, endpoints, pricing_cache_bytes=DEFAULT_MAX_BYTES,
+                  response_cache_dir=None, replay=False, record=False,
+                  retry_policy=None, breaker_settings=None, history_files=None, changes=None):
+    """Run `questions` against every endpoint in the same event loop.
+
+    Each endpoint drains the shared question list through its own lane (results map,
+    journal, concurrency limit, rate limit and circuit breaker), so a slow or failing
+    backend never holds up the others, while pricing payloads are read once and
+    shared by all of them. `breaker_settings` are the CircuitBreaker arguments
+    (None disables the breaker); `history_files` are earlier results files whose
+    latencies drive longest-expected-first dispatch. With `changes` (the changes file
+    of an incremental regeneration) only the added and changed questions are asked,
+    replacing their previous results.
+    """
+    pricing_cache = PricingCache(pricing_cache_bytes)
+    response_cache = None
+    if replay or record:
+        response_cache = ResponseCache(response_cache_dir or DEFAULT_CACHE_DIR)
+    if replay and not record:
+        # Nothing to retry without network access
+        retry_policy = None
+
+    history = None
+    if history_files:
+        history = load_latency_history(history_files)
+        print(f"Loaded {len(history)} latency samples from {len(history_files)} results files")
+
+    pending = questions
+    if changes is not None:
+        requery = requery_questions(changes)
+        pending = [q for q in questions if q['question'] in requery]
+
+    lanes = []
+    breakers = {}
+    for ep in endpoints:
+        # Load existing results (compacted file + journal of the interrupted run, if any)
+        results_map = load_results_map(ep['output'])
+        if changes is not None:
+            dropped = apply_changes(questions, results_map, ep['output'], changes)
+            print(f"{ep['output']}: {len(pending)} added or changed questions to ask, "
+                  f"{dropped} outdated results dropped")
+        client = HarveyClient(ep['api_url'], pricing_cache, response_cache,
+                              replay=replay, record=record, label=ep.get('label'),
+                              pool_size=ep.get('pool_size', ep['concurrency']),
+                              compress=ep.get('compress', "off"))
+        lanes.append((ep, results_map, client, ResultsJournal(journal_path_for(ep['output']))))
+        if breaker_settings is not None:
+            breakers[ep['output']] = CircuitBreaker(**breaker_settings)
+        print(f"{ep.get('label') or ep['api_url']}: processing {len(pending)} questions with checkpointing "
+              f"into {ep['output']} (concurrency={ep['concurrency']}"
+              + (f", rps={ep['rps']}" if ep.get('rps') else "") + ")...")
+
+    log_labels = len(lanes) > 1
+
+    async def run_all():
+        await asyncio.gather(*(
+            run_questions_async(pending, results_map, journal, client,
+                                concurrency=ep['concurrency'], rps=ep.get('rps'),
+                                log_label=ep['label'] if log_labels else None,
+                                retry_policy=retry_policy, breaker=breakers.get(ep['output']),
+                                history=history)
+            for ep, results_map, client, journal in lanes
+        ))
+
+    start_time = time.time()
+    try:
+        asyncio.run(run_all())
+    finally:
+        for ep, results_map, client, journal in lanes:
+            journal.close()
+            # Also on Ctrl-C: the journal is only removed once the compacted file is in place
+            finalize_results(questions, results_map, ep['output'])
+            print(client.http_summary())
+            client.close()
+            if ep['output'] in breakers:
+                print(f"Circuit breaker ({client.label}): opened {breakers[ep['output']].times_opened} times")
+        print(pricing_cache.summary())
+        if response_cache is not None:
+            print(response_cache.summary())
+    print(f"Done in {time.time() - start_time:.2f}s.")
+
+def run_experiment(api_url=API_URL, input_file=INPUT_FILE, output_file=OUTPUT_FILE,
+                   concurrency=1, rps=None, pricing_cache_bytes=DEFAULT_MAX_BYTES,
+                   response_cache_dir=None, replay=False, record=False, model_label=None, shard=None,
+                   pool_size=None, compress="off", retry_policy=None, breaker_settings=None,
+                   history_files=None, changes=None):
+    questions = load_questions(input_file)
+    if questions is None:
+        return
+    questions = select_shard(questions, shard)
+    endpoint = {"label": model_label, "api_url": api_url, "output": output_file,
+                "concurrency": concurrency, "rps": rps,
+                "pool_size": pool_size or concurrency, "compress": compress}
+    run_endpoints(questions, [endpoint], pricing_cache_bytes, response_cache_dir, replay, record,
+                  retry_policy, breaker_settings, history_files, changes)
+
+def run_sweep(sweep_file, input_file=INPUT_FILE, pricing_cache_bytes=DEFAULT_MAX_BYTES,
+              response_cache_dir=None, replay=False, record=False, shard=None, compress="off",
+              retry_policy=None, breaker_settings=None, history_files=None, changes=None):
+    endpoints = load_endpoints(sweep_file, compress)
+    questions = load_questions(input_file)
+    if questions is None:
+        return
+    questions = select_shard(questions, shard)
+    run_endpoints(questions, endpoints, pricing_cache_bytes, response_cache_dir, replay, record,
+                  retry_policy, breaker_settings, history_files, changes)
+
+def compact(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """Fold the journal of an interrupted run into `output_file` without sending requests."""
+    questions = []
+    if os.path.exists(input_file):
+        questions = list(iter_records(input_file))
+    results_map = load_results_map(output_file)
+    compact_results(ordered_results(questions, results_map), output_file)
+    print(f"Compacted {len(results_map)} results into {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run instantiated PI questions against HARVEY")
+    parser.add_argument("--api-url", default=API_URL, help=f"HARVEY chat endpoint (default: {API_URL})")
+    parser.add_argument("--input", default=INPUT_FILE, help=f"Instantiated questions JSON (default: {INPUT_FILE})")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"Results JSON with checkpointing (default: {OUTPUT_FILE})")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum number of in-flight requests (default: 1, sequential)")
+    parser.add_argument("--rps", type=float, default=None,
+                        help="Optional cap on requests started per second")
+    parser.add_argument("--pricing-cache-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Memory budget of the pricing YAML cache in MiB (default: %(default)s)")
+    parser.add_argument("--record", action="store_true",
+                        help="Store every successful HARVEY response in the response cache")
+    parser.add_argument("--replay", action="store_true",
+                        help="Serve responses from the response cache without network access "
+                             "(combine with --record to only query HARVEY on cache misses)")
+    parser.add_argument("--response-cache", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the response cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--model-label", default=None,
+                        help="Label identifying the backend in the response cache key (default: --api-url)")
+    parser.add_argument("--sweep", default=None,
+                        help="JSON list of endpoints ({label, api_url[, output, concurrency, rps]}) to run "
+                             "in one process; overrides --api-url, --output, --concurrency and --rps")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Keep-alive connections kept per endpoint (default: --concurrency)")
+    parser.add_argument("--compress", choices=COMPRESS_MODES, default="off",
+                        help="gzip request bodies: always (on), once the server advertises "
+                             "Accept-Encoding: gzip (auto), or never (off, default)")
+    parser.add_argument("--max-retries", type=int, default=0,
+                        help="In-run retries per failed question, with exponential backoff and jitter "
+                             "(default: 0, a single attempt per question)")
+    parser.add_argument("--retry-base-delay", type=float, default=2.0,
+                        help="Backoff cap of the first retry in seconds, doubled on every retry (default: 2)")
+    parser.add_argument("--retry-max-delay", type=float, default=120.0,
+                        help="Maximum backoff in seconds (default: 120)")
+    parser.add_argument("--breaker-threshold", type=float, default=0.0,
+                        help="Error rate over the last --breaker-window calls that pauses dispatch, e.g. 0.5 "
+                             "(default: 0, no circuit breaker)")
+    parser.add_argument("--breaker-window", type=int, default=20,
+                        help="Number of recent calls watched by the circuit breaker (default: 20)")
+    parser.add_argument("--breaker-cooldown", type=float, default=30.0,
+                        help="Seconds dispatch is paused when the circuit breaker opens (default: 30)")
+    parser.add_argument("--history", nargs="+", default=None, metavar="RESULTS_JSON",
+                        help="Earlier results files; their per-template latencies are used to dispatch "
+                             "the slowest expected questions first")
+    parser.add_argument("--shard", type=parse_shard, default=None,
+                        help="Only run shard i of N (i/N, 0-based), assigned by a stable hash of the question")
+    parser.add_argument("--changes", default=None, metavar="CHANGES_JSON",
+                        help="Changes file of an incremental regeneration (<questions>.changes.json): only ask "
+                             "the added and changed questions and drop the results of changed and removed ones")
+    parser.add_argument("--compact", action="store_true",
+                        help="Only fold the checkpoint journal into --output and exit")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be >= 1")
+    if args.rps is not None and args.rps <= 0:
+        parser.error("--rps must be > 0")
+    if args.pool_size is not None and args.pool_size < 1:
+        parser.error("--pool-size must be >= 1")
+    if args.max_retries < 0:
+        parser.error("--max-retries must be >= 0")
+    if args.breaker_window < 1:
+        parser.error("--breaker-window must be >= 1")
+
+    pricing_cache_bytes = int(args.pricing_cache_mb * 1024 * 1024)
+    retry_policy = RetryPolicy(args.max_retries, args.retry_base_delay, args.retry_max_delay)
+    breaker_settings = None
+    if args.breaker_threshold > 0:
+        breaker_settings = {"window": args.breaker_window, "threshold": args.breaker_threshold,
+                            "cooldown": args.breaker_cooldown, "min_calls": min(5, args.breaker_window)}
+    changes = None
+    if args.changes:
+        with open(args.changes, 'r') as f:
+            changes = json.load(f)
+
+    if args.sweep:
+        if args.compact:
+            for ep in load_endpoints(args.sweep, args.compress):
+                compact(args.input, ep['output'])
+            return
+        run_sweep(args.sweep, args.input, pricing_cache_bytes=pricing_cache_bytes,
+                  response_cache_dir=args.response_cache, replay=args.replay, record=args.record,
+                  shard=args.shard, compress=args.compress,
+                  retry_policy=retry_policy, breaker_settings=breaker_settings,
+                  history_files=args.history, changes=changes)
+        return
+
+    if args.compact:
+        compact(args.input, args.output)
+        return
+
+    run_experiment(args.api_url, args.input, args.output,
+                   concurrency=args.concurrency, rps=args.rps,
+                   pricing_cache_bytes=pricing_cache_bytes,
+                   response_cache_dir=args.response_cache, replay=args.replay, record=args.record,
+                   model_label=args.model_label, shard=args.shard,
+                   pool_size=args.pool_size, compress=args.compress,
+                   retry_policy=retry_policy, breaker_settings=breaker_settings,
+                   history_files=args.history, changes=changes)
 
 if __name__ == "__main__":
-    run_experiment()
+    main()
@@ -0,0 +1,346 @@
+"""Cheap metric estimates from a stratified sample of the questions.
+
+Questions are stratified by `template_index` (from instantiation_spec.json, whose
+instances are paired with the questions by their instantiated text) and sent to
+HARVEY in rounds. After every round the per-question `hierarchical_f1` and
+content `accuracy` are computed with the same functions as
+`Evaluation/generate_evaluation_report.py`, and the overall value of each metric is
+estimated with the stratified estimator (strata weighted by their size, with
+finite population correction). As in the report's `overall`, `hierarchical_f1` is
+the F1 of the mean hierarchical precision and recall (not the mean per-question
+F1); its interval comes from the delta method. Sampling stops once the confidence interval of the
+chosen metric is narrower than `--ci-width`, or when every question was asked.
+Strata where every question failed are reported and left out of the estimate, which
+then covers only the strata with answers.
+
+Every stratum first gets `--min-per-stratum` questions; later rounds go to the
+strata where one more question shrinks the variance of the estimate the most
+(adaptive Neyman allocation).
+
+Usage (from the project root):
+  python3 Experimentation/run_sampled_experiment.py --input instantiated_questions.json \\
+    --spec Experimentation/instantiation_spec.json --output experiment_results_sample.json --ci-width 0.1
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from generate_instantiated_questions import iter_instantiated_questions
+from pricing_cache import PricingCache
+from results_journal import ResultsJournal, journal_path_for
+from run_experiment import (API_URL, INPUT_FILE, HarveyClient, finalize_results, is_done, load_questions,
+                            load_results_map, run_questions_async)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Evaluation"))
+from generate_evaluation_report import (compute_content_accuracy, compute_structure_metrics,  # noqa: E402
+                                        extract_actions, safe_get)
+
+METRICS = ("hierarchical_f1", "content_accuracy")
+# Per-question scores; hierarchical_f1 is estimated from precision and recall
+SCORES = ("hierarchical_precision", "hierarchical_recall", "hierarchical_f1", "content_accuracy")
+DEFAULT_SPEC = "Experimentation/instantiation_spec.json"
+DEFAULT_TEMPLATES = "Experimentation/pi_task_templates.json"
+
+
+def score_entry(entry, lam=0.5):
+    """Per-question metrics, exactly as generate_evaluation_report.build_report computes them."""
+    g_actions = extract_actions(safe_get(entry, "input", "plan", "actions", default=[]))
+    h_actions = extract_actions(safe_get(entry, "api_response", "plan", "actions", default=[]))
+    structure = compute_structure_metrics(g_actions, h_actions, lam=lam)
+    return {
+        "hierarchical_precision": structure["hierarchical_precision"],
+        "hierarchical_recall": structure["hierarchical_recall"],
+        "hierarchical_f1": structure["hierarchical_f1"],
+        "content_accuracy": compute_content_accuracy(g_actions, h_actions)["accuracy"],
+    }
+
+
+def stratify(questions, spec=None, templates=None):
+    """stratum -> questions; strata are spec template indexes, or template texts without spec.
+
+    Spec instances are instantiated with `templates` and paired with the questions by
+    question text; any question or instance left unpaired raises ValueError."""
+    if spec is None:
+        strata = defaultdict(list)
+        for item in questions:
+            strata[item.get("template")].append(item)
+        return strata
+
+    template_index = {}
+    for inst_spec, item in zip(spec["instances"], iter_instantiated_questions(templates, spec["instances"])):
+        if template_index.setdefault(item["question"], inst_spec["template_index"]) != inst_spec["template_index"]:
+            raise ValueError(f"Spec instances of different templates give the same question: {item['question']!r}")
+    texts = {item["question"] for item in questions}
+    unmatched = [item["question"] for item in questions if item["question"] not in template_index]
+    unused = [text for text in template_index if text not in texts]
+    if unmatched or unused:
+        examples = (unmatched or unused)[0]
+        raise ValueError(f"The spec does not match the questions: {len(unmatched)} questions without a spec "
+                         f"instance, {len(unused)} spec instances without a question (e.g. {examples!r})")
+    strata = defaultdict(list)
+    for item in questions:
+        strata[template_index[item["question"]]].append(item)
+    return strata
+
+
+def stratified_estimate(strata_sizes, samples, confidence):
+    """Stratified mean, standard error and CI half-width. `samples`: stratum -> list of values."""
+    total = sum(strata_sizes.values())
+    mean = 0.0
+    variance = 0.0
+    for h, size in strata_sizes.items():
+        values = samples.get(h) or []
+        n = len(values)
+        if n == 0:
+            return None
+        weight = size / total
+        mean += weight * statistics.fmean(values)
+        if n > 1:
+            fpc = 1 - n / size
+            variance += weight ** 2 * statistics.variance(values) / n * fpc
+    return _interval(mean, math.sqrt(variance), confidence)
+
+
+def _interval(mean, se, confidence):
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    return {"mean": mean, "se": se, "ci_low": mean - z * se, "ci_high": mean + z * se, "ci_width": 2 * z * se}
+
+
+def f1(precision, recall):
+    """F1 of a precision and a recall, as overall.structure_hierarchical_f1 of the evaluation report."""
+    return 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+
+
+def f1_estimate(strata_sizes, precision, recall, confidence):
+    """F1 of the stratified mean precision and recall, with a delta-method interval.
+
+    The standard error is the one of the stratified mean of the linearized values
+    dF/dP * p_i + dF/dR * r_i, evaluated at the estimated means."""
+    p = stratified_estimate(strata_sizes, precision, confidence)
+    r = stratified_estimate(strata_sizes, recall, confidence)
+    if p is None or r is None:
+        return None
+    total = p["mean"] + r["mean"]
+    if total == 0:
+        return _interval(0.0, 0.0, confidence)
+    d_p = 2 * r["mean"] ** 2 / total ** 2
+    d_r = 2 * p["mean"] ** 2 / total ** 2
+    linearized = {h: [d_p * a + d_r * b for a, b in zip(precision[h], recall[h])] for h in strata_sizes}
+    se = stratified_estimate(strata_sizes, linearized, confidence)["se"]
+    return _interval(f1(p["mean"], r["mean"]), se, confidence)
+
+
+def estimate_metrics(strata_sizes, samples, confidence):
+    """Stratified estimates of the precision, recall, F1 and content accuracy of the report's `overall`."""
+    def scores(m):
+        return {h: samples[h][m] for h in strata_sizes}
+    return {
+        "hierarchical_precision": stratified_estimate(strata_sizes, scores("hierarchical_precision"), confidence),
+        "hierarchical_recall": stratified_estimate(strata_sizes, scores("hierarchical_recall"), confidence),
+        "hierarchical_f1": f1_estimate(strata_sizes, scores("hierarchical_precision"),
+                                       scores("hierarchical_recall"), confidence),
+        "content_accuracy": stratified_estimate(strata_sizes, scores("content_accuracy"), confidence),
+    }
+
+
+def allocation_gain(size, total, values):
+    """Variance reduction of the stratified mean from sampling one more question of a stratum.
+
+    The sample variance is smoothed with one pseudo-observation of the maximum variance of a
+    [0, 1] metric (0.25), so strata that happened to look constant are not starved.
+    """
+    n = len(values)
+    if n >= size:
+        return -1.0
+    mean = statistics.fmean(values) if values else 0.5
+    s2 = (sum((v - mean) ** 2 for v in values) + 0.25) / (n + 1)
+    weight = size / total
+    return weight ** 2 * s2 * (1 / max(n, 1) - 1 / (n + 1))
+
+
+def next_batch(strata, remaining, samples, batch_size, min_per_stratum, metric):
+    """Pick the next questions to ask: first fill every stratum up to `min_per_stratum`."""
+    sizes = {h: len(items) for h, items in strata.items()}
+    total = sum(sizes.values())
+    batch = []
+    for h in strata:
+        need = min(min_per_stratum, sizes[h]) - len(samples[h][metric])
+        while need > 0 and remaining[h]:
+            batch.append((h, remaining[h].pop()))
+            need -= 1
+    if batch:
+        return batch
+
+    planned = defaultdict(list)
+    for _ in range(batch_size):
+        best, best_gain = None, 0.0
+        for h in strata:
+            if not remaining[h] or len(planned[h]) >= len(remaining[h]):
+                continue
+            # Planned questions count as average observations of the stratum
+            values = samples[h][metric]
+            values = values + [statistics.fmean(values)] * len(planned[h]) if values else values
+            gain = allocation_gain(sizes[h], total, values)
+            if gain > best_gain:
+                best, best_gain = h, gain
+        if best is None:
+            break
+        planned[best].append(None)
+    for h, slots in planned.items():
+        for _ in slots:
+            batch.append((h, remaining[h].pop()))
+    return batch
+
+
+def stratum_summary(size, scores):
+    """Size, sampled questions and the statistics of `estimate_metrics` over one stratum."""
+    n = len(scores["hierarchical_f1"])
+    means = {m: statistics.fmean(scores[m]) if n else None for m in SCORES if m != "hierarchical_f1"}
+    means["hierarchical_f1"] = f1(means["hierarchical_precision"], means["hierarchical_recall"]) if n else None
+    return {"size": size, "sampled": n, **means}
+
+
+def run_sampled_experiment(questions, spec, client, output_file, ci_width, metric="hierarchical_f1",
+                           confidence=0.95, min_per_stratum=2, concurrency=4, seed=0, templates=None):
+    strata = stratify(questions, spec, templates)
+    rng = random.Random(seed)
+    remaining = {}
+    for h, items in strata.items():
+        items = list(items)
+        rng.shuffle(items)
+        remaining[h] = items
+    sizes = {h: len(items) for h, items in strata.items()}
+    samples = {h: {m: [] for m in SCORES} for h in strata}
+    # Questions already answered in an earlier (interrupted) run are reused without a new call
+    results_map = load_results_map(output_file)
+    calls = 0
+    failed = 0
+    rounds = []
+    journal = ResultsJournal(journal_path_for(output_file))
+    asked = []
+    estimates = {}
+    start_time = time.time()
+    try:
+        while True:
+            # Allocation uses the per-question scores of `metric` as the stratum variance proxy
+            batch = next_batch(strata, remaining, samples, concurrency, min_per_stratum, metric)
+            if not batch:
+                break
+            items = [item for _, item in batch]
+            calls += sum(1 for item in items
+                         if item["question"] not in results_map or not is_done(results_map[item["question"]]))
+            asyncio.run(run_questions_async(items, results_map, journal, client, concurrency=concurrency))
+            asked.extend(items)
+            for h, item in batch:
+                entry = results_map.get(item["question"])
+                if entry is None or not is_done(entry):
+                    failed += 1
+                    continue
+                for m, value in score_entry(entry).items():
+                    samples[h][m].append(value)
+
+            # Strata with no questions left and no answer are dropped from the estimate
+            dropped = [h for h in strata if not remaining[h] and not samples[h][metric]]
+            estimated_sizes = {h: size for h, size in sizes.items() if h not in dropped}
+            estimates = (estimate_metrics(estimated_sizes, samples, confidence) if estimated_sizes
+                         else dict.fromkeys(SCORES))
+            n_sampled = sum(len(samples[h][metric]) for h in strata)
+            rounds.append({"sampled": n_sampled, "calls": calls, "dropped_strata": [str(h) for h in dropped],
+                           "estimates": estimates})
+            current = estimates[metric]
+            if current is not None:
+                print(f"Round {len(rounds)}: {n_sampled} scored, {metric} = {current['mean']:.4f} "
+                      f"[{current['ci_low']:.4f}, {current['ci_high']:.4f}] (width {current['ci_width']:.4f})")
+                filled = all(len(samples[h][metric]) >= min(min_per_stratum, sizes[h]) or not remaining[h]
+                             for h in strata)
+                if filled and current["ci_width"] < ci_width:
+                    break
+    finally:
+        journal.close()
+        finalize_results(asked, results_map, output_file)
+
+    return {
+        "metric": metric,
+        "target_ci_width": ci_width,
+        "confidence": confidence,
+        "population": len(questions),
+        "sampled": sum(len(samples[h][metric]) for h in strata),
+        "failed": failed,
+        "harvey_calls": calls,
+        "calls_saved": len(questions) - len(asked),
+        "dropped_strata": [str(h) for h in strata if not remaining[h] and not samples[h][metric]],
+        "elapsed_seconds": time.time() - start_time,
+        # Same statistics as the overall block of generate_evaluation_report.py
+        "statistics": {"hierarchical_f1": "F1 of the mean hierarchical precision and recall",
+                       "hierarchical_precision": "mean", "hierarchical_recall": "mean", "content_accuracy": "mean"},
+        "estimates": estimates,
+        "per_stratum": {str(h): stratum_summary(sizes[h], samples[h]) for h in strata},
+        "rounds": rounds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate HARVEY metrics from an adaptive stratified sample")
+    parser.add_argument("--api-url", default=API_URL, help=f"HARVEY chat endpoint (default: {API_URL})")
+    parser.add_argument("--input", default=INPUT_FILE, help=f"Instantiated questions JSON (default: {INPUT_FILE})")
+    parser.add_argument("--spec", default=DEFAULT_SPEC,
+                        help=f"instantiation_spec.json giving the template_index strata (default: {DEFAULT_SPEC}); "
+                             "if missing, questions are stratified by template text")
+    parser.add_argument("--templates", default=DEFAULT_TEMPLATES,
+                        help="Question templates used to pair spec instances with questions "
+                             f"(default: {DEFAULT_TEMPLATES})")
+    parser.add_argument("--output", required=True, help="Results JSON for the sampled questions")
+    parser.add_argument("--ci-width", type=float, required=True,
+                        help="Stop once the confidence interval of --metric is narrower than this")
+    parser.add_argument("--metric", choices=METRICS, default="hierarchical_f1",
+                        help="Metric whose interval controls early stopping (default: hierarchical_f1)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    parser.add_argument("--min-per-stratum", type=int, default=2,
+                        help="Questions asked per template before stopping is considered (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions asked per round (default: 4)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sampling order")
+    args = parser.parse_args()
+
+    questions = load_questions(args.input)
+    if questions is None:
+        return
+    spec = templates = None
+    if os.path.exists(args.spec):
+        with open(args.spec, "r") as f:
+            spec = json.load(f)
+        with open(args.templates, "r") as f:
+            templates = json.load(f)
+
+    client = HarveyClient(args.api_url, PricingCache(), pool_size=args.concurrency)
+    try:
+        report = run_sampled_experiment(questions, spec, client, args.output, args.ci_width, args.metric,
+                                        args.confidence, args.min_per_stratum, args.concurrency, args.seed,
+                                        templates)
+    finally:
+        client.close()
+
+    report_path = os.path.splitext(args.output)[0] + ".sampling.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if report["dropped_strata"]:
+        print(f"Warning: every question of strata {', '.join(report['dropped_strata'])} failed; "
+              "they are left out of the estimates")
+    for m in METRICS:
+        est = report["estimates"].get(m)
+        if est:
+            print(f"{m} ({report['statistics'][m]}): {est['mean']:.4f} ± {est['ci_width'] / 2:.4f} "
+                  f"({args.confidence:.0%} CI)")
+    print(f"{report['harvey_calls']} HARVEY calls, {report['calls_saved']} of {report['population']} "
+          f"questions not asked. Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Sample instantiation specs from the pricing index instead of writing them by hand.
+
+For every template of pi_task_templates.json, placeholder bindings are drawn from
+the lookup tables of `pricing_index.py`: SAAS and YEAR come from the indexed
+versions, CONFIGURATION from the plans of the chosen pricing, FEATURE and ACTION
+from features offered by some plan of every pricing the question is about, USAGE
+LIMIT from numeric usage limits, and PRICE from the prices of the plans. The plan
+of each instance is filled with the machine values (feature names, numeric prices,
+usage limit values) through `plan_overrides`, exactly as in the hand-written spec.
+
+The output has the format of instantiation_spec.json and is written as a stream,
+so it can be passed directly to generate_instantiated_questions.py. Questions are
+unique: a binding whose question text was already produced is redrawn.
+
+Usage (from the project root):
+  python3 Experimentation/sample_instantiation_spec.py --per-template 100 --output sampled_spec.json
+  python3 Experimentation/generate_instantiated_questions.py --templates Experimentation/pi_task_templates.json \\
+    --spec sampled_spec.json --output sampled_questions.jsonl
+"""
+import argparse
+import json
+import math
+import random
+import re
+import time
+from collections import defaultdict
+
+from generate_instantiated_questions import PLACEHOLDER_RE, CompiledTemplate, instantiate_plan_with_placeholders
+from json_stream import write_records
+from pricing_index import DEFAULT_INDEX, DEFAULT_ROOT, humanize, load_or_build_index
+from pricing_parse_cache import ParsedPricingCache
+
+PLACEHOLDER_NAME_RE = re.compile(r"^(.*?)\s+(\d+)$")
+PRICING_URL_RE = re.compile(r"uploaded://pricing(?:/\d+)?")
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£"}
+# Usage limit values at or above this are the Pricing2Yaml encoding of "unlimited"
+UNLIMITED = 1e8
+MAX_ATTEMPTS = 50
+
+
+class SamplingError(Exception):
+    pass
+
+
+def placeholder_kind(name):
+    """'USAGE LIMIT 2' -> ('USAGE LIMIT', 2)"""
+    m = PLACEHOLDER_NAME_RE.match(name)
+    return (m.group(1), int(m.group(2))) if m else (name, 1)
+
+
+class TemplateShape:
+    """What a template needs: placeholders by kind, how many pricings, which slots are in the plan."""
+
+    def __init__(self, template):
+        self.template = template
+        self.names = list(dict.fromkeys(PLACEHOLDER_RE.findall(template["question"])))
+        self.by_kind = defaultdict(list)
+        for name in self.names:
+            kind, number = placeholder_kind(name)
+            self.by_kind[kind].append((number, name))
+        for slots in self.by_kind.values():
+            slots.sort()
+
+        plan_text = json.dumps(template["plan"])
+        self.in_plan = {name for name in self.names if "{{" + name + "}}" in plan_text}
+        pricing_urls = set(PRICING_URL_RE.findall(plan_text))
+        n_features = len(self.by_kind["FEATURE"])
+        if self.by_kind["YEAR"]:
+            self.n_pricings = len(self.by_kind["YEAR"])
+        elif self.by_kind["SAAS"]:
+            self.n_pricings = len(self.by_kind["SAAS"])
+        elif pricing_urls:
+            self.n_pricings = len(pricing_urls)
+        else:
+            self.n_pricings = max(1, n_features)
+        # e.g. "Which SaaS products offer {{FEATURE 1}}, {{FEATURE 2}} and {{FEATURE 3}}?"
+        self.feature_per_pricing = (not self.by_kind["SAAS"] and not self.by_kind["YEAR"] and not pricing_urls
+                                    and n_features == self.n_pricings > 1)
+        self.needs_plans = bool(self.by_kind["CONFIGURATION"] or self.by_kind["PRICE"])
+
+
+class BindingSampler:
+    """Draws placeholder bindings for templates from a pricing index."""
+
+    def __init__(self, index, rng=None):
+        self.rng = rng or random.Random()
+        self.pricings = index["pricings"]
+        self.saas_versions = {saas: sorted(entry["versions"]) for saas, entry in index["saas"].items()}
+        self.saas_paths = {saas: entry["versions"] for saas, entry in index["saas"].items()}
+        self.offered_features = {}
+        self.limit_values = {}
+        self.prices = {}
+        for path, pricing in self.pricings.items():
+            offered = set()
+            limits = defaultdict(set)
+            for plan in pricing["plans"].values():
+                offered.update(plan["features"])
+                for name, value in plan["usage_limits"].items():
+                    if 0 < value < UNLIMITED:
+                        limits[name].add(value)
+            self.offered_features[path] = sorted(offered)
+            self.limit_values[path] = {name: sorted(values) for name, values in limits.items()}
+            self.prices[path] = sorted({p["price"] for p in pricing["plans"].values() if p["price"]})
+
+    def choose_pricings(self, shape):
+        rng = self.rng
+        n = shape.n_pricings
+        if shape.by_kind["YEAR"]:
+            candidates = [s for s, years in self.saas_versions.items() if len(years) >= n]
+            saas = rng.choice(candidates)
+            years = sorted(rng.sample(self.saas_versions[saas], n))
+            return [self.saas_paths[saas][year] for year in years]
+
+        saas_list = rng.sample(sorted(self.saas_versions), n)
+        common_years = set.intersection(*(set(self.saas_versions[s]) for s in saas_list))
+        if common_years:
+            year = rng.choice(sorted(common_years))
+            return [self.saas_paths[s][year] for s in saas_list]
+        return [self.saas_paths[s][rng.choice(self.saas_versions[s])] for s in saas_list]
+
+    def sample(self, shape):
+        """(placeholder_values, plan_values, limit_values, action_features, pricing_paths) for one instance."""
+        rng = self.rng
+        paths = self.choose_pricings(shape)
+        pricings = [self.pricings[p] for p in paths]
+        if shape.needs_plans and not all(p["plans"] for p in pricings):
+            raise SamplingError("pricing without plans")
+
+        text = {}
+        plan_values = {}
+        limit_bindings = {}
+        action_features = []
+
+        for number, name in shape.by_kind["SAAS"]:
+            text[name] = pricings[number - 1]["name"]
+        for number, name in shape.by_kind["YEAR"]:
+            text[name] = pricings[number - 1]["year"]
+
+        used_plans = defaultdict(set)
+        for number, name in shape.by_kind["CONFIGURATION"]:
+            i = min(number, len(paths)) - 1
+            choices = [p for p in pricings[i]["plans"] if p not in used_plans[i]]
+            if not choices:
+                raise SamplingError("not enough plans")
+            plan = rng.choice(choices)
+            used_plans[i].add(plan)
+            label = re.sub(r"\s+plan$", "", humanize(plan))
+            text[name] = f"{label[:1].upper()}{label[1:]} plan"
+
+        feature_slots = shape.by_kind["FEATURE"] + shape.by_kind["ACTION"]
+        if feature_slots:
+            common = sorted(set.intersection(*(set(self.offered_features[p]) for p in paths)))
+            if shape.feature_per_pricing:
+                pools = [self.offered_features[p] for p in paths]
+            else:
+                pools = [common] * len(shape.by_kind["FEATURE"])
+            pools += [common] * len(shape.by_kind["ACTION"])
+            chosen = set()
+            for (number, name), pool in zip(feature_slots, pools):
+                choices = [f for f in pool if f not in chosen]
+                if not choices:
+                    raise SamplingError("no common feature")
+                feature = rng.choice(choices)
+                chosen.add(feature)
+                text[name] = humanize(feature)
+                if placeholder_kind(name)[0] == "ACTION":
+                    action_features.append(feature)
+                else:
+                    plan_values[name] = feature
+
+        for number, name in shape.by_kind["USAGE LIMIT"]:
+            common = set.intersection(*(set(self.limit_values[p]) for p in paths)) - set(limit_bindings)
+            if not common:
+                raise SamplingError("no common usage limit")
+            limit = rng.choice(sorted(common))
+            label = humanize(re.sub(r"^use(?=[A-Z])", "", limit))
+            if name in shape.in_plan:
+                value = rng.choice(self.limit_values[paths[0]][limit])
+                unit = self.pricings[paths[0]]["usage_limits"][limit]["unit"]
+                text[name] = f"{format_number(value)} {unit} of {label}".replace("  ", " ")
+                limit_bindings[name] = (limit, value)
+            else:
+                text[name] = label
+
+        price_slots = shape.by_kind["PRICE"]
+        if price_slots:
+            prices = sorted({p for path in paths for p in self.prices[path]})
+            if not prices:
+                raise SamplingError("no priced plan")
+            anchor = rng.choice(prices)
+            if len(price_slots) == 1:
+                values = [math.ceil(anchor * rng.uniform(1.0, 1.5))]
+            else:
+                low = math.floor(anchor * rng.uniform(0.5, 1.0))
+                high = max(low + 1, math.ceil(anchor * rng.uniform(1.0, 1.5)))
+                values = [low, high] + [high] * (len(price_slots) - 2)
+            symbol = CURRENCY_SYMBOLS.get(pricings[0]["currency"])
+            for (number, name), value in zip(price_slots, values):
+                text[name] = f"{symbol}{value}" if symbol else f"{value} {pricings[0]['currency']}"
+                plan_values[name] = value
+
+        return text, plan_values, limit_bindings, action_features, paths
+
+
+def format_number(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def fill_usage_limits(node, limit_bindings):
+    """Replace {"{{USAGE LIMIT n}}": 1} entries of the plan filters by {limitName: value}."""
+    if isinstance(node, dict):
+        out = {}
+        for k, v in node.items():
+            m = PLACEHOLDER_RE.fullmatch(k)
+            if m and m.group(1) in limit_bindings:
+                limit, value = limit_bindings[m.group(1)]
+                out[limit] = value
+            else:
+                out[k] = fill_usage_limits(v, limit_bindings)
+        return out
+    if isinstance(node, list):
+        return [fill_usage_limits(v, limit_bindings) for v in node]
+    return node
+
+
+def build_plan_overrides(shape, plan_values, limit_bindings, action_features):
+    actions = shape.template["plan"].get("actions") or []
+    if not actions or not (shape.in_plan or action_features):
+        return None
+    values = {name: plan_values.get(name, "{{" + name + "}}") for name in shape.names}
+    actions = fill_usage_limits(instantiate_plan_with_placeholders(actions, values), limit_bindings)
+    if action_features:
+        for action in actions:
+            if "filters" in action:
+                features = action["filters"].setdefault("features", [])
+                features.extend(f for f in action_features if f not in features)
+    return {"actions": actions}
+
+
+def iter_sampled_instances(templates, sampler, per_template, template_indexes=None):
+    """Yield `per_template` spec instances per template; duplicated questions are redrawn."""
+    seen = set()
+    instance_id = 0
+    for template_index in (template_indexes if template_indexes is not None else range(len(templates))):
+        template = templates[template_index]
+        shape = TemplateShape(template)
+        compiled = CompiledTemplate(template)
+        produced = 0
+        failures = 0
+        while produced < per_template:
+            try:
+                text, plan_values, limit_bindings, action_features, paths = sampler.sample(shape)
+            except SamplingError:
+                text = None
+            question = compiled.render_question(text) if text is not None else None
+            if question is None or question in seen:
+                failures += 1
+                if failures >= MAX_ATTEMPTS * per_template:
+                    print(f"Warning: only {produced} distinct instances for template {template_index}")
+                    break
+                continue
+            seen.add(question)
+            yield {
+                "id": instance_id,
+                "template_index": template_index,
+                "placeholder_values": text,
+                "question_override": None,
+                "plan_overrides": build_plan_overrides(shape, plan_values, limit_bindings, action_features),
+                "pricing_paths": paths,
+            }
+            instance_id += 1
+            produced += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample an instantiation spec from the pricing index")
+    parser.add_argument("--templates", default="Experimentation/pi_task_templates.json",
+                        help="Templates JSON (default: Experimentation/pi_task_templates.json)")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"Directory of the pricing YAMLs (default: {DEFAULT_ROOT})")
+    parser.add_argument("--index", default=DEFAULT_INDEX,
+                        help=f"Pricing index, built if missing or stale (default: {DEFAULT_INDEX})")
+    parser.add_argument("--per-template", type=int, default=5, help="Instances per template (default: 5)")
+    parser.add_argument("--template", type=int, nargs="+", help="Only sample these template indexes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--output", required=True, help="Path of the sampled spec")
+    args = parser.parse_args()
+
+    with open(args.templates, "r") as f:
+        templates = json.load(f)
+    index = load_or_build_index(args.root, args.index, parse_cache=ParsedPricingCache())
+    sampler = BindingSampler(index, random.Random(args.seed))
+
+    start = time.time()
+    with open(args.output, "w") as f:
+        f.write('{\n"instances": ')
+        count = write_records(iter_sampled_instances(templates, sampler, args.per_template, args.template), f)
+        f.write("\n}\n")
+    print(f"Sampled {count} instances in {time.time() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Makespan-aware dispatch order for the experiment runner.
+
+HARVEY latency depends mostly on the question template and on how many pricing
+files are sent. Given earlier results files, every pending question gets an
+expected duration (median of the matching history bucket) and questions are
+dispatched longest first (LPT scheduling), which keeps slow questions from piling
+up at the end of a concurrent run. `simulate_makespan` replays greedy list
+scheduling over `workers` slots to predict, or compare, completion times.
+"""
+import heapq
+import json
+import statistics
+from collections import defaultdict
+
+# Used when there is no history at all
+DEFAULT_EXPECTED_SECONDS = 60.0
+
+
+def history_key(item):
+    return item.get('template') or "Unknown", len(item.get('pricing_paths') or [])
+
+
+class LatencyHistory:
+    """Observed durations of successful HARVEY calls, bucketed by (template, #pricings)."""
+
+    def __init__(self):
+        self.by_key = defaultdict(list)
+        self.by_template = defaultdict(list)
+        self.by_num_pricings = defaultdict(list)
+        self.all = []
+
+    def add(self, item, seconds):
+        template, num_pricings = history_key(item)
+        self.by_key[(template, num_pricings)].append(seconds)
+        self.by_template[template].append(seconds)
+        self.by_num_pricings[num_pricings].append(seconds)
+        self.all.append(seconds)
+
+    def expected(self, item):
+        """Median duration of the most specific bucket that has data."""
+        template, num_pricings = history_key(item)
+        for values in (self.by_key.get((template, num_pricings)), self.by_template.get(template),
+                       self.by_num_pricings.get(num_pricings), self.all):
+            if values:
+                return statistics.median(values)
+        return DEFAULT_EXPECTED_SECONDS
+
+    def __len__(self):
+        return len(self.all)
+
+
+def load_latency_history(paths):
+    history = LatencyHistory()
+    for path in paths:
+        with open(path, 'r') as f:
+            results = json.load(f)
+        for entry in results:
+            if entry.get('error') or entry.get('replayed') or entry.get('duration_seconds') is None:
+                continue
+            history.add(entry['input'], entry['duration_seconds'])
+    return history
+
+
+def lpt_order(items, expected):
+    """Stable sort of `items` by decreasing expected duration (`expected(item)`)."""
+    return sorted(items, key=expected, reverse=True)
+
+
+def simulate_makespan(durations, workers):
+    """Makespan of dispatching `durations` in order, each to the first free of `workers` slots."""
+    slots = [0.0] * max(1, min(workers, len(durations) or 1))
+    for d in durations:
+        start = heapq.heappop(slots)
+        heapq.heappush(slots, start + d)
+    return max(slots)